@@ -13,18 +13,837 @@ Implements the Terminal Engine in Tank, e.g the a way to run apps inside of a
 standard python terminal session.
 """
 
+import atexit
 import collections
+import functools
+import json
 import tank
 import inspect
 import logging
+import logging.handlers
 import sys
 import os
 import platform
+import random
+import re
+import threading
+import time
 
 from tank_vendor import six
+from tank_vendor.six.moves import builtins, queue
 from tank.platform import Engine
 from tank import TankError
 
+# Maximum number of records waiting to be written by the logging thread. When
+# unset or 0, records are written synchronously.
+LOG_QUEUE_SIZE_ENV_VAR = "TK_SHELL_LOG_QUEUE_SIZE"
+# PySide2 modules available through sgtk.platform.qt5 in lazy Qt mode.
+LAZY_QT5_MODULES = ("QtCore", "QtGui", "QtWidgets")
+# What to do with a new record when the logging queue is full, see LOG_OVERFLOWS.
+LOG_QUEUE_OVERFLOW_ENV_VAR = "TK_SHELL_LOG_QUEUE_OVERFLOW"
+LOG_OVERFLOWS = ("block", "drop_new", "drop_oldest")
+
+# Chrome trace file, or folder to write it in, overrides the trace_file setting.
+TRACE_FILE_ENV_VAR = "TK_SHELL_TRACE_FILE"
+# Fraction of the runs to trace, overrides the trace_sample_rate setting.
+TRACE_SAMPLE_RATE_ENV_VAR = "TK_SHELL_TRACE_SAMPLE_RATE"
+
+# Folder to write command profiles in, overrides the profile_folder setting.
+PROFILE_FOLDER_ENV_VAR = "TK_SHELL_PROFILE_FOLDER"
+# Fraction of the commands to profile, overrides the profile_sample_rate setting.
+PROFILE_SAMPLE_RATE_ENV_VAR = "TK_SHELL_PROFILE_SAMPLE_RATE"
+
+# Record the memory usage of the commands, overrides the memory_accounting setting.
+MEMORY_ACCOUNTING_ENV_VAR = "TK_SHELL_MEMORY_ACCOUNTING"
+# JSON lines file to append the memory records to, overrides memory_report_file.
+MEMORY_REPORT_FILE_ENV_VAR = "TK_SHELL_MEMORY_REPORT_FILE"
+# Environment variable overriding the import_report_file setting, which also
+# times the imports done before the settings are available.
+IMPORT_REPORT_ENV_VAR = "TK_SHELL_IMPORT_REPORT"
+# Environment variable overriding the output_fd setting.
+OUTPUT_FD_ENV_VAR = "TK_SHELL_OUTPUT_FD"
+# Environment variable overriding the metrics_folder setting.
+METRICS_FOLDER_ENV_VAR = "TK_SHELL_METRICS_FOLDER"
+# Environment variables overriding the log_repeat_window and log_repeat_limit
+# settings, see RepeatedLogFilter.
+LOG_REPEAT_WINDOW_ENV_VAR = "TK_SHELL_LOG_REPEAT_WINDOW"
+LOG_REPEAT_LIMIT_ENV_VAR = "TK_SHELL_LOG_REPEAT_LIMIT"
+
+#: Method of the app widgets called with the show_dialog arguments when their
+#: cached dialog is shown again, so they can refresh their state.
+DIALOG_RESHOW_METHOD = "on_dialog_reshown"
+
+# Interval at which Qt events are processed while a coroutine command runs, in
+# seconds.
+QT_EVENTS_INTERVAL = 0.01
+
+# Command property keeping the short name the command was registered with, once
+# it was patched, see NameReplacements.
+ORIGINAL_SHORT_NAME_PROPERTY = "tk_shell_original_short_name"
+
+# Prefixes of the replaced_commands_names keys which are patterns, see RenameRules.
+REGEX_RULE_PREFIX = "re:"
+GLOB_RULE_PREFIX = "glob:"
+
+
+if six.PY3:
+
+    class BoundedQueueHandler(logging.handlers.QueueHandler):
+        """
+        Queue handler applying an overflow policy when its queue is full.
+
+        The policies are ``block``, waiting for the logging thread to catch up,
+        ``drop_new``, discarding the new record, and ``drop_oldest``, discarding
+        the oldest queued record to make room for the new one.
+        """
+
+        def __init__(self, log_queue, overflow):
+            """
+            :param log_queue: Bounded queue shared with the listener.
+            :param str overflow: One of :data:`LOG_OVERFLOWS`.
+            """
+            logging.handlers.QueueHandler.__init__(self, log_queue)
+            self.overflow = overflow
+            self.dropped = 0
+
+        def enqueue(self, record):
+            if self.overflow == "block":
+                self.queue.put(record)
+                return
+
+            while True:
+                try:
+                    self.queue.put_nowait(record)
+                    return
+                except queue.Full:
+                    self.dropped += 1
+                    if self.overflow == "drop_new":
+                        return
+                try:
+                    self.queue.get_nowait()
+                except queue.Empty:
+                    pass
+
+    class BoundedQueueListener(logging.handlers.QueueListener):
+        """
+        Queue listener which can be stopped more than once, even with a full queue.
+        """
+
+        def enqueue_sentinel(self):
+            # Wait for room rather than failing on a full bounded queue.
+            self.queue.put(self._sentinel)
+
+        def stop(self):
+            if self._thread is not None:
+                logging.handlers.QueueListener.stop(self)
+
+
+class RepeatedLogFilter(logging.Filter):
+    """
+    Filter collapsing identical log records.
+
+    Up to ``limit`` identical records are let through in a ``window`` of
+    seconds, the next ones are counted and replaced by a single "repeated N
+    times" record once the window is over, or when :meth:`flush` is called.
+    Records are identical when they have the same level, message and
+    arguments, so nothing is formatted to compare them.
+    """
+
+    # Number of messages tracked before the expired ones are summarized.
+    MAX_TRACKED = 1000
+
+    def __init__(self, logger, window, limit):
+        """
+        :param logger: Logger the summaries are handled by.
+        :param float window: Number of seconds identical records are counted in.
+        :param int limit: Number of identical records let through in a window.
+        """
+        logging.Filter.__init__(self)
+        self._logger = logger
+        self._window = window
+        self._limit = limit
+        # keys mapped to [window start, count, last record]
+        self._seen = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        if getattr(record, "repeat_summary", False):
+            return True
+
+        key = (record.levelno, record.msg, record.args)
+        try:
+            hash(key)
+        except TypeError:
+            key = (record.levelno, record.getMessage())
+
+        summaries = []
+        with self._lock:
+            now = record.created
+            state = self._seen.get(key)
+            if state is not None and now - state[0] >= self._window:
+                if state[1] > self._limit:
+                    summaries.append(state)
+                state = None
+            if state is None:
+                if len(self._seen) >= self.MAX_TRACKED:
+                    summaries.extend(self._pop_expired(now))
+                state = self._seen[key] = [now, 0, None]
+            state[1] += 1
+            state[2] = record
+            allowed = state[1] <= self._limit
+
+        self._summarize(summaries)
+        return allowed
+
+    def flush(self):
+        """
+        Summarize the records filtered out so far.
+        """
+        with self._lock:
+            summaries = self._pop_expired(None)
+        self._summarize(summaries)
+
+    def reset_after_fork(self):
+        """
+        Start counting again in a forked process, e.g. a fan-out worker.
+
+        The records counted by the parent process are left for it to summarize.
+        """
+        self._seen = {}
+        # may have been held by a parent thread when forking
+        self._lock = threading.Lock()
+
+    def _pop_expired(self, now):
+        """
+        Stop tracking the messages whose window is over, all of them if now is
+        None.
+
+        :returns: The states of the messages which were filtered out.
+        """
+        expired = []
+        for key, state in list(self._seen.items()):
+            if now is None or now - state[0] >= self._window:
+                del self._seen[key]
+                if state[1] > self._limit:
+                    expired.append(state)
+        return expired
+
+    def _summarize(self, states):
+        """
+        Log a summary of the records filtered out.
+        """
+        for _, count, record in states:
+            summary = self._logger.makeRecord(
+                record.name,
+                record.levelno,
+                record.pathname,
+                record.lineno,
+                "%s (repeated %d more times)",
+                (record.getMessage(), count - self._limit),
+                None,
+            )
+            summary.repeat_summary = True
+            self._logger.handle(summary)
+
+
+class ImportTimer(object):
+    """
+    Times the imports, like ``python -X importtime``, while started.
+
+    Only the outermost imports are timed, including the modules they import in
+    turn, and attributed to the file whose code triggered them.
+    """
+
+    def __init__(self):
+        # importer files mapped to imported module names mapped to seconds
+        self.imports = collections.defaultdict(lambda: collections.defaultdict(float))
+        self._local = threading.local()
+        self._original_import = builtins.__import__
+
+    def start(self):
+        """
+        Start timing the imports.
+        """
+        self._original_import = builtins.__import__
+        builtins.__import__ = self._import
+
+    def stop(self):
+        """
+        Stop timing the imports.
+        """
+        if builtins.__import__ == self._import:
+            builtins.__import__ = self._original_import
+
+    def _import(self, name, globals=None, locals=None, fromlist=(), level=0):
+        if getattr(self._local, "importing", False):
+            return self._original_import(name, globals, locals, fromlist, level)
+
+        self._local.importing = True
+        start = time.time()
+        try:
+            return self._original_import(name, globals, locals, fromlist, level)
+        finally:
+            duration = time.time() - start
+            self._local.importing = False
+            importer = (globals or {}).get("__file__") or "<unknown>"
+            self.imports[importer][name] += duration
+
+    def get_bundle_times(self, bundle_locations):
+        """
+        Sum the import times by bundle.
+
+        :param dict bundle_locations: Bundle names mapped to their folder. The
+            imports of files outside of them are attributed to ``"other"``.
+        :returns: Bundle names mapped to module names mapped to seconds.
+        """
+        # longest folders first, so nested bundles win
+        locations = sorted(
+            (
+                (os.path.normcase(os.path.abspath(path)) + os.sep, name)
+                for name, path in bundle_locations.items()
+                if path
+            ),
+            reverse=True,
+        )
+        times = collections.defaultdict(lambda: collections.defaultdict(float))
+        for importer, modules in self.imports.items():
+            importer_path = os.path.normcase(os.path.abspath(importer))
+            bundle = next(
+                (name for path, name in locations if importer_path.startswith(path)),
+                "other",
+            )
+            for module, duration in modules.items():
+                times[bundle][module] += duration
+        return times
+
+
+class _NullContext(object):
+    """
+    Context manager doing nothing, used when tracing is off.
+    """
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NULL_CONTEXT = _NullContext()
+
+
+class LazyQtProxy(object):
+    """
+    Stand-in for a Qt module or class which imports the Qt bindings on first use.
+
+    Until the bindings are imported, the proxy is falsy so Toolkit considers Qt
+    unavailable rather than importing it to set itself up.
+    """
+
+    def __init__(self, engine, name):
+        """
+        :param engine: The :class:`ShellEngine` resolving the bindings.
+        :param str name: Key of the proxied object in the Qt base definitions.
+        """
+        self._engine = engine
+        self._name = name
+
+    def _resolve(self):
+        """
+        Get the real object, importing the Qt bindings if needed.
+        """
+        qt_base = self._engine._resolve_qt()
+        if self._name not in qt_base:
+            raise TankError("%s is not available in this Qt installation." % self._name)
+        return qt_base[self._name]
+
+    def __getattr__(self, name):
+        return getattr(self._resolve(), name)
+
+    def __call__(self, *args, **kwargs):
+        return self._resolve()(*args, **kwargs)
+
+    def __bool__(self):
+        return self._engine._qt_base is not None and bool(self._resolve())
+
+    __nonzero__ = __bool__
+
+
+class CommandSpec(object):
+    """
+    Pre-validated calling convention of a command callback.
+
+    Built once per command so dispatching doesn't have to introspect the
+    callback every time.
+    """
+
+    __slots__ = (
+        "callback",
+        "code",
+        "arg_count",
+        "var_args",
+        "error_message",
+        "is_coroutine",
+        "is_generator",
+    )
+
+    def __init__(self, callback):
+        """
+        :param callback: The command callback, as registered.
+        """
+        getargspec = inspect.getargspec if six.PY2 else inspect.getfullargspec
+
+        cb_arg_spec = getargspec(callback)
+        cb_arg_list = cb_arg_spec[0]
+        cb_var_args = cb_arg_spec[1]
+
+        if hasattr(callback, "__self__"):
+            # first argument to cb will be class instance:
+            cb_arg_list = cb_arg_list[1:]
+
+        expected_args = list(cb_arg_list)
+        if cb_var_args:
+            expected_args.append("*%s" % cb_var_args)
+
+        self.callback = callback
+        self.code = self._get_code(callback)
+        self.arg_count = len(cb_arg_list)
+        self.var_args = bool(cb_var_args)
+        self.error_message = (
+            "Cannot run command! Expected command arguments (%s)"
+            % ", ".join(expected_args)
+        )
+        # async def callbacks, which only exist in Python 3
+        iscoroutinefunction = getattr(inspect, "iscoroutinefunction", None)
+        self.is_coroutine = bool(iscoroutinefunction and iscoroutinefunction(callback))
+        self.is_generator = inspect.isgeneratorfunction(callback)
+
+    @staticmethod
+    def _get_code(callback):
+        """
+        Get the code object run by a function or method, None for other callables.
+        """
+        return getattr(getattr(callback, "__func__", callback), "__code__", None)
+
+    def rebind(self, callback):
+        """
+        Get the spec of a command callback registered again.
+
+        Apps register new callbacks on context change, the introspection is
+        reused if they run the same code.
+
+        :param callback: The command callback, as registered.
+        :returns: This spec, a copy bound to the new callback or a new spec.
+        """
+        if callback is self.callback:
+            return self
+        if (
+            self.code is not None
+            and self.code == self._get_code(callback)
+            and hasattr(callback, "__self__") == hasattr(self.callback, "__self__")
+        ):
+            spec = CommandSpec.__new__(CommandSpec)
+            for name in self.__slots__:
+                setattr(spec, name, getattr(self, name))
+            spec.callback = callback
+            return spec
+        return CommandSpec(callback)
+
+    def accepts(self, arg_count):
+        """
+        Check if the callback can be called with the given number of arguments.
+
+        :param int arg_count: Number of positional arguments.
+        :returns: True if it is the correct/minimum number of arguments.
+        """
+        if self.var_args:
+            return arg_count >= self.arg_count
+        return arg_count == self.arg_count
+
+
+class RenameRules(object):
+    """
+    Compiled ``replaced_commands_names`` setting.
+
+    Keys starting with ``re:`` are regular expressions and keys starting with
+    ``glob:`` are shell style wildcards, where each ``*`` and ``?`` is a group.
+    Both have to match the whole short name, which is then replaced by the
+    value with its ``\\1`` style group references expanded. Other keys are
+    exact short names and take precedence over the patterns, which are tried in
+    order.
+
+    The patterns are combined in a single regular expression, so finding the
+    rule matching a short name is a single match. Patterns referring to their
+    own groups, e.g. ``(\\w)\\1``, are left out as the combined groups are
+    numbered differently, and are tried one by one.
+    """
+
+    # Group references in a pattern: numbered or named backreferences and
+    # conditional groups.
+    GROUP_REFERENCE = re.compile(r"\\\d|\(\?P=|\(\?\(")
+
+    def __init__(self, requested, logger):
+        """
+        :param dict requested: The ``replaced_commands_names`` setting.
+        :param logger: Logger to report invalid patterns to.
+        """
+        self._logger = logger
+        self.exact = {}
+        self._rules = []
+        for key, new_name in requested.items():
+            if key.startswith(REGEX_RULE_PREFIX):
+                pattern = key[len(REGEX_RULE_PREFIX) :]
+            elif key.startswith(GLOB_RULE_PREFIX):
+                pattern = self._glob_to_regex(key[len(GLOB_RULE_PREFIX) :])
+            else:
+                self.exact[key] = new_name
+                continue
+            try:
+                # match the whole name, fullmatch isn't available in Python 2.
+                self._rules.append((re.compile("(?:%s)\\Z" % pattern), new_name))
+            except re.error as e:
+                logger.warning('IGNORING invalid "%s" rename pattern: %s', key, e)
+
+        # indexes of the rules left out of the combined regular expression
+        self._separate = set(
+            index
+            for index, (regex, _) in enumerate(self._rules)
+            if self.GROUP_REFERENCE.search(regex.pattern)
+        )
+        self._combined = None
+        if len(self._separate) < len(self._rules):
+            try:
+                self._combined = re.compile(
+                    "|".join(
+                        "(?P<rule%d>%s)" % (index, regex.pattern)
+                        for index, (regex, _) in enumerate(self._rules)
+                        if index not in self._separate
+                    )
+                )
+            except re.error:
+                # e.g. the same group name used in several patterns, the rules
+                # are then tried one by one.
+                pass
+
+    @staticmethod
+    def _glob_to_regex(pattern):
+        """
+        Translate a wildcard pattern, with a group for each ``*`` and ``?``.
+        """
+        parts = []
+        index = 0
+        while index < len(pattern):
+            char = pattern[index]
+            index += 1
+            if char == "*":
+                parts.append("(.*)")
+            elif char == "?":
+                parts.append("(.)")
+            elif char == "[" and "]" in pattern[index + 1 :]:
+                end = pattern.index("]", index + 1)
+                chars = pattern[index:end].replace("\\", "\\\\")
+                if chars.startswith("!"):
+                    chars = "^" + chars[1:]
+                parts.append("[%s]" % chars)
+                index = end + 1
+            else:
+                parts.append(re.escape(char))
+        return "".join(parts)
+
+    def match(self, name):
+        """
+        Get the new name of a short name not listed as an exact key.
+
+        :param str name: Original short name.
+        :returns: The new name or None if no pattern matches.
+        """
+        rules = self._rules
+        if self._combined is not None:
+            match = self._combined.match(name)
+            first = int(match.lastgroup[len("rule") :]) if match else len(rules)
+            # the rules tried one by one take precedence if they come first
+            rules = [
+                rule
+                for index, rule in enumerate(rules[: first + 1])
+                if index == first or index in self._separate
+            ]
+
+        for regex, template in rules:
+            match = regex.match(name)
+            if match:
+                try:
+                    return match.expand(template)
+                except (re.error, IndexError) as e:
+                    self._logger.warning(
+                        'IGNORING "%s" rename pattern for "%s": %s',
+                        regex.pattern,
+                        name,
+                        e,
+                    )
+                    return None
+        return None
+
+
+class NameReplacements(object):
+    """
+    Memoized calculation of the command name replacements.
+
+    The result is cached on a fingerprint of the requested replacements and of
+    the commands keys and short names. When only a few commands were added or
+    removed since the previous calculation, only the names they affect are
+    resolved again instead of starting over.
+    """
+
+    # Above this fraction of changed commands, a full rebuild is cheaper.
+    INCREMENTAL_RATIO = 0.25
+
+    def __init__(self, logger):
+        """
+        :param logger: Logger to report clashes and changes to.
+        """
+        self._logger = logger
+        self._requested = None
+        self._rules = None
+        # short names matched by a pattern rule, mapped to their new name
+        self._patterned = {}
+        # (command key, original short name) pairs the result was computed for
+        self._names = frozenset()
+        # short names shared by several commands
+        self._duplicates = set()
+        self._current_names = {}
+        self._new_from_originals = collections.defaultdict(set)
+        # command keys mapped to their (original name, new name)
+        self._renamed = {}
+        self._replacements = {}
+        self._key_from_new = {}
+        self._changed = False
+
+    @property
+    def replacements(self):
+        """
+        Command keys mapped to their new short names.
+        """
+        return dict(self._replacements)
+
+    def update(self, requested, commands):
+        """
+        Calculate the final name replacements to perform.
+
+        If any clashes for destination name occurs, a warning will be logged
+        and that specific rename action will not occur.
+
+        :param dict requested: Old names, or :class:`RenameRules` patterns,
+            mapped to new names to replace with.
+        :param dict commands: Engine commands, by key.
+        :returns: Command key names mapped to new short names, if any.
+        """
+        names = self._get_names(commands)
+        fingerprint = frozenset(names)
+        requested_items = frozenset(requested.items())
+
+        self._changed = False
+        if requested_items != self._requested:
+            self._rebuild(requested, names)
+        elif fingerprint != self._names:
+            added = fingerprint - self._names
+            removed = self._names - fingerprint
+            changed = len(added) + len(removed)
+            if changed > self.INCREMENTAL_RATIO * len(fingerprint) or not (
+                self._update_incrementally(added, removed)
+            ):
+                self._rebuild(requested, names)
+        self._requested = requested_items
+        self._names = fingerprint
+
+        if self._changed:
+            self._logger.debug("Final current_names: %s", self._current_names)
+            self._logger.debug("Final new_from_originals: %s", self._new_from_originals)
+        return self.replacements
+
+    def _get_names(self, commands):
+        """
+        Get the (key, short name) pairs of the commands, in order.
+
+        Short names patched with a previous result are mapped back to the
+        original ones kept in their properties, in case the commands weren't
+        registered again since.
+        """
+        names = []
+        for key, info in commands.items():
+            properties = info.get("properties", {})
+            name = properties.get(ORIGINAL_SHORT_NAME_PROPERTY) or properties.get(
+                "short_name"
+            )
+            if name:
+                names.append((key, name))
+        return names
+
+    def _rebuild(self, requested, names):
+        """
+        Resolve every new name from scratch.
+        """
+        previous = self._renamed
+        self._rules = rules = RenameRules(requested, self._logger)
+        self._patterned = patterned = {}
+        self._duplicates = set()
+        self._current_names = current_names = {}
+        self._new_from_originals = new_from_originals = collections.defaultdict(set)
+        self._renamed = {}
+        self._replacements = {}
+        self._key_from_new = {}
+
+        for original_name, new_name in rules.exact.items():
+            new_from_originals[new_name].add(original_name)
+
+        for key, original_name in names:
+            if original_name in current_names:
+                self._duplicates.add(original_name)
+            current_names[original_name] = key
+            if original_name in rules.exact or original_name in patterned:
+                continue
+            new_name = rules.match(original_name)
+            if new_name is None:
+                new_from_originals[original_name].add(original_name)
+            else:
+                patterned[original_name] = new_name
+                new_from_originals[new_name].add(original_name)
+
+        for new_name in sorted(new_from_originals):
+            self._resolve(new_name)
+        self._changed = self._renamed != previous
+
+    def _update_incrementally(self, added, removed):
+        """
+        Resolve again the new names affected by added and removed commands.
+
+        :returns: False if a full rebuild is needed instead, when the changed
+            short names are shared by several commands.
+        """
+        added_names = set(name for _, name in added)
+        removed_names = set(name for _, name in removed)
+        if (
+            len(added_names) != len(added)
+            or len(removed_names) != len(removed)
+            or added_names & removed_names
+            or removed_names & self._duplicates
+            or any(name in self._current_names for name in added_names)
+        ):
+            return False
+
+        exact = self._rules.exact
+        affected = set()
+        for key, name in removed:
+            del self._current_names[name]
+            if name in exact:
+                affected.add(exact[name])
+                continue
+            new_name = self._patterned.pop(name, name)
+            self._new_from_originals[new_name].discard(name)
+            affected.add(new_name)
+        for key, name in added:
+            self._current_names[name] = key
+            if name in exact:
+                affected.add(exact[name])
+                continue
+            new_name = self._rules.match(name)
+            if new_name is None:
+                new_name = name
+            else:
+                self._patterned[name] = new_name
+            self._new_from_originals[new_name].add(name)
+            affected.add(new_name)
+
+        for new_name in sorted(affected):
+            previous = self._key_from_new.get(new_name)
+            self._resolve(new_name)
+            if self._key_from_new.get(new_name) != previous:
+                self._changed = True
+        return True
+
+    def _resolve(self, new_name):
+        """
+        Work out which command, if any, gets renamed to the given new name.
+        """
+        previous_key = self._key_from_new.pop(new_name, None)
+        if previous_key is not None:
+            del self._renamed[previous_key]
+            del self._replacements[previous_key]
+
+        original_names = self._new_from_originals.get(new_name)
+        if not original_names:
+            self._new_from_originals.pop(new_name, None)
+        elif len(original_names) > 1:
+            self._logger.warning(
+                'IGNORING creating new "%s" command name from 2 or more '
+                'clashing, original names: "%s"',
+                new_name,
+                '", "'.join(map(str, original_names)),
+            )
+        else:
+            original_name = list(original_names)[0]
+            command_key = self._current_names.get(original_name)
+            if original_name != new_name and command_key:
+                self._key_from_new[new_name] = command_key
+                self._renamed[command_key] = (original_name, new_name)
+                self._replacements[command_key] = new_name
+
+
+def _in_main_thread():
+    """
+    Check if the current thread is the main thread.
+    """
+    if six.PY2:
+        return isinstance(threading.current_thread(), threading._MainThread)
+    return threading.current_thread() is threading.main_thread()
+
+
+#: Commands prepared for a context: the (key, short name) pairs and requested
+#: replacements they were prepared from, the resulting replacements and the
+#: dispatch table.
+CommandTable = collections.namedtuple(
+    "CommandTable", ["names", "requested", "replacements", "dispatch_table"]
+)
+
+
+class CommandTableCache(object):
+    """
+    Least recently used cache of the :class:`CommandTable` of each context.
+
+    The cache lives as long as the engine, which is restarted when the
+    configuration changes, e.g. by the daemon.
+    """
+
+    def __init__(self, size):
+        """
+        :param int size: Maximum number of contexts to keep the tables of.
+        """
+        self._size = size
+        self._tables = collections.OrderedDict()
+
+    def get(self, context_key):
+        """
+        Get the table of a context, marking it as the most recently used.
+
+        :param str context_key: Key identifying the context.
+        :returns: The :class:`CommandTable` or None.
+        """
+        table = self._tables.pop(context_key, None)
+        if table is not None:
+            self._tables[context_key] = table
+        return table
+
+    def put(self, context_key, table):
+        """
+        Store the table of a context, evicting the least recently used ones.
+
+        :param str context_key: Key identifying the context.
+        :param table: The :class:`CommandTable`.
+        """
+        self._tables.pop(context_key, None)
+        self._tables[context_key] = table
+        while len(self._tables) > self._size:
+            self._tables.popitem(last=False)
+
 
 class ShellEngine(Engine):
     """
@@ -34,13 +853,78 @@ class ShellEngine(Engine):
     def __init__(self, *args, **kwargs):
         # passthrough so we can init stuff
 
+        # tracing is only started once the settings are known, see _start_tracing
+        self._init_time = time.time()
+        self._tracer = None
+        self._trace_path = None
+        self._trace_checked = False
+        # command profiling settings, see _start_profiling
+        self._profile_folder = None
+        self._profile_sample_rate = 1.0
+        self._profiling = False
+        # memory accounting settings, see _start_memory_accounting
+        self._memory_report_file = None
+        self._measuring_memory = False
+        # writes the command counters, see _start_metrics
+        self._metrics_spooler = None
+        # results of the cacheable commands, see _get_result_cache
+        self._result_cache = None
+        # asyncio loop running the coroutine commands and the thread pool they
+        # can run blocking calls in, see get_event_loop and thread_pool
+        self._event_loop = None
+        self._thread_pool = None
+        # the app being initialized, see _Engine__currently_initializing_app
+        self._initializing_app = None
+        self._app_init_start = None
+        self._app_init_reported = False
+        # import and init_app times, see _start_import_report
+        self._import_timer = None
+        self._import_report_path = None
+        self._app_init_times = {}
+
+        # functions called as hook(cmd_key, call) around command callbacks,
+        # see _wrap_callback
+        self._command_hooks = []
+
         # the has_qt flag indicates that the QT subsystem is present and can be started
         self._has_qt = False
 
         self._ui_created = False
 
+        # with the lazy_qt setting, Qt is only imported once _resolve_qt is
+        # called and _qt_base holds the resulting base definitions.
+        self._lazy_qt = False
+        self._qt_base = None
+        # dialogs kept to be shown again, see _get_dialog_cache
+        self._dialog_cache = None
+        # commands queued while a QApplication runs, see _get_command_queue
+        self._command_queue = None
+        # Qt bindings recorded for this Python environment, see _detect_qt_base
+        self._qt_detection = None
+
+        # command keys mapped to their CommandSpec, see _get_command_spec
+        self._dispatch_table = {}
+        # memoized short name replacements, see _apply_name_replacements
+        self._name_replacements = None
+        # commands prepared for recent contexts, see _prepare_commands
+        self._command_tables = None
+        # see _get_config_fingerprint
+        self._config_fingerprint = None
+        # set in forked processes, e.g. fan-out workers, see _reset_after_fork
+        self._forked = False
+        # command keys mapped to their spec and wrapped callback, see
+        # _wrap_callback
+        self._wrapped_callbacks = {}
+
         self._log = None
         self._stream_handler = None
+        self._repeat_filter = None
+
+        # time the imports of the bundles loaded before the settings are known
+        if os.environ.get(IMPORT_REPORT_ENV_VAR):
+            self._start_import_report(os.environ[IMPORT_REPORT_ENV_VAR])
+        self._queue_handler = None
+        self._queue_listener = None
 
         # Check if the Toolkit instance has a log and if so, we'll use it.
         if len(args) > 0 and isinstance(args[0], tank.Tank):
@@ -58,21 +942,605 @@ class ShellEngine(Engine):
             self._stream_handler = logging.StreamHandler()
             formatter = logging.Formatter()
             self._stream_handler.setFormatter(formatter)
+            self._setup_log_queue()
+            self._log.addHandler(self._queue_handler or self._stream_handler)
+
+        super(ShellEngine, self).__init__(*args, **kwargs)
+
+        if self._tracer:
+            self._tracer.add_span(
+                "engine init", "startup", self._init_time, time.time()
+            )
+
+    def init_engine(self):
+        """
+        Start tracing, profiling and memory accounting if requested, as soon as
+        the settings are available.
+        """
+        super(ShellEngine, self).init_engine()
+        self._start_log_filter()
+        self._start_tracing()
+        self._start_metrics()
+        if self._import_timer is None:
+            path = self.get_setting("import_report_file", default="")
+            if path:
+                self._start_import_report(path)
+        # before profiling, so the profile doesn't include the measurements
+        self._start_memory_accounting()
+        self._start_profiling()
+
+    def _get_option(self, setting, env_var, default=None):
+        """
+        Get a setting value, which can be overridden by an environment variable.
+
+        :param str setting: Name of the engine setting.
+        :param str env_var: Name of the environment variable.
+        :param default: Value used if neither is set.
+        :returns: The environment variable value, converted to the type of the
+            default value, or the setting value.
+        """
+        value = os.environ.get(env_var)
+        if value is None:
+            return self.get_setting(setting, default=default)
+        if isinstance(default, bool):
+            return value.lower() in ("1", "true", "yes", "on")
+        if default is not None:
+            return type(default)(value)
+        return value
+
+    ###################################################################################
+    # tracing
+
+    def _start_tracing(self):
+        """
+        Start tracing, if enabled and sampled, for the lifetime of the engine.
+        """
+        if self._trace_checked:
+            return
+        self._trace_checked = True
+
+        path = self._get_option("trace_file", TRACE_FILE_ENV_VAR, "")
+        sample_rate = self._get_option(
+            "trace_sample_rate", TRACE_SAMPLE_RATE_ENV_VAR, 1.0
+        )
+        if not path or random.random() >= sample_rate:
+            return
+
+        tracing = self.import_module("tk_shell").import_submodule("tracing")
+        self._tracer = tracing.Tracer()
+        self._trace_path = path
+
+        now = time.time()
+        process_start = tracing.get_process_start_time()
+        if process_start and process_start < self._init_time:
+            self._tracer.add_span(
+                "bootstrap", "startup", process_start, self._init_time
+            )
+        self._tracer.add_span("core engine setup", "startup", self._init_time, now)
+        self._command_hooks.append(self._trace_command)
+
+    def _trace(self, name, category="startup"):
+        """
+        Get a context manager recording a span, when tracing.
+
+        :param str name: Name of the span.
+        :param str category: Category of the span.
+        """
+        if self._tracer is None:
+            return _NULL_CONTEXT
+        return self._tracer.span(name, category)
+
+    def _trace_command(self, cmd_key, call):
+        """
+        Command hook recording a span for the callback.
+        """
+        with self._tracer.span(cmd_key, "command"):
+            return call()
+
+    def _write_trace(self):
+        """
+        Write the Chrome trace file and log a summary of the spans.
+        """
+        if self._tracer is None:
+            return
+
+        path = self._trace_path
+        if os.path.isdir(path):
+            path = os.path.join(
+                path, "tk-shell-%d-%d.json" % (os.getpid(), time.time())
+            )
+        try:
+            self._tracer.write_chrome_trace(path)
+        except (IOError, OSError) as e:
+            self.logger.warning("Could not write the trace: %s", e)
+            path = None
+        self.logger.info(
+            "Startup and dispatch trace%s:\n%s",
+            " written to %s" % path if path else "",
+            self._tracer.summary(),
+        )
+        self._tracer = None
+
+    ###################################################################################
+    # command metrics
+
+    def _start_metrics(self):
+        """
+        Count the command runs and their durations, if a spool folder is set.
+        """
+        folder = self._get_option("metrics_folder", METRICS_FOLDER_ENV_VAR, "")
+        if not folder:
+            return
+        metrics = self.import_module("tk_shell").import_submodule("metrics")
+        self._metrics_spooler = metrics.MetricsSpooler(
+            os.path.expanduser(folder),
+            self.get_setting("metrics_flush_interval", default=60.0),
+            self.get_setting("metrics_prometheus_file", default="") or None,
+            self.logger,
+        )
+        self._metrics_spooler.start()
+        self._command_hooks.append(self._count_command)
+
+    def _count_command(self, cmd_key, call):
+        """
+        Command hook counting the runs, failures and durations of the callbacks.
+        """
+        success = False
+        start = time.time()
+        try:
+            result = call()
+            success = True
+            return result
+        finally:
+            self._metrics_spooler.metrics.record(cmd_key, time.time() - start, success)
+
+    ###################################################################################
+    # profiling
+
+    def _start_profiling(self):
+        """
+        Profile the command callbacks, if enabled.
+        """
+        self._profile_folder = self._get_option(
+            "profile_folder", PROFILE_FOLDER_ENV_VAR, ""
+        )
+        if not self._profile_folder:
+            return
+        self._profile_sample_rate = self._get_option(
+            "profile_sample_rate", PROFILE_SAMPLE_RATE_ENV_VAR, 1.0
+        )
+        # first so only the callback is profiled, not the other hooks
+        self._command_hooks.insert(0, self._profile_command)
+
+    def _profile_command(self, cmd_key, call):
+        """
+        Command hook profiling a sample of the callbacks.
+
+        Commands run by other commands, e.g. in batch mode, are part of the
+        profile of the outer command.
+        """
+        if self._profiling or random.random() >= self._profile_sample_rate:
+            return call()
+
+        profiling = self.import_module("tk_shell").import_submodule("profiling")
+        path = profiling.get_profile_path(self._profile_folder, cmd_key, self.context)
+
+        def report(summary):
+            self.logger.info("Profile of %s written to %s\n%s", cmd_key, path, summary)
+
+        self._profiling = True
+        try:
+            return profiling.run_profiled(
+                call,
+                path,
+                self.get_setting("profile_top_entries", default=20),
+                report,
+                self.logger,
+            )
+        finally:
+            self._profiling = False
+
+    ###################################################################################
+    # memory accounting
+
+    def _start_memory_accounting(self):
+        """
+        Record the memory usage of the command callbacks, if enabled.
+        """
+        self._memory_report_file = self._get_option(
+            "memory_report_file", MEMORY_REPORT_FILE_ENV_VAR, ""
+        )
+        enabled = self._get_option(
+            "memory_accounting", MEMORY_ACCOUNTING_ENV_VAR, False
+        )
+        if enabled or self._memory_report_file:
+            self._command_hooks.insert(0, self._measure_command_memory)
+
+    def _measure_command_memory(self, cmd_key, call):
+        """
+        Command hook recording the memory usage of the callbacks.
+
+        Commands run by other commands, e.g. in batch mode, are part of the
+        record of the outer command.
+        """
+        if self._measuring_memory:
+            return call()
+
+        memory = self.import_module("tk_shell").import_submodule("memory")
+
+        def report(record):
+            self.logger.info(
+                "Memory usage of %s:\n%s", cmd_key, memory.format_record(record)
+            )
+            if not self._memory_report_file:
+                return
+            record.update(
+                command=cmd_key,
+                context=str(self.context),
+                time=time.time(),
+                pid=os.getpid(),
+            )
+            try:
+                memory.append_record(self._memory_report_file, record)
+            except (IOError, OSError) as e:
+                self.logger.warning("Could not write the memory record: %s", e)
+
+        self._measuring_memory = True
+        try:
+            return memory.run_measured(
+                call, self.get_setting("memory_top_entries", default=10), report
+            )
+        finally:
+            self._measuring_memory = False
+
+    @property
+    def _Engine__currently_initializing_app(self):
+        """
+        The app the base Engine is initializing, if any.
+
+        The base class sets this private attribute around each app's
+        ``init_app``, which gives us the time spent initializing each app. With
+        Toolkit cores which don't, only the import times are reported.
+        """
+        return self._initializing_app
+
+    @_Engine__currently_initializing_app.setter
+    def _Engine__currently_initializing_app(self, app):
+        self._app_init_reported = True
+        if self._tracer or self._import_timer:
+            now = time.time()
+            if self._initializing_app is not None:
+                name = getattr(self._initializing_app, "instance_name", "?")
+                if self._tracer:
+                    self._tracer.add_span(
+                        "init_app %s" % name, "app", self._app_init_start, now
+                    )
+                if self._import_timer:
+                    self._app_init_times[name] = now - self._app_init_start
+            self._app_init_start = now
+        self._initializing_app = app
+
+    ###################################################################################
+    # import report
+
+    def _start_import_report(self, path):
+        """
+        Time the imports and the apps initialization, until the apps are
+        initialized.
+
+        :param str path: JSON file to write the report to, or a folder to
+            write it in.
+        """
+        self._import_report_path = os.path.expanduser(path)
+        self._import_timer = ImportTimer()
+        self._import_timer.start()
+
+    def _write_import_report(self):
+        """
+        Stop timing the imports, log the time spent importing modules and
+        initializing apps for each bundle and write it as JSON.
+        """
+        if self._import_timer is None:
+            return
+        self._import_timer.stop()
+
+        locations = {self.instance_name: self.disk_location}
+        for bundle in list(self.apps.values()) + list(self.frameworks.values()):
+            name = getattr(bundle, "instance_name", None) or getattr(
+                bundle, "name", "?"
+            )
+            locations[name] = getattr(bundle, "disk_location", None)
+        import_times = self._import_timer.get_bundle_times(locations)
+        if self.apps and not self._app_init_reported:
+            self.logger.debug(
+                "The apps initialization isn't reported by this Toolkit core."
+            )
+
+        bundles = []
+        for name in set(import_times) | set(self._app_init_times):
+            modules = sorted(
+                import_times.get(name, {}).items(), key=lambda item: -item[1]
+            )
+            import_time = sum((duration for _, duration in modules), 0.0)
+            init_time = self._app_init_times.get(name, 0.0)
+            bundles.append(
+                {
+                    "name": name,
+                    "import_seconds": import_time,
+                    "init_app_seconds": init_time,
+                    "total_seconds": import_time + init_time,
+                    "imports": [
+                        {"module": module, "seconds": duration}
+                        for module, duration in modules
+                    ],
+                }
+            )
+        bundles.sort(key=lambda bundle: -bundle["total_seconds"])
+
+        lines = ["%-40s %10s %10s %10s" % ("Bundle", "imports", "init_app", "total")]
+        for bundle in bundles:
+            lines.append(
+                "%-40s %9.3fs %9.3fs %9.3fs"
+                % (
+                    bundle["name"],
+                    bundle["import_seconds"],
+                    bundle["init_app_seconds"],
+                    bundle["total_seconds"],
+                )
+            )
+            for entry in bundle["imports"][:3]:
+                lines.append("    %-36s %9.3fs" % (entry["module"], entry["seconds"]))
+
+        path = self._import_report_path
+        if os.path.isdir(path):
+            path = os.path.join(
+                path, "tk-shell-imports-%d-%d.json" % (os.getpid(), time.time())
+            )
+        try:
+            with open(path, "w") as report_file:
+                json.dump({"bundles": bundles}, report_file, indent=2)
+        except (IOError, OSError) as e:
+            self.logger.warning("Could not write the import report: %s", e)
+            path = None
+        self.logger.info(
+            "Import and init_app times by bundle%s:\n%s",
+            " written to %s" % path if path else "",
+            "\n".join(lines),
+        )
+        self._import_timer = None
+
+    ###################################################################################
+    # logging
+
+    def _setup_log_queue(self):
+        """
+        Write the stream handler records from a background thread, if requested.
+
+        This is configured with the ``TK_SHELL_LOG_QUEUE_SIZE`` and
+        ``TK_SHELL_LOG_QUEUE_OVERFLOW`` environment variables, as it happens
+        before the engine settings are available.
+        """
+        size = os.environ.get(LOG_QUEUE_SIZE_ENV_VAR)
+        if not size or six.PY2:
+            return
+
+        overflow = os.environ.get(LOG_QUEUE_OVERFLOW_ENV_VAR, "block")
+        if not size.isdigit() or overflow not in LOG_OVERFLOWS:
+            self._log.warning(
+                "Ignoring invalid log queue settings %s=%s, %s=%s",
+                LOG_QUEUE_SIZE_ENV_VAR,
+                size,
+                LOG_QUEUE_OVERFLOW_ENV_VAR,
+                overflow,
+            )
+            return
+        if not int(size):
+            return
+
+        log_queue = queue.Queue(int(size))
+        self._queue_handler = BoundedQueueHandler(log_queue, overflow)
+        self._queue_listener = BoundedQueueListener(
+            log_queue, self._stream_handler, respect_handler_level=True
+        )
+        self._queue_listener.start()
+        # Guarantee the queued records are written, even if the engine is never
+        # destroyed. Unregistered by _cleanup_logger, so restarted engines
+        # aren't kept alive.
+        atexit.register(self._queue_listener.stop)
+
+    def _reset_after_fork(self):
+        """
+        Log and count the commands without the threads of the parent process,
+        in a forked process, e.g. a fan-out worker.
+
+        Records are written directly by the stream handler rather than through
+        the log queue, which nothing would empty. The metrics spooler is
+        restarted and writes its last batch when the process exits.
+        """
+        self._forked = True
+        if self._queue_handler is not None:
+            self._log.removeHandler(self._queue_handler)
+            # the lock may have been held by the listener thread when forking
+            self._stream_handler.createLock()
             self._log.addHandler(self._stream_handler)
+            # the listener thread wasn't forked, stopping it would hang
+            atexit.unregister(self._queue_listener.stop)
+            self._queue_handler = None
+            self._queue_listener = None
+
+        if self._repeat_filter is not None:
+            self._repeat_filter.reset_after_fork()
+
+        if self._metrics_spooler is not None:
+            # only multiprocessing forks, and its workers don't run atexit
+            # handlers but its finalizers
+            import multiprocessing.util
+
+            self._metrics_spooler.reset_after_fork()
+            multiprocessing.util.Finalize(
+                self._metrics_spooler, self._metrics_spooler.stop, exitpriority=10
+            )
+
+    def _start_log_filter(self):
+        """
+        Collapse the identical messages logged through the ``log_*`` methods,
+        unless disabled.
+        """
+        limit = self._get_option("log_repeat_limit", LOG_REPEAT_LIMIT_ENV_VAR, 5)
+        window = self._get_option("log_repeat_window", LOG_REPEAT_WINDOW_ENV_VAR, 10.0)
+        if limit <= 0 or window <= 0:
+            return
+        self._repeat_filter = RepeatedLogFilter(self._log, window, limit)
+        self._log.addFilter(self._repeat_filter)
+
+    ###################################################################################
+    # commands
+
+    def post_app_init(self):
+        """Perform any command name replacements as necessary."""
+        # the apps are initialized
+        self._write_import_report()
+        with self._trace("post_app_init"):
+            self._register_shell_commands()
+            self._prepare_commands()
+
+    def post_context_change(self, old_context, new_context):
+        """
+        Rename the commands registered in the new context and rebuild the
+        dispatch table.
+        """
+        self._register_shell_commands()
+        self._prepare_commands()
+        # the cached dialogs belong to the apps of the previous context
+        if self._dialog_cache is not None:
+            self._dialog_cache.clear()
+
+    def _prepare_commands(self):
+        """
+        Rename the commands, build their dispatch table and record their names
+        for shell completion.
+
+        The result is cached for the most recently used contexts, so going back
+        to one of them only patches the short names again.
+        """
+        if self._command_tables is None:
+            self._command_tables = CommandTableCache(
+                self.get_setting("command_table_cache_size", default=8)
+            )
+
+        context_key = self.import_module("tk_shell").get_context_key(self.context)
+        requested = self.get_setting("replaced_commands_names", default={})
+        names = frozenset(
+            (key, info.get("properties", {}).get("short_name"))
+            for key, info in self.commands.items()
+        )
+
+        table = self._command_tables.get(context_key)
+        if table and table.names == names and table.requested == requested:
+            self.logger.debug("Reusing the commands prepared for %s", self.context)
+            with self._trace("rename commands"):
+                self._patch_short_names(table.replacements)
+            self._build_dispatch_table(table.dispatch_table)
+            return
+
+        with self._trace("rename commands"):
+            replacements = self._apply_name_replacements(requested)
+        self._build_dispatch_table(table.dispatch_table if table else None)
+        self._update_completion_cache()
+        self._command_tables.put(
+            context_key,
+            CommandTable(names, requested, replacements, self._dispatch_table),
+        )
+
+    def _apply_name_replacements(self, requested):
+        """
+        Patch the commands short names as requested.
+
+        The replacements are memoized, so they are only calculated again for the
+        commands which changed since the previous call, e.g. on context change.
 
-        super(ShellEngine, self).__init__(*args, **kwargs)
+        :param dict requested: The ``replaced_commands_names`` setting.
+        :returns: Command key names mapped to new short names.
+        """
+        if self._name_replacements is None:
+            self._name_replacements = NameReplacements(self.logger)
 
-    def post_app_init(self):
-        """Perform any command name replacements as necessary."""
-        requested = self.get_setting("replaced_commands_names", default={})
-        replacements = self.validated_name_replacements(requested)
+        replacements = self._name_replacements.update(requested, self.commands)
+        self._patch_short_names(replacements)
+        return replacements
+
+    def _patch_short_names(self, replacements):
+        """
+        Set the new short names of the commands.
+
+        The original short names are kept in the properties, so the commands
+        aren't renamed from their patched names by the next calculation.
+
+        :param dict replacements: Command key names mapped to new short names.
+        """
         for command_key, new_name in replacements.items():
-            self.logger.debug(
-                'Patching commands["%s"]["properties"]["short_name"] to: "%s"',
-                command_key,
-                new_name,
+            properties = self.commands[command_key]["properties"]
+            if properties.get("short_name") != new_name:
+                self.logger.debug(
+                    'Patching commands["%s"]["properties"]["short_name"] to: "%s"',
+                    command_key,
+                    new_name,
+                )
+                properties.setdefault(
+                    ORIGINAL_SHORT_NAME_PROPERTY, properties.get("short_name")
+                )
+                properties["short_name"] = new_name
+
+    def _get_config_fingerprint(self):
+        """
+        Get the fingerprint of the configuration files, see
+        :func:`tk_shell.completion.config_fingerprint`.
+
+        It walks the configuration folders, so it is only computed once per
+        engine, which is restarted when the configuration changes.
+
+        :returns: Hexadecimal digest.
+        """
+        if self._config_fingerprint is None:
+            completion = self.import_module("tk_shell").import_submodule("completion")
+            self._config_fingerprint = completion.config_fingerprint(
+                self.sgtk.pipeline_configuration.get_config_location()
             )
-            self.commands[command_key]["properties"]["short_name"] = new_name
+        return self._config_fingerprint
+
+    def _update_completion_cache(self):
+        """
+        Record the final command short names for shell completion.
+
+        The cache file is only written when the names or the configuration
+        changed, see :mod:`tk_shell.completion`. Forked processes, e.g. the
+        fan-out workers, leave it to their parent rather than all rewriting it.
+        """
+        if self._forked or not self.get_setting("completion_cache", default=True):
+            return
+
+        completion = self.import_module("tk_shell").import_submodule("completion")
+        pipeline_configuration = self.sgtk.pipeline_configuration
+        names = [
+            info["properties"]["short_name"]
+            for info in self.commands.values()
+            if info.get("properties", {}).get("short_name")
+        ]
+        try:
+            with self._trace("completion cache"):
+                updated = completion.update_cache(
+                    pipeline_configuration.get_path(),
+                    pipeline_configuration.get_config_location(),
+                    str(self.context),
+                    os.getcwd(),
+                    names,
+                    self._get_config_fingerprint(),
+                )
+        except (IOError, OSError) as e:
+            self.logger.debug("Could not update the completion cache: %s", e)
+        else:
+            if updated:
+                self.logger.debug("Updated the completion cache.")
 
     def validated_name_replacements(self, requested):
         """Calculate the final name replacements to perform.
@@ -81,52 +1549,204 @@ class ShellEngine(Engine):
         and that specific rename action will not occur.
 
         Args:
-            requested (dict): Old names mapped to new names to replace with.
+            requested (dict): Old names, or RenameRules patterns, mapped to
+                new names to replace with.
 
         Returns:
             dict: Command key names mapped to new shot names, if any.
         """
-        replacements = {}
-        current_names = {}
-        new_from_originals = collections.defaultdict(set)
+        return NameReplacements(self.logger).update(requested, self.commands)
 
-        for original_name, new_name in requested.items():
-            new_from_originals[new_name].add(original_name)
-        self.logger.debug("Initial new_from_originals: %s", new_from_originals)
+    def _register_shell_commands(self):
+        """
+        Register the commands provided by the engine itself, unless they still
+        are after a context change.
+        """
+        if "shell_batch" in self.commands:
+            return
 
-        for key, info in self.commands.items():
-            original_name = info.get("properties", {}).get("short_name")
-            if original_name:
-                current_names[original_name] = key
+        self.register_command(
+            "shell_batch",
+            self._run_batch,
+            {
+                "short_name": "shell_batch",
+                "description": (
+                    "Run the commands listed in a script or JSON lines file, "
+                    "one after the other, in this engine. Pass --continue to "
+                    "keep going after a failure and --summary=FILE to save "
+                    "the results as JSON."
+                ),
+            },
+        )
+        self.register_command(
+            "shell_fanout",
+            self._run_fanout,
+            {
+                "short_name": "shell_fanout",
+                "description": (
+                    "Run a command for every entity listed in a file, in "
+                    "parallel worker processes forked from this engine. Usage: "
+                    "shell_fanout COMMAND ENTITIES_FILE [--processes=N] [ARGS]"
+                ),
+            },
+        )
+        self.register_command(
+            "shell_repl",
+            self._run_repl,
+            {
+                "short_name": "shell_repl",
+                "description": (
+                    "Run the commands typed at an interactive prompt in this "
+                    "engine, with command name completion and history. Use "
+                    "context TYPE ID to switch context and exit to leave."
+                ),
+            },
+        )
+        self.register_command(
+            "shell_daemon",
+            self._serve_daemon,
+            {
+                "short_name": "shell_daemon",
+                "description": (
+                    "Keep this engine running and serve commands sent by the "
+                    "tk_shell client over a local Unix socket."
+                ),
+            },
+        )
+
+    def _run_repl(self):
+        """
+        Run commands typed at an interactive prompt until the user leaves it.
+        """
+        repl = self.import_module("tk_shell").import_submodule("repl")
+        history_path = self.get_setting("repl_history_file", default="")
+        shell = repl.EngineShell(
+            self, os.path.expanduser(history_path or repl.get_history_path())
+        )
+        shell.run()
+
+    def _run_batch(self, path, *options):
+        """
+        Run the commands listed in a batch file.
 
-                if original_name not in requested:
-                    new_from_originals[original_name].add(original_name)
+        :param str path: Path to a script or JSON lines batch file.
+        :param options: ``--continue`` to run all commands even if some fail,
+            ``--summary=FILE`` to write the results to a JSON file.
+        :raises TankError: If any of the commands failed.
+        """
+        batch = self.import_module("tk_shell").import_submodule("batch")
+
+        stop_on_error = True
+        summary_path = None
+        for option in options:
+            if option == "--continue":
+                stop_on_error = False
+            elif option.startswith("--summary="):
+                summary_path = option.split("=", 1)[1]
+            else:
+                raise TankError('Unknown shell_batch option "%s".' % option)
 
-        self.logger.debug("Final current_names: %s", current_names)
-        self.logger.debug("Final new_from_originals: %s", new_from_originals)
+        runner = batch.BatchRunner(self, stop_on_error=stop_on_error)
+        results = runner.run(batch.read_batch_file(path))
+        runner.log_summary(results)
+        if summary_path:
+            batch.write_summary(results, summary_path)
 
-        for new_name, original_names in sorted(new_from_originals.items()):
-            if len(original_names) > 1:
-                self.logger.warn(
-                    'IGNORING creating new "%s" command name from 2 or more '
-                    'clashing, original names: "%s"',
-                    new_name,
-                    '", "'.join(map(str, original_names)),
+        failed = [result for result in results if not result.success]
+        if failed:
+            raise TankError(
+                "%d of %d batch commands failed." % (len(failed), len(results))
+            )
+
+    def _run_fanout(self, command, entities_path, *args):
+        """
+        Run a command for many entities in parallel.
+
+        :param str command: Key or short name of the command to run.
+        :param str entities_path: File listing an entity per line.
+        :param args: ``--processes=N`` to set the number of worker processes,
+            which defaults to the number of cores, followed by the arguments
+            passed to the command.
+        :raises TankError: If the command failed for any of the entities.
+        """
+        fanout = self.import_module("tk_shell").import_submodule("fanout")
+
+        args = list(args)
+        processes = None
+        if args and args[0].split("=", 1)[0] == "--processes":
+            option = args.pop(0)
+            value = option.partition("=")[2]
+            if not value.isdigit() or not int(value):
+                raise TankError(
+                    'Invalid shell_fanout option "%s", the number of processes must '
+                    "be a positive integer. Usage: shell_fanout COMMAND "
+                    "ENTITIES_FILE [--processes=N] [ARGS]" % option
                 )
-            else:
-                original_name = list(original_names)[0]
-                command_key = current_names.get(original_name)
-                if original_name != new_name and command_key:
-                    replacements[command_key] = new_name
+            processes = int(value)
+
+        cmd_key = self.resolve_command_key(command)
+        entities = fanout.read_entities(entities_path)
+
+        start = time.time()
+        results = fanout.fan_out(self, cmd_key, args, entities, processes)
+        failed = [result for result in results if not result.success]
+        self.logger.info(
+            "Ran %s for %d entities in %.3fs using %d processes, %d failed.",
+            command,
+            len(results),
+            time.time() - start,
+            len(set(result.pid for result in results)),
+            len(failed),
+        )
+        if fanout.exit_status(results):
+            raise TankError(
+                "%s failed for %d of %d entities."
+                % (command, len(failed), len(results))
+            )
 
-        return replacements
+    def _serve_daemon(self):
+        """
+        Serve commands to the tk_shell client until the daemon is idle.
+
+        The socket path can be set with the ``TK_SHELL_DAEMON_SOCKET``
+        environment variable, so farm wrappers know where to find it.
+        """
+        tk_shell = self.import_module("tk_shell")
+        daemon = tk_shell.import_submodule("daemon")
+        socket_path = os.environ.get(tk_shell.import_submodule("client").SOCKET_ENV_VAR)
+        if not socket_path:
+            socket_path = daemon.get_socket_path(
+                self.sgtk.pipeline_configuration.get_path(), self.context
+            )
+        engine_daemon = daemon.EngineDaemon(
+            self, socket_path, self.get_setting("daemon_idle_timeout", default=900)
+        )
+        engine_daemon.serve_forever()
 
     def destroy_engine(self):
         """
         Called when engine is destroyed.
 
-        This will remove the logger.
+        This will write the trace, if tracing, and the last metrics batch, stop
+        the thread pool, close the event loop, cancel the queued commands and
+        remove the logger.
         """
+        self._write_trace()
+        if self._metrics_spooler is not None:
+            self._metrics_spooler.stop()
+            self._metrics_spooler = None
+        if self._thread_pool is not None:
+            self._thread_pool.shutdown(wait=False)
+            self._thread_pool = None
+        if self._event_loop is not None:
+            self._event_loop.close()
+            self._event_loop = None
+        if self._dialog_cache is not None:
+            self._dialog_cache.clear()
+            self._dialog_cache = None
+        if self._command_queue is not None:
+            self._command_queue.clear()
+            self._command_queue = None
         self._cleanup_logger()
 
     def __del__(self):
@@ -141,7 +1761,34 @@ class ShellEngine(Engine):
     def _cleanup_logger(self):
         """
         Removes the stream handler if it exists from the current logger.
+
+        When logging through a queue, the queued records are written first.
         """
+        if self._repeat_filter is not None:
+            self._log.removeFilter(self._repeat_filter)
+            self._repeat_filter.flush()
+            self._repeat_filter = None
+
+        if self._queue_handler is not None:
+            self._log.removeHandler(self._queue_handler)
+            atexit.unregister(self._queue_listener.stop)
+            self._queue_listener.stop()
+            if self._queue_handler.dropped:
+                self._stream_handler.handle(
+                    self._log.makeRecord(
+                        self._log.name,
+                        logging.WARNING,
+                        __file__,
+                        0,
+                        "%d log records were dropped as the log queue was full.",
+                        (self._queue_handler.dropped,),
+                        None,
+                    )
+                )
+            self._queue_handler = None
+            self._queue_listener = None
+            self._stream_handler = None
+
         if self._stream_handler is not None:
             self._log.removeHandler(self._stream_handler)
             self._stream_handler = None
@@ -157,6 +1804,7 @@ class ShellEngine(Engine):
         # Testing for UI this way allows the tank shell command to show UIs afte45
 
         # a QApplication has been created.
+        self._resolve_qt()
         if self._has_qt:
             from tank.platform.qt import QtGui
 
@@ -184,67 +1832,337 @@ class ShellEngine(Engine):
     ###################################################################################
     # command handling
 
-    def execute_command(self, cmd_key, args):
+    def _build_dispatch_table(self, previous=None):
         """
-        Executes a given command.
+        Build the :class:`CommandSpec` of every registered command.
+
+        Callbacks which can't be introspected are left out, the error will be
+        raised if the command is executed.
+
+        :param dict previous: Dispatch table of the same commands, registered
+            earlier, to reuse the specs of.
+        """
+        self._dispatch_table = {}
+        previous = previous or {}
+        # specs by code, as apps often register closures of the same function
+        specs = {}
+        for key, info in self.commands.items():
+            callback = info["callback"]
+            spec = previous.get(key) or specs.get(CommandSpec._get_code(callback))
+            try:
+                if spec is None:
+                    spec = CommandSpec(callback)
+                else:
+                    spec = spec.rebind(callback)
+            except TypeError:
+                continue
+            if spec.code is not None:
+                specs[spec.code] = spec
+            self._dispatch_table[key] = spec
+
+    def _get_command_spec(self, cmd_key):
         """
-        cb = self.commands[cmd_key]["callback"]
+        Get the :class:`CommandSpec` of a command.
 
-        getargspec = inspect.getargspec if six.PY2 else inspect.getfullargspec
+        The spec is rebuilt if the command was registered again since the
+        dispatch table was built.
 
-        # make sure the number of parameters to the command are correct
-        cb_arg_spec = getargspec(cb)
-        cb_arg_list = cb_arg_spec[0]
-        cb_var_args = cb_arg_spec[1]
+        :param str cmd_key: Key of the command in :attr:`commands`.
+        :returns: The :class:`CommandSpec` for the command.
+        """
+        callback = self.commands[cmd_key]["callback"]
+        spec = self._dispatch_table.get(cmd_key)
+        if spec is None:
+            spec = self._dispatch_table[cmd_key] = CommandSpec(callback)
+        elif spec.callback is not callback:
+            spec = self._dispatch_table[cmd_key] = spec.rebind(callback)
+        return spec
+
+    def _wrap_callback(self, cmd_key, spec):
+        """
+        Wrap a command callback with the command hooks, if any, and the result
+        cache if the command is cacheable.
+
+        Coroutine callbacks are run to completion on the engine event loop
+        first, so the hooks and the cache see a plain function. The items of
+        generator callbacks are streamed to the output as they are yielded, and
+        their results are never cached.
+
+        Each hook is called as ``hook(cmd_key, call)``, ``call`` running the
+        callback, or the next hook, and must return its result. Hooks are
+        installed by :meth:`init_engine`, the wrapped callback is then reused
+        until the command is registered again.
+
+        :param str cmd_key: Key of the command in :attr:`commands`.
+        :param spec: The :class:`CommandSpec` of the command.
+        :returns: The callback, wrapped if needed.
+        """
+        wrapped = self._wrapped_callbacks.get(cmd_key)
+        if wrapped is not None and wrapped[0] is spec:
+            return wrapped[1]
+        callback = self._wrap_spec(cmd_key, spec)
+        self._wrapped_callbacks[cmd_key] = (spec, callback)
+        return callback
+
+    def _wrap_spec(self, cmd_key, spec):
+        """
+        Wrap a command callback, see :meth:`_wrap_callback`.
+        """
+        callback = spec.callback
+        if spec.is_coroutine:
+            callback = functools.partial(self._run_coroutine, callback)
+        elif spec.is_generator:
+            callback = functools.partial(self._stream_results, cmd_key, callback)
+
+        properties = self.commands.get(cmd_key, {}).get("properties", {})
+        cacheable = properties.get("cacheable", False) and not spec.is_generator
+        if not self._command_hooks and not cacheable:
+            return callback
+
+        def wrapped(*args):
+            call = functools.partial(callback, *args)
+            for hook in self._command_hooks:
+                call = functools.partial(hook, cmd_key, call)
+            if cacheable:
+                return self._call_cached(cmd_key, args, call)
+            return call()
+
+        return wrapped
+
+    def _get_result_cache(self):
+        """
+        Get the cache of the cacheable commands results, created on first use.
 
-        if hasattr(cb, "__self__"):
-            # first argument to cb will be class instance:
-            cb_arg_list = cb_arg_list[1:]
+        :returns: A :class:`tk_shell.result_cache.ResultCache`.
+        """
+        if self._result_cache is None:
+            tk_shell = self.import_module("tk_shell")
+            result_cache = tk_shell.import_submodule("result_cache")
+            folder = self.get_setting("command_cache_folder", default="") or None
+            if folder:
+                try:
+                    result_cache.check_folder(folder)
+                except (IOError, OSError) as e:
+                    self.logger.warning(
+                        "Only caching the command results in memory: %s", e
+                    )
+                    folder = None
+            self._result_cache = result_cache.ResultCache(
+                self.get_setting("command_cache_size", default=64), folder
+            )
+        return self._result_cache
 
-        # ensure the correct/minimum number of arguments have been passed:
-        have_expected_args = False
-        if cb_var_args:
-            have_expected_args = len(args) >= len(cb_arg_list)
-        else:
-            have_expected_args = len(args) == len(cb_arg_list)
+    def _call_cached(self, cmd_key, args, call):
+        """
+        Run a cacheable command, unless a result is cached for the same
+        context, command and arguments.
+
+        Commands declare themselves cacheable with the ``cacheable`` property,
+        and can set how many seconds their results are valid for with the
+        ``cache_ttl`` property. Errors are never cached, and callers get a
+        copy of the cached results, see :mod:`tk_shell.result_cache`.
+
+        :param str cmd_key: Key of the command in :attr:`commands`.
+        :param tuple args: Arguments of the command.
+        :param call: Runs the command and returns its result.
+        :returns: The result of the command.
+        """
+        tk_shell = self.import_module("tk_shell")
+        cache = self._get_result_cache()
+        key = tk_shell.import_submodule("result_cache").get_result_key(
+            tk_shell.get_context_key(self.context), cmd_key, args
+        )
+        found, result = cache.get(cmd_key, key)
+        if found:
+            self.logger.debug("Using the cached result of %s%r", cmd_key, args)
+            return result
+
+        result = call()
+        properties = self.commands[cmd_key].get("properties", {})
+        ttl = properties.get("cache_ttl")
+        if ttl is None:
+            ttl = self.get_setting("command_cache_ttl", default=300.0)
+        cache.put(cmd_key, key, result, ttl)
+        return result
+
+    def invalidate_command_cache(self, cmd_key=None):
+        """
+        Discard the cached results of a command, e.g. after it changed the data
+        it reads, or of every command.
+
+        Results stored in the ``command_cache_folder`` are discarded for other
+        processes too.
+
+        :param str cmd_key: Key of the command in :attr:`commands`, all of them
+            if None.
+        """
+        self._get_result_cache().invalidate(cmd_key)
+
+    def get_event_loop(self):
+        """
+        Get the asyncio event loop coroutine commands are run on.
+
+        The same loop is used for every command, and is closed when the engine
+        is destroyed.
+
+        :returns: An ``asyncio`` event loop.
+        :raises TankError: On Python 2.
+        """
+        if six.PY2:
+            raise TankError("Coroutine commands require Python 3.")
+        if self._event_loop is None:
+            import asyncio
+
+            self._event_loop = asyncio.new_event_loop()
+        return self._event_loop
+
+    @property
+    def thread_pool(self):
+        """
+        Thread pool shared by the commands to run blocking calls, e.g. Shotgun
+        or filesystem requests, concurrently.
+
+        Its size is set with the ``thread_pool_size`` setting.
+
+        :returns: A ``concurrent.futures.ThreadPoolExecutor``.
+        :raises TankError: On Python 2.
+        """
+        if six.PY2:
+            raise TankError("The thread pool requires Python 3.")
+        if self._thread_pool is None:
+            from concurrent.futures import ThreadPoolExecutor
+
+            self._thread_pool = ThreadPoolExecutor(
+                self.get_setting("thread_pool_size", default=8),
+                thread_name_prefix="tk-shell",
+            )
+        return self._thread_pool
+
+    def run_in_executor(self, func, *args, **kwargs):
+        """
+        Run a blocking call in the :attr:`thread_pool`, from a coroutine
+        command, e.g.::
+
+            async def list_versions(self, *shots):
+                return await asyncio.gather(
+                    *(engine.run_in_executor(find_versions, shot) for shot in shots)
+                )
+
+        :param func: Function to call.
+        :returns: An ``asyncio`` future of the result of the call.
+        """
+        return self.get_event_loop().run_in_executor(
+            self.thread_pool, functools.partial(func, *args, **kwargs)
+        )
+
+    def _run_coroutine(self, coroutine_function, *args):
+        """
+        Run a coroutine command until it completes.
+
+        When called from the main thread with a QApplication, Qt events are
+        processed every :data:`QT_EVENTS_INTERVAL` while the coroutine waits,
+        so the dialogs it opens keep working.
 
-        if not have_expected_args:
-            expected_args = list(cb_arg_list)
-            if cb_var_args:
-                expected_args.append("*%s" % cb_var_args)
+        :param coroutine_function: The ``async def`` command callback.
+        :param args: Arguments of the command.
+        :returns: The result of the coroutine.
+        :raises TankError: If the event loop is already running, i.e. when
+            called from another coroutine command.
+        """
+        loop = self.get_event_loop()
+        if loop.is_running():
             raise TankError(
-                "Cannot run command! Expected command arguments (%s)"
-                % ", ".join(expected_args)
+                "Coroutine commands can't be run from another coroutine command, "
+                "await the coroutine instead."
             )
 
-        if not self._has_qt:
+        qt_application = None
+        if self._has_qt and _in_main_thread():
+            from sgtk.platform.qt import QtGui
+
+            qt_application = QtGui.QApplication.instance()
+
+        pending = []
+
+        def process_qt_events():
+            qt_application.processEvents()
+            pending[:] = [loop.call_later(QT_EVENTS_INTERVAL, process_qt_events)]
+
+        if qt_application is not None:
+            pending.append(loop.call_soon(process_qt_events))
+        try:
+            return loop.run_until_complete(coroutine_function(*args))
+        finally:
+            for handle in pending:
+                handle.cancel()
+
+    def _stream_results(self, cmd_key, generator_function, *args):
+        """
+        Run a generator command, writing each item it yields as a JSON line to
+        the output_fd file descriptor, followed by a status line.
+
+        :param str cmd_key: Key of the command in :attr:`commands`.
+        :param generator_function: The generator command callback.
+        :param args: Arguments of the command.
+        :returns: The number of items written.
+        """
+        fd = self._get_option("output_fd", OUTPUT_FD_ENV_VAR, 1)
+        streaming = self.import_module("tk_shell").import_submodule("streaming")
+        return streaming.stream_results(cmd_key, generator_function(*args), fd)
+
+    def resolve_command_key(self, name):
+        """
+        Find the key of a command from either its key or its short name.
+
+        :param str name: Command key or short name, as typed after ``tank``.
+        :returns: The matching key in :attr:`commands`.
+        :raises TankError: If no command matches.
+        """
+        if name in self.commands:
+            return name
+
+        for key, info in self.commands.items():
+            if info.get("properties", {}).get("short_name") == name:
+                return key
+
+        raise TankError('Unknown command "%s".' % name)
+
+    def execute_command(self, cmd_key, args):
+        """
+        Executes a given command.
+        """
+        spec = self._get_command_spec(cmd_key)
+
+        # make sure the number of parameters to the command are correct
+        if not spec.accepts(len(args)):
+            raise TankError(spec.error_message)
+
+        cb = self._wrap_callback(cmd_key, spec)
+
+        if not self._uses_qt(cmd_key):
             # QT not available - just run the command straight
-            return cb(*args)
+            result = cb(*args)
+            # in lazy Qt mode, headless commands can still open dialogs
+            if self._ui_created:
+                self._wait_for_dialogs()
+            return result
         else:
             from sgtk.platform.qt import QtCore, QtGui
 
-            # we got QT capabilities. Start a QT app and fire the command into the app
-            tk_shell = self.import_module("tk_shell")
-            t = tk_shell.Task(self, cb, args)
-
             # start up our QApp now, if none is already running
             qt_application = None
             if not QtGui.QApplication.instance():
-                # We need to clear Qt library paths on Linux if KDE is the active environment.
-                # This resolves issues with mismatched Qt libraries between the OS and the
-                # application being launched if it is a DCC that comes with a bundled Qt.
-                # It appears to only need to be fixed in PySide (1), PySide2 is fine.
-                if (
-                    tank.util.is_linux()
-                    and os.environ.get("KDE_FULL_SESSION") is not None
-                    and QtCore.qVersion()[0] == "4"
-                ):
-
-                    QtGui.QApplication.setLibraryPaths([])
-
-                qt_application = QtGui.QApplication([])
-                qt_application.setWindowIcon(QtGui.QIcon(self.icon_256))
-                self._initialize_dark_look_and_feel()
+                qt_application = self._create_qt_application()
+            elif self.get_setting("queue_commands", default=False):
+                # run it from the event loop once the queued commands are done,
+                # rather than nested in the caller
+                return self.queue_command(cmd_key, args)
+
+            # we got QT capabilities. Start a QT app and fire the command into the app
+            tk_shell = self.import_module("tk_shell")
+            # a worker thread needs our event loop to report back to
+            threaded = qt_application is not None and self._runs_in_thread(cmd_key)
+            t = tk_shell.get_task_class()(self, cb, args, threaded=threaded)
 
             # if we didn't start the QApplication here, leave the responsibility
             # to run the exec loop and quit to the initial creator of the QApplication
@@ -262,20 +2180,205 @@ class ShellEngine(Engine):
                 # we can run the command now, as the QApp is already started
                 t.run_command()
 
+    def queue_command(self, cmd_key, args, priority=None):
+        """
+        Queues a command to run from the event loop of the running QApplication.
+
+        Queued commands run one after another, highest priority first, and a
+        command queued from another one only starts once it returned. No UI
+        command starts while ``max_ui_commands`` of them have windows shown.
+
+        :param str cmd_key: Key of the command in :attr:`commands`.
+        :param list args: Command arguments.
+        :param int priority: Priority of the command, higher first. The
+            ``priority`` command property, or 0, by default.
+        :returns: A :class:`tk_shell.command_queue.CommandHandle`.
+        :raises TankError: If the arguments are invalid or no QApplication
+            is running.
+        """
+        spec = self._get_command_spec(cmd_key)
+        if not spec.accepts(len(args)):
+            raise TankError(spec.error_message)
+
+        properties = self.commands[cmd_key]["properties"]
+        if priority is None:
+            priority = properties.get("priority", 0)
+        return self._get_command_queue().submit(
+            cmd_key,
+            self._wrap_callback(cmd_key, spec),
+            args,
+            priority,
+            bool(properties.get("requires_ui")),
+        )
+
+    def _get_command_queue(self):
+        """
+        Get the queue of the commands, created on first use.
+
+        :returns: A :class:`tk_shell.command_queue.CommandQueue`.
+        :raises TankError: If no QApplication is running.
+        """
+        if self._command_queue is None:
+            if self._lazy_qt and self._qt_base is None:
+                self._resolve_qt()
+            if not self._has_qt:
+                raise TankError("Commands can only be queued when Qt is available.")
+            from sgtk.platform.qt import QtGui
+
+            if not QtGui.QApplication.instance():
+                raise TankError("Commands can only be queued in a QApplication.")
+            tk_shell = self.import_module("tk_shell")
+            self._command_queue = tk_shell.get_command_queue_class()(
+                self, self.get_setting("max_ui_commands", default=0)
+            )
+        return self._command_queue
+
+    def run_command(self, cmd_key, args):
+        """
+        Runs a command within an engine session running many commands.
+
+        Unlike :meth:`execute_command`, errors raised by the command are not
+        logged and swallowed but propagated to the caller. When Qt is available,
+        a single ``QApplication`` is created and then reused by every command,
+        and this call only returns once the dialogs opened by the command have
+        been closed.
+
+        :param str cmd_key: Key of the command in :attr:`commands`.
+        :param list args: Command arguments.
+        :returns: The value returned by the command callback.
+        """
+        spec = self._get_command_spec(cmd_key)
+        if not spec.accepts(len(args)):
+            raise TankError(spec.error_message)
+
+        if self._uses_qt(cmd_key):
+            qt_application = self._ensure_qt_application()
+            # Closing the dialogs of a command must not end the whole session.
+            qt_application.setQuitOnLastWindowClosed(False)
+
+        try:
+            return self._wrap_callback(cmd_key, spec)(*args)
+        finally:
+            self._wait_for_dialogs()
+
+    def change_entity_context(self, entity):
+        """
+        Switch the engine to the context of an entity, if it is not current.
+
+        :param dict entity: Entity dictionary with ``type`` and ``id`` keys.
+        """
+        context = self.sgtk.context_from_entity(entity["type"], entity["id"])
+        if context != self.context:
+            tank.platform.change_context(context)
+
+    def _runs_in_thread(self, cmd_key):
+        """
+        Check if a command should be run in a worker thread under Qt.
+
+        :param str cmd_key: Key of the command in :attr:`commands`.
+        :returns: The ``run_in_thread`` command property if set, the
+            ``run_commands_in_thread`` setting otherwise.
+        """
+        run_in_thread = self.commands[cmd_key]["properties"].get("run_in_thread")
+        if run_in_thread is None:
+            return self.get_setting("run_commands_in_thread", default=False)
+        return bool(run_in_thread)
+
+    def _uses_qt(self, cmd_key):
+        """
+        Check if a command should be run within a QApplication.
+
+        In lazy Qt mode, Qt is only imported upfront for the commands with a
+        truthy ``requires_ui`` property.
+
+        :param str cmd_key: Key of the command in :attr:`commands`.
+        :returns: True if the command should be run through Qt.
+        """
+        if self._lazy_qt and self._qt_base is None:
+            if not self.commands[cmd_key]["properties"].get("requires_ui"):
+                return False
+            self._resolve_qt()
+        return self._has_qt
+
+    def _ensure_qt_application(self):
+        """
+        Get the running QApplication, creating it if needed.
+
+        :returns: The ``QApplication`` instance.
+        """
+        from sgtk.platform.qt import QtGui
+
+        return QtGui.QApplication.instance() or self._create_qt_application()
+
+    def _create_qt_application(self):
+        """
+        Creates the QApplication used to run commands with a UI.
+
+        :returns: The new ``QApplication``.
+        """
+        with self._trace("QApplication"):
+            from sgtk.platform.qt import QtCore, QtGui
+
+            # We need to clear Qt library paths on Linux if KDE is the active environment.
+            # This resolves issues with mismatched Qt libraries between the OS and the
+            # application being launched if it is a DCC that comes with a bundled Qt.
+            # It appears to only need to be fixed in PySide (1), PySide2 is fine.
+            if (
+                tank.util.is_linux()
+                and os.environ.get("KDE_FULL_SESSION") is not None
+                and QtCore.qVersion()[0] == "4"
+            ):
+
+                QtGui.QApplication.setLibraryPaths([])
+
+            qt_application = QtGui.QApplication([])
+            qt_application.setWindowIcon(QtGui.QIcon(self.icon_256))
+            self._initialize_dark_look_and_feel()
+            return qt_application
+
+    def _wait_for_dialogs(self):
+        """
+        Processes Qt events until the dialogs requested so far are all closed.
+        """
+        if not self._ui_created:
+            return
+
+        from sgtk.platform.qt import QtCore, QtGui
+
+        qt_application = QtGui.QApplication.instance()
+
+        def quit_when_closed():
+            if not any(w.isVisible() for w in qt_application.topLevelWidgets()):
+                loop.quit()
+
+        # Polling is used rather than lastWindowClosed, which is only emitted
+        # while the QApplication exec loop is running.
+        loop = QtCore.QEventLoop()
+        timer = QtCore.QTimer()
+        timer.timeout.connect(quit_when_closed)
+        timer.start(200)
+        loop.exec_()
+        timer.stop()
+
+        self._ui_created = False
+
     ###################################################################################
     # logging interfaces
 
-    def log_debug(self, msg):
-        self._log.debug(msg)
+    # The messages are only formatted with the arguments if the level is enabled,
+    # e.g. engine.log_debug("Found %d files in %s", len(files), path).
+
+    def log_debug(self, msg, *args):
+        self._log.debug(msg, *args)
 
-    def log_info(self, msg):
-        self._log.info(msg)
+    def log_info(self, msg, *args):
+        self._log.info(msg, *args)
 
-    def log_warning(self, msg):
-        self._log.warning(msg)
+    def log_warning(self, msg, *args):
+        self._log.warning(msg, *args)
 
-    def log_error(self, msg):
-        self._log.error(msg)
+    def log_error(self, msg, *args):
+        self._log.error(msg, *args)
 
     ###################################################################################
     # metrics
@@ -298,8 +2401,147 @@ class ShellEngine(Engine):
     def _define_qt_base(self):
         """
         Define the QT environment.
+
+        With the ``lazy_qt`` setting, proxies are returned and the bindings are
+        only imported when first used, see :meth:`_resolve_qt`.
+        """
+        if self._use_lazy_qt():
+            self._lazy_qt = True
+            return dict(
+                (name, LazyQtProxy(self, name))
+                for name in ("qt_core", "qt_gui", "dialog_base")
+            )
+
+        self._start_tracing()
+        with self._trace("define_qt_base"):
+            return self._define_qt_bindings()
+
+    def _define_qt5_base(self):
+        """
+        Define the PySide2 environment, lazily with the ``lazy_qt`` setting.
+
+        Only the :data:`LAZY_QT5_MODULES` are available until the bindings are
+        imported.
+        """
+        if self._use_lazy_qt():
+            self._lazy_qt = True
+            return dict((name, LazyQtProxy(self, name)) for name in LAZY_QT5_MODULES)
+
+        return self._detect_qt5_base()
+
+    def _use_lazy_qt(self):
+        """
+        Check if the Qt bindings import is deferred by the ``lazy_qt`` setting.
+
+        The main thread invokers are created by a private method of the Toolkit
+        engine once the bindings are imported, so Qt is defined right away with
+        Toolkit cores which don't have it.
+
+        :returns: True if the Qt bindings are lazily imported.
+        """
+        if not self.get_setting("lazy_qt", default=False):
+            return False
+        if not hasattr(self, "_Engine__create_invokers"):
+            self.logger.debug(
+                "The lazy_qt setting isn't supported by this Toolkit core."
+            )
+            return False
+        return True
+
+    def _resolve_qt(self):
+        """
+        Import the Qt bindings if this was deferred by the ``lazy_qt`` setting.
+
+        The Toolkit ``qt`` and ``qt5`` modules, and the Qt modules of the
+        authentication dialogs, are updated with the real bindings, as Toolkit
+        does when the engine starts. Only code which got hold of a proxy before
+        keeps using it.
+
+        :returns: The Qt base definitions, qt5 modules included, or None if Qt
+            is not lazily loaded.
+        """
+        if not self._lazy_qt or self._qt_base is not None:
+            return self._qt_base
+
+        from tank.authentication.ui import qt_abstraction
+        from tank.platform import qt, qt5
+
+        with self._trace("define_qt_base (lazy)"):
+            self._qt_base = self._define_qt_bindings()
+        qt.QtCore = self._qt_base["qt_core"]
+        qt.QtGui = self._qt_base["qt_gui"]
+        qt.TankDialogBase = self._qt_base["dialog_base"]
+        qt_abstraction.QtCore = qt.QtCore
+        qt_abstraction.QtGui = qt.QtGui
+
+        qt5_base = self._detect_qt5_base()
+        for name, value in qt5_base.items():
+            setattr(qt5, name, value)
+        self._qt_base.update(qt5_base)
+
+        # The main thread invokers could not be created without Qt, see
+        # _use_lazy_qt.
+        if self._has_qt:
+            self._invoker, self._async_invoker = self._Engine__create_invokers()
+
+        self.logger.debug("Lazily imported Qt bindings.")
+        return self._qt_base
+
+    def _detect_qt_base(self):
+        """
+        Let Toolkit import the Qt bindings, only trying the binding found by
+        the previous starts in the same Python environment.
+
+        Without the ``qt_detection_cache`` setting, Toolkit tries every binding.
+
+        :returns: The Qt base definitions from Toolkit.
         """
+        if not self.get_setting("qt_detection_cache", default=True):
+            return super(ShellEngine, self)._define_qt_base()
+
+        qt_detection = self.import_module("tk_shell").import_submodule("qt_detection")
+        key = qt_detection.get_environment_key()
+        entry = qt_detection.read_entry(key)
+        if entry is not None:
+            with qt_detection.only_binding(entry["binding"]):
+                base = super(ShellEngine, self)._define_qt_base()
+            if bool(base["qt_gui"]) == bool(entry["binding"]):
+                self._qt_detection = entry
+                return base
+            self.logger.debug("The recorded Qt bindings can't be imported anymore.")
+
         base = super(ShellEngine, self)._define_qt_base()
+        binding = qt_detection.get_binding(base["qt_core"]) if base["qt_gui"] else None
+        if base["qt_gui"] and binding is None:
+            # unknown bindings, always let Toolkit look for them
+            return base
+        try:
+            qt_detection.write_entry(key, binding)
+        except (IOError, OSError) as e:
+            self.logger.debug("Could not record the Qt bindings: %s", e)
+        else:
+            self.logger.debug("Recorded the %s Qt bindings.", binding or "missing")
+        return base
+
+    def _detect_qt5_base(self):
+        """
+        Define the PySide2 environment, without trying any binding if none was
+        found, see :meth:`_detect_qt_base`.
+
+        :returns: The Qt5 base definitions from Toolkit.
+        """
+        if self._qt_detection and self._qt_detection["binding"] is None:
+            tk_shell = self.import_module("tk_shell")
+            qt_detection = tk_shell.import_submodule("qt_detection")
+            with qt_detection.only_binding(None):
+                return super(ShellEngine, self)._define_qt5_base()
+        return super(ShellEngine, self)._define_qt5_base()
+
+    def _define_qt_bindings(self):
+        """
+        Import the Qt bindings and define the QT environment.
+        """
+        base = self._detect_qt_base()
 
         if not base["qt_gui"]:
             self._has_qt = False
@@ -324,8 +2566,9 @@ class ShellEngine(Engine):
             # Tell QT4 to interpret C strings as utf-8.
             # On PySide2 we patch QTextCodec with a do-nothing stub
             # for setCodecForCStrings(), so this will have no effect.
-            utf8 = QtCore.QTextCodec.codecForName("utf-8")
-            QtCore.QTextCodec.setCodecForCStrings(utf8)
+            if not self._qt_detection or self._qt_detection["set_codec"]:
+                utf8 = QtCore.QTextCodec.codecForName("utf-8")
+                QtCore.QTextCodec.setCodecForCStrings(utf8)
 
             # a simple dialog proxy that pushes the window forward
             class ProxyDialogPyQt(QtGui.QDialog):
@@ -368,6 +2611,7 @@ class ShellEngine(Engine):
 
         :returns: the created widget_class instance
         """
+        self._resolve_qt()
         if not self._has_qt:
             self.log_error(
                 "Cannot show dialog %s! No QT support appears to exist in this engine. "
@@ -376,7 +2620,26 @@ class ShellEngine(Engine):
             )
             return
 
+        if not _in_main_thread():
+            # widgets can only be created in the main thread, e.g. for commands
+            # run in a worker thread
+            return self.execute_in_main_thread(
+                self.show_dialog, title, bundle, widget_class, *args, **kwargs
+            )
+
         self._ui_created = True
+        if self._lazy_qt:
+            # headless commands are not run within a QApplication in lazy mode
+            self._ensure_qt_application()
+
+        if self._get_dialog_cache() is not None:
+            dialog, widget = self._get_cached_dialog(
+                title, bundle, widget_class, args, kwargs
+            )
+            dialog.show()
+            dialog.activateWindow()
+            dialog.raise_()
+            return widget
 
         return Engine.show_dialog(self, title, bundle, widget_class, *args, **kwargs)
 
@@ -398,6 +2661,7 @@ class ShellEngine(Engine):
         :returns: (a standard QT dialog status return code, the created widget_class
             instance)
         """
+        self._resolve_qt()
         if not self._has_qt:
             self.log_error(
                 "Cannot show dialog %s! No QT support appears to exist in this engine. "
@@ -406,6 +2670,66 @@ class ShellEngine(Engine):
             )
             return
 
+        if not _in_main_thread():
+            # widgets can only be created in the main thread, e.g. for commands
+            # run in a worker thread
+            return self.execute_in_main_thread(
+                self.show_modal, title, bundle, widget_class, *args, **kwargs
+            )
+
         self._ui_created = True
+        if self._lazy_qt:
+            # headless commands are not run within a QApplication in lazy mode
+            self._ensure_qt_application()
+
+        if self._get_dialog_cache() is not None:
+            dialog, widget = self._get_cached_dialog(
+                title, bundle, widget_class, args, kwargs
+            )
+            return dialog.exec_(), widget
 
         return Engine.show_modal(self, title, bundle, widget_class, *args, **kwargs)
+
+    def _get_dialog_cache(self):
+        """
+        Get the cache of the dialogs, if enabled with the ``dialog_cache_size``
+        setting.
+
+        :returns: A :class:`tk_shell.dialog_cache.DialogCache`, or None.
+        """
+        if self._dialog_cache is None:
+            size = self.get_setting("dialog_cache_size", default=0)
+            if size <= 0:
+                return None
+            tk_shell = self.import_module("tk_shell")
+            self._dialog_cache = tk_shell.get_dialog_cache_class()(size)
+        return self._dialog_cache
+
+    def _get_cached_dialog(self, title, bundle, widget_class, args, kwargs):
+        """
+        Get the dialog previously created for the same bundle, widget class and
+        title, or create it.
+
+        Widgets shown again have their :data:`DIALOG_RESHOW_METHOD`, if any,
+        called with the arguments which would have been passed to their
+        constructor, so they can refresh their state.
+
+        :returns: A ``(dialog, widget)`` tuple.
+        """
+        key = (bundle, widget_class, title)
+        entry = self._dialog_cache.get(key)
+        if entry is None:
+            dialog, widget = self._create_dialog_with_widget(
+                title, bundle, widget_class, *args, **kwargs
+            )
+            self._dialog_cache.put(key, dialog, widget)
+            return dialog, widget
+
+        dialog, widget = entry
+        self.logger.debug("Showing the %s dialog again.", title)
+        # the widget may have closed itself
+        widget.show()
+        reshow = getattr(widget, DIALOG_RESHOW_METHOD, None)
+        if reshow is not None:
+            reshow(*args, **kwargs)
+        return dialog, widget
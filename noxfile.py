@@ -7,6 +7,7 @@ Usage:
 
     pip install nox
     nox
+    nox -s benchmarks -- --save  # Update the benchmark baselines
 
 If using rez and already installed nox using ``rez-pip``: ``rez env nox -- nox``
 """
@@ -19,9 +20,20 @@ import nox
 
 @nox.session(reuse_venv=True, venv_backend="venv")
 def tests(session):
-    """Test comamnd name replacement logic.
+    """Run the unit tests which don't need a Shotgun site.
 
     These paths are all relative to the repository's root folder.
     """
     session.install("-r", os.path.join("tests", "requirements.txt"))
-    session.run("pytest", os.path.join("tests", "unit", "test_replacements.py"))
+    session.run("pytest", os.path.join("tests", "unit"))
+
+
+@nox.session(reuse_venv=True, venv_backend="venv")
+def benchmarks(session):
+    """Run the benchmarks against the stub core and compare them to the baselines.
+
+    Extra arguments are passed to ``tests/benchmarks/run.py``, e.g. ``--save``.
+    """
+    session.run(
+        "python", "-m", "tests.benchmarks.run", *(session.posargs or ["--compare"])
+    )
@@ -8,4 +8,81 @@
 # agreement to the Shotgun Pipeline Toolkit Source Code License. All rights
 # not expressly granted therein are reserved by Shotgun Software Inc.
 
-from .task import Task  # noqa
+import importlib
+import json
+import sys
+
+
+def import_submodule(name):
+    """
+    Returns a module of the package, imported on first use.
+
+    The modules aren't imported with the package, so starting the engine only
+    imports those of the features it uses.
+
+    :param str name: Name of the module, e.g. ``"batch"``.
+    """
+    return importlib.import_module("." + name, __name__)
+
+
+def get_context_key(context):
+    """
+    Get a string identifying a context.
+
+    :param context: A :class:`sgtk.Context`.
+    :returns: The context dictionary as JSON.
+    """
+    return json.dumps(context.to_dict(), sort_keys=True, default=str)
+
+
+def get_task_class():
+    """
+    Returns the :class:`~task.Task` class.
+
+    The task module subclasses ``QtCore.QObject``, so it is only imported once
+    the engine knows Qt is available.
+    """
+    from .task import Task
+
+    return Task
+
+
+def get_command_queue_class():
+    """
+    Returns the :class:`~command_queue.CommandQueue` class.
+
+    Like the task module, the command queue module is only imported once the
+    engine knows Qt is available.
+    """
+    from .command_queue import CommandQueue
+
+    return CommandQueue
+
+
+def get_dialog_cache_class():
+    """
+    Returns the :class:`~dialog_cache.DialogCache` class.
+
+    Like the task module, the dialog cache module is only imported once the
+    engine knows Qt is available.
+    """
+    from .dialog_cache import DialogCache
+
+    return DialogCache
+
+
+if sys.version_info >= (3, 7):
+
+    def __getattr__(name):
+        """
+        Keeps ``tk_shell.Task`` available without importing the task module
+        with the package.
+        """
+        if name == "Task":
+            return get_task_class()
+        raise AttributeError("module %r has no attribute %r" % (__name__, name))
+
+
+else:
+    # no module __getattr__, see PEP 562
+    from .task import Task  # noqa
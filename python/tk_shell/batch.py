@@ -0,0 +1,219 @@
+# Copyright (c) 2013 Shotgun Software Inc.
+#
+# CONFIDENTIAL AND PROPRIETARY
+#
+# This work is provided "AS IS" and subject to the Shotgun Pipeline Toolkit
+# Source Code License included in this distribution package. See LICENSE.
+# By accessing, using, copying or modifying this work you indicate your
+# agreement to the Shotgun Pipeline Toolkit Source Code License. All rights
+# not expressly granted therein are reserved by Shotgun Software Inc.
+
+"""
+Batch mode, running a file of commands through a single engine session.
+
+Two file formats are supported:
+
+- JSON lines, used when the file extension is ``.jsonl`` or ``.json``. Each
+  line is an object with a ``command`` short name and optional ``args`` list
+  and ``context`` entity, e.g.
+  ``{"command": "setup_folders", "context": {"type": "Shot", "id": 1234}}``
+- Scripts, any other extension. Each line is a command short name followed by
+  its arguments, split like a shell would. Lines starting with ``#`` are
+  ignored.
+"""
+
+import collections
+import json
+import shlex
+import time
+
+import tank
+from tank import TankError
+
+#: A command to run, ``context`` is an entity dictionary or None.
+BatchEntry = collections.namedtuple(
+    "BatchEntry", ["line", "command", "args", "context"]
+)
+
+#: Outcome of a :class:`BatchEntry`, ``error`` is None on success.
+BatchResult = collections.namedtuple(
+    "BatchResult", ["entry", "success", "duration", "error"]
+)
+
+JSON_EXTENSIONS = (".jsonl", ".json")
+
+
+def read_batch_file(path):
+    """
+    Reads the commands listed in a batch file.
+
+    :param str path: Path to a JSON lines or script file.
+    :returns: List of :class:`BatchEntry`.
+    :raises TankError: If a line can't be parsed.
+    """
+    use_json = path.lower().endswith(JSON_EXTENSIONS)
+    entries = []
+    with open(path) as batch_file:
+        for line_number, line in enumerate(batch_file, 1):
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            try:
+                if use_json:
+                    entries.append(_parse_json_line(line_number, line))
+                else:
+                    entries.append(_parse_script_line(line_number, line))
+            except (ValueError, KeyError, TypeError) as e:
+                raise TankError(
+                    "Invalid batch command on line %d of %s: %s"
+                    % (line_number, path, e)
+                )
+    return entries
+
+
+def _parse_json_line(line_number, line):
+    """
+    Parses a JSON lines batch entry.
+    """
+    data = json.loads(line)
+    if not isinstance(data, dict):
+        raise ValueError("the command must be a JSON object")
+    args = data.get("args", [])
+    if not isinstance(args, list):
+        raise ValueError("args must be a list")
+    context = data.get("context")
+    if context is not None:
+        context = {"type": context["type"], "id": int(context["id"])}
+    return BatchEntry(line_number, data["command"], [str(arg) for arg in args], context)
+
+
+def _parse_script_line(line_number, line):
+    """
+    Parses a script batch entry.
+    """
+    tokens = shlex.split(line)
+    return BatchEntry(line_number, tokens[0], tokens[1:], None)
+
+
+def write_summary(results, path):
+    """
+    Writes batch results as JSON.
+
+    :param list results: :class:`BatchResult` list.
+    :param str path: Path to the JSON file to write.
+    """
+    summary = {
+        "total": len(results),
+        "failed": len([result for result in results if not result.success]),
+        "duration": sum(result.duration for result in results),
+        "commands": [
+            {
+                "line": result.entry.line,
+                "command": result.entry.command,
+                "args": result.entry.args,
+                "context": result.entry.context,
+                "success": result.success,
+                "duration": result.duration,
+                "error": result.error,
+            }
+            for result in results
+        ],
+    }
+    with open(path, "w") as summary_file:
+        json.dump(summary, summary_file, indent=2)
+
+
+class BatchRunner(object):
+    """
+    Runs batch entries in order through one engine.
+    """
+
+    def __init__(self, engine, stop_on_error=True):
+        """
+        :param engine: The started :class:`ShellEngine`.
+        :param bool stop_on_error: Stop at the first failed command if True,
+            run every command otherwise.
+        """
+        self._engine = engine
+        self._stop_on_error = stop_on_error
+
+    def run(self, entries):
+        """
+        Runs the entries, switching context as requested.
+
+        The engine is switched back to its original context at the end.
+
+        :param list entries: :class:`BatchEntry` list.
+        :returns: A :class:`BatchResult` for each entry that was run.
+        """
+        original_context = self._engine.context
+        results = []
+        try:
+            for entry in entries:
+                result = self._run_entry(entry)
+                results.append(result)
+                if not result.success and self._stop_on_error:
+                    self._engine.logger.error(
+                        "Stopping batch after failure on line %d.", entry.line
+                    )
+                    break
+        finally:
+            if self._engine.context != original_context:
+                tank.platform.change_context(original_context)
+        return results
+
+    def _run_entry(self, entry):
+        """
+        Runs a single entry and times it.
+        """
+        start = time.time()
+        error = None
+        try:
+            if entry.context:
+                self._engine.change_entity_context(entry.context)
+            cmd_key = self._engine.resolve_command_key(entry.command)
+            self._engine.run_command(cmd_key, entry.args)
+        except KeyboardInterrupt:
+            raise
+        except SystemExit as e:
+            # commands wrapping scripts may exit rather than raise
+            if e.code:
+                error = "Exited with status %s" % e.code
+        except TankError as e:
+            error = str(e)
+        except Exception as e:
+            self._engine.logger.exception(
+                "Batch command on line %d failed.", entry.line
+            )
+            error = "%s: %s" % (type(e).__name__, e)
+
+        duration = time.time() - start
+        if error:
+            self._engine.logger.error(
+                "Line %d, %s failed: %s", entry.line, entry.command, error
+            )
+        return BatchResult(entry, error is None, duration, error)
+
+    def log_summary(self, results):
+        """
+        Logs a per command summary of the results.
+
+        :param list results: :class:`BatchResult` list.
+        """
+        logger = self._engine.logger
+        for result in results:
+            logger.info(
+                "%-6s %8.3fs  line %d: %s %s",
+                "OK" if result.success else "FAILED",
+                result.duration,
+                result.entry.line,
+                result.entry.command,
+                " ".join(result.entry.args),
+            )
+        failed = len([result for result in results if not result.success])
+        logger.info(
+            "%d commands run in %.3fs, %d failed.",
+            len(results),
+            sum(result.duration for result in results),
+            failed,
+        )
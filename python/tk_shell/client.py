@@ -0,0 +1,185 @@
+# Copyright (c) 2013 Shotgun Software Inc.
+#
+# CONFIDENTIAL AND PROPRIETARY
+#
+# This work is provided "AS IS" and subject to the Shotgun Pipeline Toolkit
+# Source Code License included in this distribution package. See LICENSE.
+# By accessing, using, copying or modifying this work you indicate your
+# agreement to the Shotgun Pipeline Toolkit Source Code License. All rights
+# not expressly granted therein are reserved by Shotgun Software Inc.
+
+"""
+Thin client for the warm engine daemon started by ``tank shell_daemon``.
+
+This module only uses the standard library so it can be run directly, without
+bootstrapping Toolkit:
+
+.. code-block:: bash
+
+    export TK_SHELL_DAEMON_SOCKET=$XDG_RUNTIME_DIR/tk-shell.sock
+    tank shell_daemon &
+    python /path/to/tk-shell/python/tk_shell/client.py --fallback tank setup_folders
+
+The command, its arguments, the current working directory and the environment
+are forwarded to the daemon. Its stdout/stderr are streamed back and the client
+exits with the exit status of the command.
+
+The socket folder must only be accessible to the user, as the environment sent
+to the daemon can hold credentials.
+"""
+
+from __future__ import print_function
+
+import json
+import os
+import socket
+import stat
+import sys
+
+#: Environment variable holding the path of the daemon Unix socket.
+SOCKET_ENV_VAR = "TK_SHELL_DAEMON_SOCKET"
+
+#: Exit status used when no daemon could be reached and no fallback was given.
+EXIT_NO_DAEMON = 255
+
+
+def check_socket_folder(socket_path):
+    """
+    Makes sure the folder of a socket is private to the current user.
+
+    Otherwise another user could have created the folder, or the socket in it,
+    to receive the environment of the commands, credentials included.
+
+    :param str socket_path: Path to the daemon Unix socket.
+    :raises socket.error: If the folder is not a directory, as opposed to a
+        symbolic link, owned by the current user and only accessible to them.
+    """
+    folder = os.path.dirname(os.path.abspath(socket_path))
+    try:
+        folder_stat = os.lstat(folder)
+    except OSError as error:
+        raise socket.error("Can't check the socket folder %s: %s" % (folder, error))
+    if (
+        not stat.S_ISDIR(folder_stat.st_mode)
+        or folder_stat.st_uid != os.getuid()
+        or stat.S_IMODE(folder_stat.st_mode) != 0o700
+    ):
+        raise socket.error(
+            "The socket folder %s must be a directory owned by the current user "
+            "with 0700 permissions." % folder
+        )
+
+
+def send_message(sock, message):
+    """
+    Sends a message as a single JSON line.
+
+    :param sock: Connected socket.
+    :param dict message: JSON serializable message.
+    """
+    sock.sendall((json.dumps(message) + "\n").encode("utf-8"))
+
+
+def iter_messages(sock):
+    """
+    Yields the JSON line messages received on a socket until it is closed.
+
+    :param sock: Connected socket.
+    """
+    reader = sock.makefile("rb")
+    try:
+        for line in reader:
+            line = line.strip()
+            if line:
+                yield json.loads(line.decode("utf-8"))
+    finally:
+        reader.close()
+
+
+def run_remote_command(socket_path, command, args):
+    """
+    Runs a command through the daemon listening on the given socket.
+
+    :param str socket_path: Path to the daemon Unix socket.
+    :param str command: Command key or short name.
+    :param list args: Command arguments.
+    :returns: The exit status of the command.
+    :raises socket.error: If the daemon can't be reached, or its socket
+        folder is not private to the current user.
+    """
+    check_socket_folder(socket_path)
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(socket_path)
+        send_message(
+            sock,
+            {
+                "command": command,
+                "args": list(args),
+                "cwd": os.getcwd(),
+                "env": dict(os.environ),
+            },
+        )
+        # Only our side is done talking, the daemon still has to answer.
+        sock.shutdown(socket.SHUT_WR)
+
+        streams = {"stdout": sys.stdout, "stderr": sys.stderr}
+        for message in iter_messages(sock):
+            if "exit" in message:
+                return message["exit"]
+            stream = streams[message["stream"]]
+            stream.write(message["data"])
+            stream.flush()
+    finally:
+        sock.close()
+
+    # The daemon went away without reporting an exit status.
+    print("The tk-shell daemon closed the connection unexpectedly.", file=sys.stderr)
+    return 1
+
+
+def main(argv=None):
+    """
+    Command line entry point.
+
+    :param list argv: Arguments, defaults to ``sys.argv[1:]``.
+    :returns: Exit status.
+    """
+    # only needed when run as a script, not by the daemon importing the module
+    import argparse
+
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        "--socket",
+        default=os.environ.get(SOCKET_ENV_VAR),
+        help="Daemon socket path, defaults to $%s." % SOCKET_ENV_VAR,
+    )
+    parser.add_argument(
+        "--fallback",
+        metavar="TANK",
+        help="tank executable to run the command with if no daemon is running.",
+    )
+    parser.add_argument("command", help="Command key or short name.")
+    parser.add_argument("args", nargs=argparse.REMAINDER, help="Command arguments.")
+    options = parser.parse_args(argv)
+
+    if options.socket:
+        try:
+            return run_remote_command(options.socket, options.command, options.args)
+        except socket.error as error:
+            print(
+                "Could not reach the tk-shell daemon on %s: %s"
+                % (options.socket, error),
+                file=sys.stderr,
+            )
+
+    if options.fallback:
+        # Cold start, exactly as if the client had not been used.
+        command_line = [options.fallback, options.command] + options.args
+        os.execvp(options.fallback, command_line)
+
+    return EXIT_NO_DAEMON
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,258 @@
+# Copyright (c) 2013 Shotgun Software Inc.
+#
+# CONFIDENTIAL AND PROPRIETARY
+#
+# This work is provided "AS IS" and subject to the Shotgun Pipeline Toolkit
+# Source Code License included in this distribution package. See LICENSE.
+# By accessing, using, copying or modifying this work you indicate your
+# agreement to the Shotgun Pipeline Toolkit Source Code License. All rights
+# not expressly granted therein are reserved by Shotgun Software Inc.
+
+"""
+Queue of the commands executed while a ``QApplication`` is running.
+
+Commands are run one at a time from the Qt event loop, highest priority first
+and in the order they were queued for the same priority, rather than nested in
+the Qt slot which executed them. A command queued while another one runs, even
+from the events the running command processes, only starts once it returned.
+"""
+
+import heapq
+import itertools
+
+import tank
+
+from tank.platform.qt import QtCore
+
+# Interval at which the windows of the UI commands are checked, in milliseconds.
+WINDOWS_POLL_INTERVAL = 200
+
+
+class CommandHandle(object):
+    """
+    Handle of a queued command, to follow or cancel it.
+    """
+
+    PENDING = "pending"
+    RUNNING = "running"
+    DONE = "done"
+    CANCELLED = "cancelled"
+
+    def __init__(self, cmd_key, priority):
+        """
+        :param str cmd_key: Key of the command.
+        :param int priority: Priority of the command, higher first.
+        """
+        self.cmd_key = cmd_key
+        self.priority = priority
+        self.state = self.PENDING
+        self._result = None
+        self._exception = None
+        self._callbacks = []
+
+    def done(self):
+        """
+        :returns: True if the command returned, failed or was cancelled.
+        """
+        return self.state in (self.DONE, self.CANCELLED)
+
+    def cancelled(self):
+        """
+        :returns: True if the command was cancelled before it started.
+        """
+        return self.state == self.CANCELLED
+
+    def cancel(self):
+        """
+        Cancel the command, if it has not started yet.
+
+        :returns: True if the command was cancelled.
+        """
+        if self.state != self.PENDING:
+            return False
+        self.state = self.CANCELLED
+        self._run_callbacks()
+        return True
+
+    def result(self):
+        """
+        Get the value returned by the command.
+
+        :returns: The value returned by the command callback.
+        :raises TankError: If the command is not done or was cancelled.
+        :raises Exception: The error raised by the command callback.
+        """
+        if self.state == self.CANCELLED:
+            raise tank.TankError("Command %s was cancelled." % self.cmd_key)
+        if self.state != self.DONE:
+            raise tank.TankError("Command %s is still %s." % (self.cmd_key, self.state))
+        if self._exception is not None:
+            raise self._exception
+        return self._result
+
+    def exception(self):
+        """
+        :returns: The error raised by the command callback, None if it
+            returned or is not done yet.
+        """
+        return self._exception
+
+    def add_done_callback(self, callback):
+        """
+        Call a function once the command is done, right away if it is already.
+
+        :param callback: Function called with this handle.
+        """
+        if self.done():
+            callback(self)
+        else:
+            self._callbacks.append(callback)
+
+    def _finish(self, result=None, exception=None):
+        self._result = result
+        self._exception = exception
+        self.state = self.DONE
+        self._run_callbacks()
+
+    def _run_callbacks(self):
+        callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            callback(self)
+
+
+class CommandQueue(QtCore.QObject):
+    """
+    Runs the queued commands one after another from the Qt event loop.
+
+    Commands with a truthy ``requires_ui`` property, or which opened windows
+    when they last ran, are UI commands. Their windows are watched once they
+    returned, and no other UI command starts while ``max_ui_commands`` of them
+    have windows shown. Commands queued after a waiting UI command wait too.
+    """
+
+    def __init__(self, engine, max_ui_commands=0):
+        """
+        :param engine: The :class:`ShellEngine`.
+        :param int max_ui_commands: Maximum number of UI commands with windows
+            shown, 0 for no limit.
+        """
+        QtCore.QObject.__init__(self)
+        self._engine = engine
+        self._max_ui_commands = max_ui_commands
+        # (-priority, order, handle, callback, args) entries
+        self._queue = []
+        self._order = itertools.count()
+        self._running = False
+        self._scheduled = False
+        # keys of the commands known to open windows
+        self._ui_commands = set()
+        # handles of the UI commands mapped to their windows still shown
+        self._ui_windows = {}
+        self._windows_timer = QtCore.QTimer(self)
+        self._windows_timer.timeout.connect(self._check_windows)
+
+    def submit(self, cmd_key, callback, args, priority=0, requires_ui=False):
+        """
+        Queue a command.
+
+        :param str cmd_key: Key of the command.
+        :param callback: Command callback, wrapped by the engine.
+        :param list args: Command arguments.
+        :param int priority: Priority of the command, higher first.
+        :param bool requires_ui: True if the command opens windows.
+        :returns: A :class:`CommandHandle`.
+        """
+        if requires_ui:
+            self._ui_commands.add(cmd_key)
+        handle = CommandHandle(cmd_key, priority)
+        heapq.heappush(
+            self._queue, (-priority, next(self._order), handle, callback, args)
+        )
+        self._schedule()
+        return handle
+
+    def clear(self):
+        """
+        Cancel the commands which have not started yet and stop watching the
+        windows of the UI commands.
+        """
+        while self._queue:
+            heapq.heappop(self._queue)[2].cancel()
+        self._ui_windows.clear()
+        self._windows_timer.stop()
+
+    def _schedule(self):
+        """
+        Run the next command once the event loop gets control back.
+        """
+        if not self._scheduled:
+            self._scheduled = True
+            QtCore.QTimer.singleShot(0, self._run_next)
+
+    def _run_next(self):
+        self._scheduled = False
+        if self._running:
+            # processing events from the running command, scheduled again once
+            # it returns
+            return
+        while self._queue and self._queue[0][2].cancelled():
+            heapq.heappop(self._queue)
+        if not self._queue:
+            return
+        handle = self._queue[0][2]
+        if handle.cmd_key in self._ui_commands and self._ui_limit_reached():
+            # scheduled again once a window is closed
+            return
+
+        _, _, handle, callback, args = heapq.heappop(self._queue)
+        self._running = True
+        handle.state = handle.RUNNING
+        windows = self._get_windows()
+        try:
+            handle._finish(result=callback(*args))
+        except tank.TankError as e:
+            self._engine.log_error(str(e))
+            handle._finish(exception=e)
+        except KeyboardInterrupt as e:
+            self._engine.log_info("The operation was cancelled by the user.")
+            handle._finish(exception=e)
+        except Exception as e:
+            self._engine.log_exception("A general error was reported.")
+            handle._finish(exception=e)
+        finally:
+            self._running = False
+
+        new_windows = self._get_windows() - windows
+        if new_windows:
+            self._ui_commands.add(handle.cmd_key)
+            self._ui_windows[handle] = new_windows
+            self._windows_timer.start(WINDOWS_POLL_INTERVAL)
+        if self._queue:
+            self._schedule()
+
+    def _ui_limit_reached(self):
+        return 0 < self._max_ui_commands <= len(self._ui_windows)
+
+    @staticmethod
+    def _get_windows():
+        """
+        Get the top level widgets shown.
+        """
+        application = QtCore.QCoreApplication.instance()
+        return set(
+            widget for widget in application.topLevelWidgets() if widget.isVisible()
+        )
+
+    def _check_windows(self):
+        """
+        Stop counting the UI commands whose windows were all closed.
+        """
+        shown = self._get_windows()
+        for handle, windows in list(self._ui_windows.items()):
+            windows &= shown
+            if not windows:
+                del self._ui_windows[handle]
+        if not self._ui_windows:
+            self._windows_timer.stop()
+        if self._queue:
+            self._schedule()
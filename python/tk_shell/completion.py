@@ -0,0 +1,298 @@
+# Copyright (c) 2013 Shotgun Software Inc.
+#
+# CONFIDENTIAL AND PROPRIETARY
+#
+# This work is provided "AS IS" and subject to the Shotgun Pipeline Toolkit
+# Source Code License included in this distribution package. See LICENSE.
+# By accessing, using, copying or modifying this work you indicate your
+# agreement to the Shotgun Pipeline Toolkit Source Code License. All rights
+# not expressly granted therein are reserved by Shotgun Software Inc.
+
+"""
+Shell completion of the command names, without bootstrapping Toolkit.
+
+Each time the engine starts, it records a prefix tree of the final command
+short names of its context in a small cache file per pipeline configuration.
+This module only uses the standard library, so it can be run directly to
+answer completion queries in milliseconds, e.g. for bash:
+
+.. code-block:: bash
+
+    _tank_complete() {
+        if [ "$COMP_CWORD" -eq 1 ]; then
+            COMPREPLY=($(python /path/to/tk-shell/python/tk_shell/completion.py \\
+                "${COMP_WORDS[1]}"))
+        fi
+    }
+    complete -o default -F _tank_complete tank
+
+The context is found from the current working directory, using the names
+recorded by the engine started from the closest parent folder. Names are
+ignored once the configuration files changed, until the engine is started
+again.
+"""
+
+from __future__ import print_function
+
+import glob
+import hashlib
+import json
+import os
+import sys
+import tempfile
+import time
+
+#: Environment variable overriding the folder the cache files are written in.
+CACHE_ENV_VAR = "TK_SHELL_COMPLETION_CACHE"
+
+# Configuration folders scanned to detect configuration changes.
+CONFIG_FOLDERS = ("core", "env")
+
+# Key marking the end of a name in a prefix tree node.
+END = ""
+
+# Number of working directories remembered for each context.
+MAX_CWDS = 20
+
+# Number of contexts remembered for each pipeline configuration, the least
+# recently updated are forgotten first.
+MAX_CONTEXTS = 50
+
+
+def config_fingerprint(config_path):
+    """
+    Computes a cheap fingerprint of the configuration files.
+
+    Only file names, sizes and modification times are used, nothing is read.
+
+    :param str config_path: Path to the configuration folder.
+    :returns: Hexadecimal digest.
+    """
+    digest = hashlib.sha1()
+    for name in CONFIG_FOLDERS:
+        for root, dirs, files in os.walk(os.path.join(config_path, name)):
+            dirs.sort()
+            for file_name in sorted(files):
+                path = os.path.join(root, file_name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                digest.update(
+                    ("%s:%d:%r\n" % (path, stat.st_size, stat.st_mtime)).encode("utf-8")
+                )
+    return digest.hexdigest()
+
+
+def build_trie(names):
+    """
+    Builds a prefix tree of names, as nested dictionaries keyed by character.
+
+    :param names: Names to index.
+    :returns: The root node, JSON serializable.
+    """
+    root = {}
+    for name in names:
+        node = root
+        for char in name:
+            node = node.setdefault(char, {})
+        node[END] = {}
+    return root
+
+
+def complete(trie, prefix):
+    """
+    Finds the names starting with a prefix.
+
+    :param dict trie: Root node, from :func:`build_trie`.
+    :param str prefix: Start of the names.
+    :returns: Sorted list of matching names.
+    """
+    node = trie
+    for char in prefix:
+        node = node.get(char)
+        if node is None:
+            return []
+
+    names = []
+    stack = [(prefix, node)]
+    while stack:
+        name, node = stack.pop()
+        for char, child in node.items():
+            if char == END:
+                names.append(name)
+            else:
+                stack.append((name + char, child))
+    return sorted(names)
+
+
+def get_cache_path(pipeline_config_path):
+    """
+    Get the per user cache file of a pipeline configuration.
+
+    :param str pipeline_config_path: Path to the pipeline configuration.
+    :returns: Path to the JSON cache file.
+    """
+    folder = os.environ.get(CACHE_ENV_VAR)
+    if not folder:
+        cache_home = os.environ.get("XDG_CACHE_HOME") or os.path.join(
+            os.path.expanduser("~"), ".cache"
+        )
+        folder = os.path.join(cache_home, "tk-shell", "completion")
+    digest = hashlib.sha1(pipeline_config_path.encode("utf-8")).hexdigest()[:16]
+    return os.path.join(folder, "%s.json" % digest)
+
+
+def _read_cache(path):
+    """
+    Reads a cache file.
+
+    :returns: The cache dictionary, or None if missing or invalid.
+    """
+    try:
+        with open(path) as cache_file:
+            cache = json.load(cache_file)
+    except (IOError, OSError, ValueError):
+        return None
+    return cache if isinstance(cache, dict) else None
+
+
+def update_cache(
+    pipeline_config_path, config_path, context, cwd, names, fingerprint=None
+):
+    """
+    Records the command names of a context, if they changed.
+
+    The cache file is replaced atomically, so concurrent completion queries
+    never see a partial file. Only the :data:`MAX_CONTEXTS` most recently
+    updated contexts are kept.
+
+    :param str pipeline_config_path: Path to the pipeline configuration.
+    :param str config_path: Path to its configuration folder.
+    :param str context: Name of the engine context.
+    :param str cwd: Working directory the engine was started from.
+    :param names: Final command short names.
+    :param str fingerprint: Configuration fingerprint, computed if not given.
+    :returns: True if the cache file was written.
+    :raises IOError, OSError: If the cache file can't be written.
+    """
+    path = get_cache_path(pipeline_config_path)
+    cache = _read_cache(path)
+    if not cache or cache.get("pipeline_configuration") != pipeline_config_path:
+        cache = {"pipeline_configuration": pipeline_config_path, "contexts": {}}
+
+    fingerprint = fingerprint or config_fingerprint(config_path)
+    trie = build_trie(names)
+    entry = cache["contexts"].get(context) or {}
+    if (
+        cache.get("config_path") == config_path
+        and entry.get("fingerprint") == fingerprint
+        and entry.get("trie") == trie
+        and cwd in entry.get("cwds", [])
+    ):
+        return False
+
+    cwds = [cwd] + [folder for folder in entry.get("cwds", []) if folder != cwd]
+    cache["config_path"] = config_path
+    contexts = cache["contexts"]
+    contexts[context] = {
+        "fingerprint": fingerprint,
+        "cwds": cwds[:MAX_CWDS],
+        "trie": trie,
+        "time": time.time(),
+    }
+    if len(contexts) > MAX_CONTEXTS:
+        keys = sorted(contexts, key=lambda key: contexts[key].get("time", 0))
+        for old_key in keys[: len(keys) - MAX_CONTEXTS]:
+            del contexts[old_key]
+
+    folder = os.path.dirname(path)
+    if not os.path.isdir(folder):
+        os.makedirs(folder)
+    handle, temp_path = tempfile.mkstemp(dir=folder, suffix=".tmp")
+    try:
+        with os.fdopen(handle, "w") as cache_file:
+            json.dump(cache, cache_file, separators=(",", ":"))
+        # os.rename can't replace an existing file on Windows with Python 2.
+        getattr(os, "replace", os.rename)(temp_path, path)
+    except BaseException:
+        os.remove(temp_path)
+        raise
+    return True
+
+
+def _cwd_depth(cwd, cwds):
+    """
+    Get the length of the closest recorded folder containing cwd.
+
+    :returns: The length of the folder path, or -1 if none contains cwd.
+    """
+    depth = -1
+    for path in cwds:
+        if cwd == path or cwd.startswith(path.rstrip(os.sep) + os.sep):
+            depth = max(depth, len(path))
+    return depth
+
+
+def find_names(prefix, cwd, pipeline_config_path=None):
+    """
+    Finds the command names starting with a prefix for a working directory.
+
+    :param str prefix: Start of the command names.
+    :param str cwd: Working directory to find the context from.
+    :param str pipeline_config_path: Only look in this pipeline configuration
+        cache if given, in every cache file otherwise.
+    :returns: Sorted list of names, empty if no up to date entry was found.
+    """
+    if pipeline_config_path:
+        paths = [get_cache_path(pipeline_config_path)]
+    else:
+        paths = glob.glob(os.path.join(os.path.dirname(get_cache_path("")), "*.json"))
+
+    candidates = []
+    for path in paths:
+        cache = _read_cache(path)
+        if not cache:
+            continue
+        for entry in cache.get("contexts", {}).values():
+            depth = _cwd_depth(cwd, entry.get("cwds", []))
+            if depth >= 0:
+                candidates.append((depth, cache.get("config_path"), entry))
+
+    fingerprints = {}
+    for _, config_path, entry in sorted(candidates, key=lambda item: -item[0]):
+        if config_path not in fingerprints:
+            fingerprints[config_path] = config_fingerprint(config_path)
+        if entry.get("fingerprint") == fingerprints[config_path]:
+            return complete(entry.get("trie", {}), prefix)
+    return []
+
+
+def main(argv=None):
+    """
+    Command line entry point, printing one matching name per line.
+
+    :param list argv: Arguments, defaults to ``sys.argv[1:]``.
+    :returns: Exit status, 1 if no name matched.
+    """
+    # only needed when run as a script, not by the engine importing the module
+    import argparse
+
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        "--config", help="Pipeline configuration path, all of them by default."
+    )
+    parser.add_argument(
+        "--cwd", default=os.getcwd(), help="Working directory, the current one."
+    )
+    parser.add_argument("prefix", nargs="?", default="", help="Start of the command.")
+    options = parser.parse_args(argv)
+
+    names = find_names(options.prefix, os.path.abspath(options.cwd), options.config)
+    for name in names:
+        print(name)
+    return 0 if names else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,301 @@
+# Copyright (c) 2013 Shotgun Software Inc.
+#
+# CONFIDENTIAL AND PROPRIETARY
+#
+# This work is provided "AS IS" and subject to the Shotgun Pipeline Toolkit
+# Source Code License included in this distribution package. See LICENSE.
+# By accessing, using, copying or modifying this work you indicate your
+# agreement to the Shotgun Pipeline Toolkit Source Code License. All rights
+# not expressly granted therein are reserved by Shotgun Software Inc.
+
+"""
+Warm engine daemon.
+
+Keeps an initialized engine in memory and runs the commands forwarded by
+:mod:`client` over a local Unix socket, so repeated ``tank`` calls don't pay
+for the engine bootstrap each time.
+"""
+
+import codecs
+import hashlib
+import json
+import os
+import socket
+import sys
+import tempfile
+import threading
+import time
+import traceback
+
+import tank
+from tank import TankError
+
+from . import get_context_key  # noqa: F401
+from .client import check_socket_folder, iter_messages, send_message
+from .completion import config_fingerprint
+
+
+def get_socket_path(pipeline_config_path, context):
+    """
+    Get a per user, pipeline configuration and context socket path.
+
+    Unix socket paths are limited to ~100 characters, hence the hashing.
+
+    :param str pipeline_config_path: Path to the pipeline configuration.
+    :param context: The :class:`sgtk.Context` the daemon serves.
+    :returns: Path to the socket.
+    """
+    key = json.dumps(
+        [pipeline_config_path, context.to_dict()], sort_keys=True, default=str
+    )
+    digest = hashlib.sha1(key.encode("utf-8")).hexdigest()[:16]
+    folder = os.path.join(tempfile.gettempdir(), "tk-shell-%s" % os.getuid())
+    return os.path.join(folder, "%s.sock" % digest)
+
+
+class _OutputForwarder(object):
+    """
+    Redirects a file descriptor into a pipe and forwards everything written to
+    it as messages.
+
+    Working at the file descriptor level captures the output of ``print``,
+    logging handlers, C extensions and child processes alike.
+    """
+
+    def __init__(self, fd, stream_name, send):
+        """
+        :param int fd: File descriptor to redirect, e.g. 1 for stdout.
+        :param str stream_name: Name of the stream sent with each message.
+        :param send: Callable sending a message to the client.
+        """
+        self._fd = fd
+        self._stream_name = stream_name
+        self._send = send
+        self._saved_fd = None
+        self._thread = None
+
+    def start(self):
+        """
+        Starts redirecting the file descriptor.
+        """
+        self._saved_fd = os.dup(self._fd)
+        read_fd, write_fd = os.pipe()
+        os.dup2(write_fd, self._fd)
+        os.close(write_fd)
+
+        self._thread = threading.Thread(target=self._pump, args=(read_fd,))
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        """
+        Restores the file descriptor and waits for the pending output.
+        """
+        # Restoring the descriptor closes the last write end of the pipe, so
+        # the pump thread gets EOF once everything has been forwarded.
+        os.dup2(self._saved_fd, self._fd)
+        os.close(self._saved_fd)
+        self._thread.join()
+
+    def _pump(self, read_fd):
+        """
+        Forwards the pipe content until it is closed.
+        """
+        decoder = codecs.getincrementaldecoder("utf-8")("replace")
+        try:
+            while True:
+                data = os.read(read_fd, 65536)
+                text = decoder.decode(data, final=not data)
+                if text:
+                    self._send({"stream": self._stream_name, "data": text})
+                if not data:
+                    break
+        except socket.error:
+            # The client went away, keep draining so the command doesn't block.
+            while os.read(read_fd, 65536):
+                pass
+        finally:
+            os.close(read_fd)
+
+
+class EngineDaemon(object):
+    """
+    Serves commands forwarded by :mod:`client` with an already started engine.
+
+    Requests are handled one at a time, in the order they are received. The
+    daemon exits after being idle for a while and restarts the engine when the
+    configuration changes.
+    """
+
+    def __init__(self, engine, socket_path, idle_timeout, config_check_interval=2):
+        """
+        :param engine: The started :class:`ShellEngine`.
+        :param str socket_path: Path of the Unix socket to listen on.
+        :param float idle_timeout: Seconds without any request after which the
+            daemon exits. 0 means never.
+        :param float config_check_interval: Minimum number of seconds between
+            two configuration change checks.
+        """
+        self._engine = engine
+        self._socket_path = socket_path
+        self._idle_timeout = idle_timeout
+        self._config_check_interval = config_check_interval
+        self._config_path = engine.sgtk.pipeline_configuration.get_config_location()
+        self._fingerprint = config_fingerprint(self._config_path)
+        self._last_config_check = time.time()
+
+    def serve_forever(self):
+        """
+        Listens and runs commands until idle for too long.
+        """
+        server = self._bind()
+        try:
+            server.settimeout(self._idle_timeout or None)
+            self._engine.logger.info(
+                "tk-shell daemon listening on %s", self._socket_path
+            )
+            while True:
+                try:
+                    connection, _ = server.accept()
+                except socket.timeout:
+                    self._engine.logger.info(
+                        "tk-shell daemon idle for %ss, shutting down.",
+                        self._idle_timeout,
+                    )
+                    break
+                try:
+                    # Accepted sockets inherit the timeout on some platforms.
+                    connection.settimeout(None)
+                    self._handle_connection(connection)
+                finally:
+                    connection.close()
+        finally:
+            server.close()
+            if os.path.exists(self._socket_path):
+                os.remove(self._socket_path)
+
+    def _bind(self):
+        """
+        Creates the listening socket, only accessible to the current user.
+
+        :raises TankError: If the socket folder is not private to the current
+            user, or a daemon is already listening.
+        """
+        folder = os.path.dirname(os.path.abspath(self._socket_path))
+        if not os.path.lexists(folder):
+            os.makedirs(folder, 0o700)
+        try:
+            check_socket_folder(self._socket_path)
+        except socket.error as e:
+            raise TankError(str(e))
+
+        server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            server.connect(self._socket_path)
+        except socket.error:
+            # Nobody is listening, so any existing file is a leftover.
+            if os.path.exists(self._socket_path):
+                os.remove(self._socket_path)
+        else:
+            server.close()
+            raise TankError(
+                "A tk-shell daemon is already listening on %s" % self._socket_path
+            )
+
+        server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        server.bind(self._socket_path)
+        os.chmod(self._socket_path, 0o600)
+        server.listen(16)
+        return server
+
+    def _handle_connection(self, connection):
+        """
+        Runs the command requested on a connection and reports its exit status.
+        """
+        request = next(iter_messages(connection), None)
+        if request is None:
+            return
+
+        lock = threading.Lock()
+
+        def send(message):
+            with lock:
+                send_message(connection, message)
+
+        self._reload_if_config_changed()
+
+        exit_code = self._run_request(request, send)
+        try:
+            send({"exit": exit_code})
+        except socket.error:
+            self._engine.logger.debug("Client left before the end of its command.")
+
+    def _run_request(self, request, send):
+        """
+        Runs a command with the client's working directory, environment and
+        output streams.
+
+        :returns: The command exit status.
+        """
+        saved_environ = dict(os.environ)
+        saved_cwd = os.getcwd()
+        forwarders = [
+            _OutputForwarder(1, "stdout", send),
+            _OutputForwarder(2, "stderr", send),
+        ]
+
+        os.environ.clear()
+        os.environ.update(request.get("env") or saved_environ)
+        sys.stdout.flush()
+        sys.stderr.flush()
+        for forwarder in forwarders:
+            forwarder.start()
+        try:
+            os.chdir(request.get("cwd") or saved_cwd)
+            return self._execute(request["command"], request.get("args", []))
+        finally:
+            sys.stdout.flush()
+            sys.stderr.flush()
+            for forwarder in forwarders:
+                forwarder.stop()
+            os.chdir(saved_cwd)
+            os.environ.clear()
+            os.environ.update(saved_environ)
+
+    def _execute(self, command, args):
+        """
+        Executes a command, mapping its outcome to an exit status.
+        """
+        try:
+            cmd_key = self._engine.resolve_command_key(command)
+            self._engine.run_command(cmd_key, args)
+        except SystemExit as e:
+            if e.code is None or isinstance(e.code, int):
+                return e.code or 0
+            sys.stderr.write("%s\n" % e.code)
+            return 1
+        except TankError as e:
+            sys.stderr.write("%s\n" % e)
+            return 1
+        except Exception:
+            traceback.print_exc()
+            return 1
+        return 0
+
+    def _reload_if_config_changed(self):
+        """
+        Restarts the engine if the configuration files have changed.
+        """
+        now = time.time()
+        if now - self._last_config_check < self._config_check_interval:
+            return
+        self._last_config_check = now
+
+        fingerprint = config_fingerprint(self._config_path)
+        if fingerprint == self._fingerprint:
+            return
+
+        self._engine.logger.info("Configuration changed, restarting the engine.")
+        tank.platform.restart()
+        self._engine = tank.platform.current_engine()
+        self._fingerprint = fingerprint
@@ -0,0 +1,103 @@
+# Copyright (c) 2013 Shotgun Software Inc.
+#
+# CONFIDENTIAL AND PROPRIETARY
+#
+# This work is provided "AS IS" and subject to the Shotgun Pipeline Toolkit
+# Source Code License included in this distribution package. See LICENSE.
+# By accessing, using, copying or modifying this work you indicate your
+# agreement to the Shotgun Pipeline Toolkit Source Code License. All rights
+# not expressly granted therein are reserved by Shotgun Software Inc.
+
+import collections
+
+from tank.platform.qt import QtCore
+
+
+class DialogCache(QtCore.QObject):
+    """
+    Least recently used cache of the dialogs shown by the engine.
+
+    Closing a cached dialog only hides it, so it can be shown again without
+    building its widget. This only happens in sessions running many commands,
+    where closing the last window doesn't quit the ``QApplication``.
+    """
+
+    def __init__(self, size):
+        """
+        :param int size: Maximum number of dialogs kept.
+        """
+        QtCore.QObject.__init__(self)
+        self._size = size
+        # (bundle, widget class, title) keys mapped to (dialog, widget)
+        self._dialogs = collections.OrderedDict()
+
+    def get(self, key):
+        """
+        Get a cached dialog, unless it was deleted in the meantime.
+
+        :param tuple key: ``(bundle, widget_class, title)`` key.
+        :returns: A ``(dialog, widget)`` tuple, or None.
+        """
+        entry = self._dialogs.pop(key, None)
+        if entry is None or not _is_alive(*entry):
+            return None
+        # most recently used last
+        self._dialogs[key] = entry
+        return entry
+
+    def put(self, key, dialog, widget):
+        """
+        Cache a new dialog, evicting the least recently used ones.
+
+        :param tuple key: ``(bundle, widget_class, title)`` key.
+        :param dialog: The dialog.
+        :param widget: The app widget it contains.
+        """
+        dialog.installEventFilter(self)
+        self._dialogs[key] = (dialog, widget)
+        while len(self._dialogs) > self._size:
+            self._evict(self._dialogs.popitem(last=False)[1])
+
+    def clear(self):
+        """
+        Stop caching all the dialogs, e.g. as their apps are reloaded.
+
+        Hidden dialogs are closed, visible ones are closed normally by the user.
+        """
+        while self._dialogs:
+            self._evict(self._dialogs.popitem(last=False)[1])
+
+    def _evict(self, entry):
+        """
+        Stop caching a dialog, closing it if hidden.
+        """
+        dialog, widget = entry
+        if not _is_alive(dialog, widget):
+            return
+        dialog.removeEventFilter(self)
+        if not dialog.isVisible():
+            dialog.close()
+
+    def eventFilter(self, watched, event):
+        if event.type() != QtCore.QEvent.Close:
+            return False
+        application = QtCore.QCoreApplication.instance()
+        if application is None or application.quitOnLastWindowClosed():
+            # hiding the last window would never quit the application
+            return False
+        event.ignore()
+        watched.hide()
+        return True
+
+
+def _is_alive(dialog, widget):
+    """
+    Check if the Qt objects of a dialog and its widget were not deleted.
+    """
+    try:
+        dialog.isVisible()
+        widget.isVisible()
+    except RuntimeError:
+        # the C++ object was deleted
+        return False
+    return True
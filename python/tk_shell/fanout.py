@@ -0,0 +1,167 @@
+# Copyright (c) 2013 Shotgun Software Inc.
+#
+# CONFIDENTIAL AND PROPRIETARY
+#
+# This work is provided "AS IS" and subject to the Shotgun Pipeline Toolkit
+# Source Code License included in this distribution package. See LICENSE.
+# By accessing, using, copying or modifying this work you indicate your
+# agreement to the Shotgun Pipeline Toolkit Source Code License. All rights
+# not expressly granted therein are reserved by Shotgun Software Inc.
+
+"""
+Parallel fan-out of one command across many entity contexts.
+
+Workers are forked from the process running the engine, so each of them starts
+with an already initialized engine and only switches context in place for each
+entity it is given. Forking is only available on Unix platforms, which is
+where render nodes run. Commands showing a UI can't be fanned out.
+"""
+
+import collections
+import json
+import multiprocessing
+import os
+import time
+import traceback
+
+from tank import TankError
+
+#: Outcome of running the command for an entity, ``error`` is None on success.
+FanOutResult = collections.namedtuple(
+    "FanOutResult", ["entity", "success", "duration", "error", "pid"]
+)
+
+# The engine of the current worker process, set by _init_worker.
+_worker_engine = None
+
+
+def read_entities(path):
+    """
+    Reads the entities to run a command for.
+
+    Each line is either a JSON entity dictionary, ``{"type": "Shot", "id": 1}``,
+    or an entity type and id separated by spaces, ``Shot 1``. Blank lines and
+    lines starting with ``#`` are ignored.
+
+    :param str path: Path to the entities file.
+    :returns: List of entity dictionaries with ``type`` and ``id`` keys.
+    :raises TankError: If a line can't be parsed.
+    """
+    entities = []
+    with open(path) as entities_file:
+        for line_number, line in enumerate(entities_file, 1):
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            try:
+                if line.startswith("{"):
+                    data = json.loads(line)
+                    entity_type, entity_id = data["type"], data["id"]
+                else:
+                    entity_type, entity_id = line.split()
+                entities.append({"type": entity_type, "id": int(entity_id)})
+            except (ValueError, KeyError) as e:
+                raise TankError(
+                    "Invalid entity on line %d of %s: %s" % (line_number, path, e)
+                )
+    return entities
+
+
+def _init_worker(engine):
+    """
+    Pool initializer, runs once in each worker process.
+
+    :param engine: The engine inherited from the parent process.
+    """
+    global _worker_engine
+    _worker_engine = engine
+
+    # The threads of the parent process, e.g. writing the queued log records
+    # or the metrics, don't exist in the worker.
+    reset_after_fork = getattr(engine, "_reset_after_fork", None)
+    if reset_after_fork is not None:
+        reset_after_fork()
+
+    # The Shotgun connection socket was inherited from the parent process,
+    # make sure each worker opens its own. Closing our copy of the file
+    # descriptor doesn't affect the parent.
+    shotgun = getattr(getattr(engine, "sgtk", None), "shotgun", None)
+    close_connection = getattr(shotgun, "_close_connection", None)
+    if close_connection:
+        close_connection()
+
+
+def _run_for_entity(task):
+    """
+    Runs the command for an entity in a worker process.
+
+    :param tuple task: Index, entity, command key and arguments.
+    :returns: Index and :class:`FanOutResult`.
+    """
+    index, entity, cmd_key, args = task
+    start = time.time()
+    error = None
+    try:
+        _worker_engine.change_entity_context(entity)
+        _worker_engine.run_command(cmd_key, args)
+    except TankError as e:
+        error = str(e)
+    except Exception:
+        error = traceback.format_exc()
+    except SystemExit as e:
+        if e.code:
+            error = "Exited with status %s" % e.code
+
+    duration = time.time() - start
+    return index, FanOutResult(entity, error is None, duration, error, os.getpid())
+
+
+def fan_out(engine, cmd_key, args, entities, processes=None):
+    """
+    Runs a command for each entity across a pool of worker processes.
+
+    :param engine: The started engine, inherited by the workers.
+    :param str cmd_key: Key of the command to run.
+    :param list args: Command arguments, the same for every entity.
+    :param list entities: Entity dictionaries to run the command for.
+    :param int processes: Number of workers, defaults to the number of cores.
+    :returns: A :class:`FanOutResult` per entity, in the same order.
+    """
+    processes = min(processes or multiprocessing.cpu_count(), len(entities)) or 1
+    tasks = [(index, entity, cmd_key, args) for index, entity in enumerate(entities)]
+    results = [None] * len(entities)
+
+    if hasattr(multiprocessing, "get_context"):
+        context = multiprocessing.get_context("fork")
+    else:
+        # Python 2 always forks on Unix.
+        context = multiprocessing
+    pool = context.Pool(processes, initializer=_init_worker, initargs=(engine,))
+    try:
+        # One entity at a time so slow entities don't hold back a whole chunk.
+        for index, result in pool.imap_unordered(_run_for_entity, tasks, 1):
+            results[index] = result
+            if not result.success:
+                engine.logger.error(
+                    "%s %s failed: %s",
+                    result.entity["type"],
+                    result.entity["id"],
+                    result.error,
+                )
+        pool.close()
+    except BaseException:
+        pool.terminate()
+        raise
+    finally:
+        pool.join()
+    return results
+
+
+def exit_status(results):
+    """
+    Aggregates the results into a single exit status.
+
+    :param list results: :class:`FanOutResult` list.
+    :returns: 0 if the command succeeded for every entity, 1 otherwise.
+    """
+    return 0 if all(result.success for result in results) else 1
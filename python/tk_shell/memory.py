@@ -0,0 +1,201 @@
+# Copyright (c) 2013 Shotgun Software Inc.
+#
+# CONFIDENTIAL AND PROPRIETARY
+#
+# This work is provided "AS IS" and subject to the Shotgun Pipeline Toolkit
+# Source Code License included in this distribution package. See LICENSE.
+# By accessing, using, copying or modifying this work you indicate your
+# agreement to the Shotgun Pipeline Toolkit Source Code License. All rights
+# not expressly granted therein are reserved by Shotgun Software Inc.
+
+"""
+Memory accounting of the command callbacks.
+
+The resident set size (RSS) is read from ``/proc`` on Linux. The peak RSS is
+reset before each command there, so it is the peak of the command itself. On
+other Unix platforms, it is the peak of the whole process so far. The top
+allocation sites are found with :mod:`tracemalloc`, on Python 3 only.
+"""
+
+import json
+import os
+import sys
+import time
+
+try:
+    import resource
+except ImportError:
+    # Windows
+    resource = None
+
+try:
+    import tracemalloc
+except ImportError:
+    # Python 2
+    tracemalloc = None
+
+# Number of frames kept by tracemalloc for each allocation.
+TRACEMALLOC_FRAMES = 1
+
+
+def get_rss():
+    """
+    Get the current resident set size of the process, on Linux only.
+
+    :returns: Size in bytes, None if unknown.
+    """
+    try:
+        with open("/proc/self/statm") as statm:
+            pages = int(statm.read().split()[1])
+    except (IOError, OSError, IndexError, ValueError):
+        return None
+    return pages * os.sysconf("SC_PAGE_SIZE")
+
+
+def reset_peak_rss():
+    """
+    Reset the peak resident set size of the process, on Linux only.
+
+    :returns: True if it was reset.
+    """
+    try:
+        with open("/proc/self/clear_refs", "w") as clear_refs:
+            clear_refs.write("5")
+    except (IOError, OSError):
+        return False
+    return True
+
+
+def get_peak_rss():
+    """
+    Get the peak resident set size of the process.
+
+    :returns: Size in bytes, None if unknown.
+    """
+    try:
+        with open("/proc/self/status") as status:
+            for line in status:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except (IOError, OSError, IndexError, ValueError):
+        pass
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def run_measured(call, top_entries, report):
+    """
+    Run a function, recording its memory usage.
+
+    The usage is reported even if the function raises.
+
+    :param call: Function to call without arguments.
+    :param int top_entries: Number of allocation sites to record.
+    :param report: Called with the record, a dictionary with the RSS before and
+        after the call, the peak RSS, if it is the peak of the call only, and
+        the top allocation sites by size difference.
+    :returns: The value returned by the function.
+    """
+    started_tracemalloc = False
+    before_snapshot = None
+    if tracemalloc is not None and top_entries:
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(TRACEMALLOC_FRAMES)
+            started_tracemalloc = True
+        before_snapshot = tracemalloc.take_snapshot()
+
+    peak_is_per_call = reset_peak_rss()
+    rss_before = get_rss()
+    start = time.time()
+    try:
+        return call()
+    finally:
+        record = {
+            "duration": time.time() - start,
+            "rss_before": rss_before,
+            "rss_after": get_rss(),
+            "peak_rss": get_peak_rss(),
+            "peak_is_per_call": peak_is_per_call,
+            "allocations": [],
+        }
+        if before_snapshot is not None:
+            after_snapshot = tracemalloc.take_snapshot()
+            if started_tracemalloc:
+                tracemalloc.stop()
+            # leave out the measurement itself
+            filters = [
+                tracemalloc.Filter(False, tracemalloc.__file__),
+                tracemalloc.Filter(False, __file__),
+            ]
+            diffs = after_snapshot.filter_traces(filters).compare_to(
+                before_snapshot.filter_traces(filters), "lineno"
+            )
+            for diff in [diff for diff in diffs if diff.size_diff][:top_entries]:
+                frame = diff.traceback[0]
+                record["allocations"].append(
+                    {
+                        "location": "%s:%d" % (frame.filename, frame.lineno),
+                        "size_diff": diff.size_diff,
+                        "count_diff": diff.count_diff,
+                    }
+                )
+        report(record)
+
+
+def _format_size(size):
+    """
+    Format a size in bytes as MiB, for the summary.
+    """
+    if size is None:
+        return "?"
+    return "%.1f MiB" % (size / (1024.0 * 1024.0))
+
+
+def format_record(record):
+    """
+    Format a record as a human readable summary.
+
+    :param dict record: Record from :func:`run_measured`.
+    :returns: The summary text.
+    """
+    rss_delta = None
+    if record["rss_before"] is not None and record["rss_after"] is not None:
+        rss_delta = record["rss_after"] - record["rss_before"]
+    lines = [
+        "RSS %s -> %s (%s%s), peak %s%s"
+        % (
+            _format_size(record["rss_before"]),
+            _format_size(record["rss_after"]),
+            "+" if rss_delta and rss_delta > 0 else "",
+            _format_size(rss_delta),
+            _format_size(record["peak_rss"]),
+            "" if record["peak_is_per_call"] else " (process)",
+        )
+    ]
+    for allocation in record["allocations"]:
+        lines.append(
+            "  %+10.1f KiB %+8d blocks  %s"
+            % (
+                allocation["size_diff"] / 1024.0,
+                allocation["count_diff"],
+                allocation["location"],
+            )
+        )
+    return "\n".join(lines)
+
+
+def append_record(path, record):
+    """
+    Append a record to a JSON lines file.
+
+    :param str path: Path to the file.
+    :param dict record: JSON serializable record.
+    """
+    folder = os.path.dirname(path)
+    if folder and not os.path.isdir(folder):
+        os.makedirs(folder)
+    with open(path, "a") as report_file:
+        report_file.write(json.dumps(record, sort_keys=True) + "\n")
@@ -0,0 +1,312 @@
+# Copyright (c) 2013 Shotgun Software Inc.
+#
+# CONFIDENTIAL AND PROPRIETARY
+#
+# This work is provided "AS IS" and subject to the Shotgun Pipeline Toolkit
+# Source Code License included in this distribution package. See LICENSE.
+# By accessing, using, copying or modifying this work you indicate your
+# agreement to the Shotgun Pipeline Toolkit Source Code License. All rights
+# not expressly granted therein are reserved by Shotgun Software Inc.
+
+"""
+Per command counters and latency histograms, spooled to local files.
+
+Runs are only counted in memory, and written in batches by a background
+thread and when the engine is destroyed. Each batch is appended to the
+``metrics.jsonl`` spool file of a folder as JSON lines, one per command, with
+the number of runs, failures and a histogram of their durations since the
+previous batch.
+
+The totals of every process writing to the folder can also be exported in
+the Prometheus text format, for the node exporter textfile collector.
+Processes take turns through an exclusive lock on the ``metrics.lock`` file,
+where supported.
+"""
+
+import contextlib
+import json
+import os
+import socket
+import tempfile
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:
+    # e.g. on Windows, appending each batch in a single write is then relied upon
+    fcntl = None
+
+# Upper bounds of the duration histogram buckets, in seconds.
+LATENCY_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300, 900)
+
+SPOOL_NAME = "metrics.jsonl"
+LOCK_NAME = "metrics.lock"
+# Totals of all the processes, which the Prometheus export is rendered from.
+TOTALS_NAME = "metrics_totals.json"
+
+
+class CommandMetrics(object):
+    """
+    In memory counters of the command runs since the last batch.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._commands = {}
+
+    def record(self, cmd_key, duration, success):
+        """
+        Count a command run.
+
+        :param str cmd_key: Key of the command.
+        :param float duration: Duration of the run, in seconds.
+        :param bool success: False if the command raised an exception.
+        """
+        bucket = 0
+        while bucket < len(LATENCY_BUCKETS) and duration > LATENCY_BUCKETS[bucket]:
+            bucket += 1
+        with self._lock:
+            stats = self._commands.get(cmd_key)
+            if stats is None:
+                stats = self._commands[cmd_key] = _new_stats()
+            stats["calls"] += 1
+            if not success:
+                stats["failures"] += 1
+            stats["seconds"] += duration
+            stats["buckets"][bucket] += 1
+
+    def pop(self):
+        """
+        Get the counters and start a new batch.
+
+        :returns: Command keys mapped to their counters.
+        """
+        with self._lock:
+            commands, self._commands = self._commands, {}
+        return commands
+
+
+def _new_stats():
+    """
+    Get empty counters, with a histogram bucket for the longest durations.
+    """
+    return {
+        "calls": 0,
+        "failures": 0,
+        "seconds": 0.0,
+        "buckets": [0] * (len(LATENCY_BUCKETS) + 1),
+    }
+
+
+@contextlib.contextmanager
+def _locked(path):
+    """
+    Hold an exclusive lock on a file, if supported.
+    """
+    with open(path, "a") as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+
+def _escape_label(value):
+    """
+    Escape a Prometheus label value.
+    """
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def format_prometheus(totals):
+    """
+    Render command counters in the Prometheus text format.
+
+    :param dict totals: Command keys mapped to their counters.
+    :returns: The text of the export.
+    """
+    calls = [
+        "# HELP tk_shell_command_runs_total Number of tk-shell command runs.",
+        "# TYPE tk_shell_command_runs_total counter",
+    ]
+    failures = [
+        "# HELP tk_shell_command_failures_total Number of failed tk-shell "
+        "command runs.",
+        "# TYPE tk_shell_command_failures_total counter",
+    ]
+    durations = [
+        "# HELP tk_shell_command_duration_seconds Duration of the tk-shell "
+        "command runs.",
+        "# TYPE tk_shell_command_duration_seconds histogram",
+    ]
+    for cmd_key in sorted(totals):
+        stats = totals[cmd_key]
+        label = 'command="%s"' % _escape_label(cmd_key)
+        calls.append("tk_shell_command_runs_total{%s} %d" % (label, stats["calls"]))
+        failures.append(
+            "tk_shell_command_failures_total{%s} %d" % (label, stats["failures"])
+        )
+        count = 0
+        for bound, bucket_count in zip(LATENCY_BUCKETS + ("+Inf",), stats["buckets"]):
+            count += bucket_count
+            durations.append(
+                'tk_shell_command_duration_seconds_bucket{%s,le="%s"} %d'
+                % (label, bound, count)
+            )
+        durations.append(
+            "tk_shell_command_duration_seconds_sum{%s} %r" % (label, stats["seconds"])
+        )
+        durations.append(
+            "tk_shell_command_duration_seconds_count{%s} %d" % (label, stats["calls"])
+        )
+    return "\n".join(calls + failures + durations) + "\n"
+
+
+def _write_atomically(path, text):
+    """
+    Replace a file, so readers never see a partial file.
+    """
+    handle, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    try:
+        with os.fdopen(handle, "w") as temp_file:
+            temp_file.write(text)
+        # os.rename can't replace an existing file on Windows with Python 2.
+        getattr(os, "replace", os.rename)(temp_path, path)
+    except BaseException:
+        os.remove(temp_path)
+        raise
+
+
+def write_batch(folder, commands, prometheus_path=None):
+    """
+    Append a batch of counters to the spool file of a folder.
+
+    :param str folder: Spool folder, shared by the processes.
+    :param dict commands: Command keys mapped to their counters.
+    :param str prometheus_path: File the totals of all the processes are
+        exported to in the Prometheus text format, if given.
+    :raises IOError, OSError: If the files can't be written.
+    """
+    if not os.path.isdir(folder):
+        try:
+            os.makedirs(folder)
+        except OSError:
+            # created by another process in the meantime
+            if not os.path.isdir(folder):
+                raise
+
+    now = time.time()
+    host = socket.gethostname()
+    pid = os.getpid()
+    records = (
+        dict(stats, time=now, host=host, pid=pid, command=cmd_key)
+        for cmd_key, stats in sorted(commands.items())
+    )
+    lines = "".join(json.dumps(record, sort_keys=True) + "\n" for record in records)
+
+    with _locked(os.path.join(folder, LOCK_NAME)):
+        # a single write, so lines are never interleaved with other processes
+        # appending to the file without the lock
+        spool = os.open(
+            os.path.join(folder, SPOOL_NAME), os.O_WRONLY | os.O_APPEND | os.O_CREAT
+        )
+        try:
+            os.write(spool, lines.encode("utf-8"))
+        finally:
+            os.close(spool)
+
+        if not prometheus_path:
+            return
+        totals_path = os.path.join(folder, TOTALS_NAME)
+        try:
+            with open(totals_path) as totals_file:
+                totals = json.load(totals_file)
+        except (IOError, OSError, ValueError):
+            totals = {}
+        for cmd_key, stats in commands.items():
+            total = totals.get(cmd_key)
+            if total is None or len(total["buckets"]) != len(stats["buckets"]):
+                total = totals[cmd_key] = _new_stats()
+            for name in ("calls", "failures", "seconds"):
+                total[name] += stats[name]
+            total["buckets"] = [
+                total_count + count
+                for total_count, count in zip(total["buckets"], stats["buckets"])
+            ]
+        _write_atomically(totals_path, json.dumps(totals, sort_keys=True))
+        _write_atomically(prometheus_path, format_prometheus(totals))
+
+
+class MetricsSpooler(object):
+    """
+    Writes the command counters in batches, from a background thread.
+    """
+
+    def __init__(self, folder, interval, prometheus_path=None, logger=None):
+        """
+        :param str folder: Spool folder.
+        :param float interval: Number of seconds between batches.
+        :param str prometheus_path: Prometheus export file, if any.
+        :param logger: Logger the write errors are reported to.
+        """
+        self.metrics = CommandMetrics()
+        self._folder = folder
+        self._interval = interval
+        self._prometheus_path = prometheus_path
+        self._logger = logger
+        self._stopped = threading.Event()
+        self._thread = None
+        # only one batch is written at a time by this process
+        self._flush_lock = threading.Lock()
+
+    def start(self):
+        """
+        Start writing batches in the background.
+        """
+        self._thread = threading.Thread(target=self._run, name="tk-shell metrics")
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        """
+        Stop the background thread and write the last batch.
+        """
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.flush()
+
+    def reset_after_fork(self):
+        """
+        Start writing batches in a forked process, e.g. a fan-out worker.
+
+        The background thread of the parent process doesn't exist in the fork,
+        and the runs counted by the parent are left for it to write.
+        """
+        self.metrics = CommandMetrics()
+        self._stopped = threading.Event()
+        # may have been held by the parent thread when forking
+        self._flush_lock = threading.Lock()
+        self.start()
+
+    def flush(self):
+        """
+        Write the counters recorded since the previous batch, if any.
+        """
+        with self._flush_lock:
+            commands = self.metrics.pop()
+            if not commands:
+                return
+            try:
+                write_batch(self._folder, commands, self._prometheus_path)
+            except (IOError, OSError) as e:
+                if self._logger:
+                    self._logger.warning("Could not write the command metrics: %s", e)
+
+    def _run(self):
+        while not self._stopped.wait(self._interval):
+            self.flush()
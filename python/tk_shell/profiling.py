@@ -0,0 +1,76 @@
+# Copyright (c) 2013 Shotgun Software Inc.
+#
+# CONFIDENTIAL AND PROPRIETARY
+#
+# This work is provided "AS IS" and subject to the Shotgun Pipeline Toolkit
+# Source Code License included in this distribution package. See LICENSE.
+# By accessing, using, copying or modifying this work you indicate your
+# agreement to the Shotgun Pipeline Toolkit Source Code License. All rights
+# not expressly granted therein are reserved by Shotgun Software Inc.
+
+"""
+Profiling of the command callbacks only, without the engine bootstrap.
+
+The statistics are written as ``.pstats`` files, which can be loaded with
+:mod:`pstats` or viewers like snakeviz.
+"""
+
+import cProfile
+import os
+import pstats
+import re
+import time
+
+from tank_vendor import six
+
+
+def get_profile_path(folder, cmd_key, context):
+    """
+    Get a unique statistics file path for a command run.
+
+    :param str folder: Folder to write the file in.
+    :param str cmd_key: Key of the command.
+    :param context: Context the command is run in.
+    :returns: Path of a ``.pstats`` file named after the command key, context
+        and current time.
+    """
+    now = time.time()
+    name = "%s-%s-%s.%03d-%d" % (
+        cmd_key,
+        context,
+        time.strftime("%Y%m%d-%H%M%S", time.localtime(now)),
+        (now % 1) * 1000,
+        os.getpid(),
+    )
+    return os.path.join(folder, "%s.pstats" % re.sub(r"[^\w.-]+", "_", name))
+
+
+def run_profiled(call, path, top_entries, report, logger):
+    """
+    Run a function in a profiler and save the statistics.
+
+    The statistics are saved and reported even if the function raises. Failing
+    to save them is only logged, so the command result is kept.
+
+    :param call: Function to call without arguments.
+    :param str path: Path of the ``.pstats`` file to write.
+    :param int top_entries: Number of entries to include in the summary.
+    :param report: Called with a summary of the top cumulative time entries.
+    :param logger: Logger to warn with if the statistics can't be saved.
+    :returns: The value returned by the function.
+    """
+    profiler = cProfile.Profile()
+    try:
+        return profiler.runcall(call)
+    finally:
+        try:
+            folder = os.path.dirname(path)
+            if folder and not os.path.isdir(folder):
+                os.makedirs(folder)
+            profiler.dump_stats(path)
+            stream = six.StringIO()
+            stats = pstats.Stats(profiler, stream=stream)
+            stats.sort_stats("cumulative").print_stats(top_entries)
+            report(stream.getvalue().strip())
+        except (IOError, OSError) as e:
+            logger.warning("Could not write the profile: %s", e)
@@ -0,0 +1,180 @@
+# Copyright (c) 2013 Shotgun Software Inc.
+#
+# CONFIDENTIAL AND PROPRIETARY
+#
+# This work is provided "AS IS" and subject to the Shotgun Pipeline Toolkit
+# Source Code License included in this distribution package. See LICENSE.
+# By accessing, using, copying or modifying this work you indicate your
+# agreement to the Shotgun Pipeline Toolkit Source Code License. All rights
+# not expressly granted therein are reserved by Shotgun Software Inc.
+
+"""
+Cache of the Qt bindings found by Toolkit, across process starts.
+
+Toolkit tries each Qt binding in turn, and every failed import looks for the
+module in each ``sys.path`` folder. The binding found, or the absence of any, is
+recorded per Python environment, so the next starts only let Toolkit import
+the known binding, the others failing right away.
+
+Environments are identified by the interpreter, its version and the
+``sys.path`` folders with their modification times, so installing a binding in
+one of them is noticed.
+"""
+
+import contextlib
+import hashlib
+import json
+import os
+import sys
+import tempfile
+import time
+
+#: Environment variable overriding the folder the cache file is written in.
+CACHE_ENV_VAR = "TK_SHELL_QT_DETECTION_CACHE"
+
+# Top level packages of the Qt bindings Toolkit can use.
+QT_BINDINGS = ("PySide6", "PySide2", "PySide", "PyQt5", "PyQt4")
+
+# Bindings which need QTextCodec.setCodecForCStrings to be called.
+QT4_BINDINGS = ("PySide", "PyQt4")
+
+# Number of Python environments remembered.
+MAX_ENVIRONMENTS = 20
+
+
+def get_cache_path():
+    """
+    Get the per user cache file.
+
+    :returns: Path to the JSON cache file.
+    """
+    folder = os.environ.get(CACHE_ENV_VAR)
+    if not folder:
+        cache_home = os.environ.get("XDG_CACHE_HOME") or os.path.join(
+            os.path.expanduser("~"), ".cache"
+        )
+        folder = os.path.join(cache_home, "tk-shell")
+    return os.path.join(folder, "qt_detection.json")
+
+
+def get_environment_key():
+    """
+    Get a key identifying the current Python environment.
+
+    :returns: Hexadecimal digest.
+    """
+    digest = hashlib.sha1()
+    digest.update(("%s\n%s\n" % (sys.executable, sys.version)).encode("utf-8"))
+    for path in sys.path:
+        try:
+            mtime = os.stat(path or os.curdir).st_mtime
+        except OSError:
+            mtime = None
+        digest.update(("%s:%r\n" % (path, mtime)).encode("utf-8"))
+    return digest.hexdigest()
+
+
+def get_binding(qt_core):
+    """
+    Get the binding a QtCore module comes from.
+
+    :param qt_core: QtCore module returned by Toolkit.
+    :returns: One of :data:`QT_BINDINGS`, or None if unknown.
+    """
+    binding = getattr(qt_core, "__name__", "").partition(".")[0]
+    return binding if binding in QT_BINDINGS else None
+
+
+def _read_cache(path):
+    """
+    Reads the cache file.
+
+    :returns: The cache dictionary, or None if missing or invalid.
+    """
+    try:
+        with open(path) as cache_file:
+            cache = json.load(cache_file)
+    except (IOError, OSError, ValueError):
+        return None
+    return cache if isinstance(cache, dict) else None
+
+
+def read_entry(key):
+    """
+    Get what was found in a Python environment.
+
+    :param str key: Key from :func:`get_environment_key`.
+    :returns: A ``{"binding": binding or None, "set_codec": bool}`` dictionary,
+        or None if the environment is unknown.
+    """
+    cache = _read_cache(get_cache_path()) or {}
+    entry = cache.get("environments", {}).get(key)
+    if not isinstance(entry, dict):
+        return None
+    if entry.get("binding") is not None and entry["binding"] not in QT_BINDINGS:
+        return None
+    return entry
+
+
+def write_entry(key, binding):
+    """
+    Record what was found in a Python environment.
+
+    The cache file is replaced atomically, so concurrent starts never see a
+    partial file.
+
+    :param str key: Key from :func:`get_environment_key`.
+    :param str binding: One of :data:`QT_BINDINGS`, None if Qt is missing.
+    :raises IOError, OSError: If the cache file can't be written.
+    """
+    path = get_cache_path()
+    cache = _read_cache(path) or {}
+    environments = cache.get("environments")
+    if not isinstance(environments, dict):
+        environments = {}
+    environments[key] = {
+        "binding": binding,
+        "set_codec": binding in QT4_BINDINGS,
+        "time": time.time(),
+    }
+    if len(environments) > MAX_ENVIRONMENTS:
+        keys = sorted(environments, key=lambda k: environments[k].get("time", 0))
+        for old_key in keys[: len(keys) - MAX_ENVIRONMENTS]:
+            del environments[old_key]
+
+    folder = os.path.dirname(path)
+    if not os.path.isdir(folder):
+        os.makedirs(folder)
+    handle, temp_path = tempfile.mkstemp(dir=folder, suffix=".tmp")
+    try:
+        with os.fdopen(handle, "w") as cache_file:
+            json.dump({"environments": environments}, cache_file)
+        # os.rename can't replace an existing file on Windows with Python 2.
+        getattr(os, "replace", os.rename)(temp_path, path)
+    except BaseException:
+        os.remove(temp_path)
+        raise
+
+
+@contextlib.contextmanager
+def only_binding(binding):
+    """
+    Make the imports of the other Qt bindings fail right away.
+
+    Bindings which were already imported are left alone, and the others can be
+    imported again once the context is exited.
+
+    :param str binding: The binding which can be imported, None for none.
+    """
+    blocked = [
+        name for name in QT_BINDINGS if name != binding and name not in sys.modules
+    ]
+    for name in blocked:
+        # an ImportError is raised for modules set to None
+        sys.modules[name] = None
+    try:
+        yield
+    finally:
+        for name in blocked:
+            if name in sys.modules and sys.modules[name] is None:
+                del sys.modules[name]
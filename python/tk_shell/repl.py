@@ -0,0 +1,250 @@
+# Copyright (c) 2013 Shotgun Software Inc.
+#
+# CONFIDENTIAL AND PROPRIETARY
+#
+# This work is provided "AS IS" and subject to the Shotgun Pipeline Toolkit
+# Source Code License included in this distribution package. See LICENSE.
+# By accessing, using, copying or modifying this work you indicate your
+# agreement to the Shotgun Pipeline Toolkit Source Code License. All rights
+# not expressly granted therein are reserved by Shotgun Software Inc.
+
+"""
+Interactive prompt running commands through a single engine session.
+
+Each line is a command short name followed by its arguments, split like a
+shell would, e.g.::
+
+    tank [Project Big Buck Bunny]> context Shot 1234
+    tank [Shot ABC, Project Big Buck Bunny]> publish_in_place "/a path/file.exr"
+
+Engine commands named like a prompt command, e.g. ``context``, are run by
+prefixing them with ``!``, e.g. ``!context``.
+
+Command names are completed with the tab key and the history is kept across
+sessions, when the ``readline`` module is available.
+"""
+
+import cmd
+import os
+import shlex
+
+from tank import TankError
+
+from . import completion
+
+try:
+    import readline
+except ImportError:
+    # e.g. on Windows
+    readline = None
+
+# Number of lines kept in the history file.
+HISTORY_SIZE = 1000
+
+
+def get_history_path():
+    """
+    Get the default per user history file.
+
+    :returns: Path to the history file.
+    """
+    cache_home = os.environ.get("XDG_CACHE_HOME") or os.path.join(
+        os.path.expanduser("~"), ".cache"
+    )
+    return os.path.join(cache_home, "tk-shell", "repl_history")
+
+
+class EngineShell(cmd.Cmd):
+    """
+    Prompt dispatching the commands typed to a started :class:`ShellEngine`.
+
+    Besides the engine commands, ``context TYPE ID`` switches the engine
+    context, ``commands`` lists the commands of the current context and
+    ``exit`` or Ctrl+D leaves the prompt. Lines starting with ``!`` always run
+    an engine command.
+    """
+
+    def __init__(self, engine, history_path=None, stdin=None, stdout=None):
+        """
+        :param engine: The started :class:`ShellEngine`.
+        :param str history_path: File the history is kept in, not kept if None.
+        :param stdin: Input stream, ``sys.stdin`` by default.
+        :param stdout: Output stream, ``sys.stdout`` by default.
+        """
+        # cmd.Cmd is an old style class in Python 2
+        cmd.Cmd.__init__(self, stdin=stdin, stdout=stdout)
+        if stdin is not None:
+            # read lines from the stream, rather than with input()
+            self.use_rawinput = False
+        self._engine = engine
+        self._history_path = history_path
+        # the context the command names prefix tree was built for
+        self._trie_context = None
+        self._trie = None
+
+    @property
+    def prompt(self):
+        return "tank [%s]> " % (self._engine.context,)
+
+    def run(self):
+        """
+        Run the prompt until the user leaves it.
+
+        Ctrl+C cancels the line being typed, or the command running.
+        """
+        self._read_history()
+        self._warn_shadowed()
+        intro = "Type help for help, exit or Ctrl+D to leave."
+        try:
+            while True:
+                try:
+                    self.cmdloop(intro)
+                    return
+                except KeyboardInterrupt:
+                    self.stdout.write("^C\n")
+                    intro = ""
+        finally:
+            self._write_history()
+
+    def _warn_shadowed(self):
+        """
+        Warn about the engine commands named like a prompt command.
+        """
+        shadowed = sorted(
+            name for name in self._get_commands() if hasattr(self, "do_" + name)
+        )
+        if shadowed:
+            self._engine.logger.warning(
+                "The %s commands are run by the prompt, prefix them with ! to run "
+                "the engine ones, e.g. !%s",
+                ", ".join(shadowed),
+                shadowed[0],
+            )
+
+    def _read_history(self):
+        """
+        Load the history of the previous sessions.
+        """
+        if readline is None or not self._history_path:
+            return
+        readline.set_history_length(HISTORY_SIZE)
+        try:
+            readline.read_history_file(self._history_path)
+        except (IOError, OSError):
+            # no history yet
+            pass
+
+    def _write_history(self):
+        """
+        Save the history for the next sessions.
+        """
+        if readline is None or not self._history_path:
+            return
+        try:
+            folder = os.path.dirname(self._history_path)
+            if not os.path.isdir(folder):
+                os.makedirs(folder)
+            readline.write_history_file(self._history_path)
+        except (IOError, OSError) as e:
+            self._engine.logger.debug("Could not save the history: %s", e)
+
+    def emptyline(self):
+        # don't run the previous command again
+        pass
+
+    def default(self, line):
+        """
+        Run an engine command, with a ``!`` prefix for those named like a
+        prompt command.
+        """
+        if line.startswith("!"):
+            line = line[1:]
+        try:
+            tokens = shlex.split(line)
+        except ValueError as e:
+            self._engine.logger.error("Invalid command line: %s", e)
+            return
+        if not tokens:
+            # e.g. a line with only a ! prefix
+            return
+
+        name, args = tokens[0], tokens[1:]
+        try:
+            cmd_key = self._engine.resolve_command_key(name)
+            self._engine.run_command(cmd_key, args)
+        except KeyboardInterrupt:
+            self._engine.logger.info("The command was cancelled by the user.")
+        except TankError as e:
+            self._engine.logger.error(str(e))
+        except Exception:
+            self._engine.logger.exception("%s failed.", name)
+
+    def completenames(self, text, *ignored):
+        names = cmd.Cmd.completenames(self, text, *ignored)
+        return sorted(set(names + completion.complete(self._get_trie(), text)))
+
+    def _get_trie(self):
+        """
+        Get the prefix tree of the command short names of the current context.
+        """
+        if self._trie is None or self._trie_context != self._engine.context:
+            self._trie = completion.build_trie(self._get_commands())
+            self._trie_context = self._engine.context
+        return self._trie
+
+    def _get_commands(self):
+        """
+        Get the commands of the current context.
+
+        :returns: Dictionary of short names mapped to descriptions.
+        """
+        commands = {}
+        for key, info in self._engine.commands.items():
+            properties = info.get("properties", {})
+            commands[properties.get("short_name") or key] = properties.get(
+                "description", ""
+            )
+        return commands
+
+    def do_commands(self, arg):
+        """List the commands of the current context."""
+        commands = self._get_commands()
+        width = max([len(name) for name in commands] or [0])
+        for name in sorted(commands):
+            self.stdout.write(("%-*s  %s" % (width, name, commands[name])).rstrip())
+            self.stdout.write("\n")
+
+    def do_context(self, arg):
+        """Switch to the context of an entity, e.g. context Shot 1234."""
+        tokens = arg.split()
+        if not tokens:
+            self.stdout.write("%s\n" % (self._engine.context,))
+            return
+        if len(tokens) != 2 or not tokens[1].isdigit():
+            self._engine.logger.error("Usage: context TYPE ID")
+            return
+        try:
+            self._engine.change_entity_context(
+                {"type": tokens[0], "id": int(tokens[1])}
+            )
+        except TankError as e:
+            self._engine.logger.error(str(e))
+        except Exception:
+            self._engine.logger.exception("Could not switch to %s.", arg)
+
+    def do_help(self, arg):
+        """Show the description of a command."""
+        commands = self._get_commands()
+        if arg in commands:
+            self.stdout.write("%s\n" % (commands[arg] or "No description."))
+        else:
+            cmd.Cmd.do_help(self, arg)
+
+    def do_exit(self, arg):
+        """Leave the prompt."""
+        return True
+
+    def do_EOF(self, arg):
+        """Leave the prompt."""
+        self.stdout.write("\n")
+        return True
@@ -0,0 +1,252 @@
+# Copyright (c) 2013 Shotgun Software Inc.
+#
+# CONFIDENTIAL AND PROPRIETARY
+#
+# This work is provided "AS IS" and subject to the Shotgun Pipeline Toolkit
+# Source Code License included in this distribution package. See LICENSE.
+# By accessing, using, copying or modifying this work you indicate your
+# agreement to the Shotgun Pipeline Toolkit Source Code License. All rights
+# not expressly granted therein are reserved by Shotgun Software Inc.
+
+"""
+Cache of the results of read only commands.
+
+Results are kept in memory, in a least recently used cache, and optionally
+pickled in a local folder so other processes can reuse them. The folder must
+be private to the user, as the pickled results are loaded back, see
+:func:`check_folder`.
+
+Results are copied when stored and returned, so callers changing a result don't
+change the cached one.
+"""
+
+import collections
+import copy
+import errno
+import hashlib
+import json
+import os
+import re
+import shutil
+import stat
+import tempfile
+import time
+
+from tank_vendor.six.moves import cPickle as pickle
+
+# Pickle protocol readable by both Python 2 and 3.
+PICKLE_PROTOCOL = 2
+
+
+def get_result_key(context_key, cmd_key, args):
+    """
+    Get the cache key of a command call.
+
+    :param str context_key: Key identifying the context.
+    :param str cmd_key: Key of the command.
+    :param list args: Command arguments.
+    :returns: A string key.
+    """
+    return json.dumps([context_key, cmd_key, list(args)], default=str)
+
+
+def check_folder(folder):
+    """
+    Create the folder storing the results if needed, and make sure it is
+    private to the current user.
+
+    Otherwise another user could write a crafted pickle in it, which would run
+    their code when loaded.
+
+    :param str folder: Folder to store the results in.
+    :raises OSError: If the folder is not a directory, as opposed to a symbolic
+        link, owned by the current user and only accessible to them.
+    """
+    if not os.path.lexists(folder):
+        os.makedirs(folder, 0o700)
+    if not hasattr(os, "getuid"):
+        # Windows, where the permissions are inherited from the user profile
+        return
+    folder_stat = os.lstat(folder)
+    if (
+        not stat.S_ISDIR(folder_stat.st_mode)
+        or folder_stat.st_uid != os.getuid()
+        or stat.S_IMODE(folder_stat.st_mode) & 0o077
+    ):
+        raise OSError(
+            "The results folder %s must be a directory owned by the current user "
+            "with 0700 permissions." % folder
+        )
+
+
+class ResultCache(object):
+    """
+    Least recently used cache of command results, with a time to live.
+    """
+
+    def __init__(self, size, folder=None):
+        """
+        :param int size: Maximum number of results kept in memory, and on disk
+            for each command.
+        :param str folder: Folder to also store the results in, memory only if
+            None. It must have been checked with :func:`check_folder`.
+        """
+        self._size = size
+        self._folder = folder
+        # result keys mapped to their command key, expiry time and value
+        self._results = collections.OrderedDict()
+
+    def get(self, cmd_key, key):
+        """
+        Get a result which hasn't expired yet.
+
+        :param str cmd_key: Key of the command.
+        :param str key: Key from :func:`get_result_key`.
+        :returns: A ``(found, value)`` tuple, the value being a copy of the
+            stored one.
+        """
+        entry = self._results.pop(key, None)
+        if entry is None and self._folder:
+            entry = self._read(cmd_key, key)
+        if entry is None or entry[1] <= time.time():
+            return False, None
+        # most recently used last
+        self._results[key] = entry
+        return True, copy.deepcopy(entry[2])
+
+    def put(self, cmd_key, key, value, ttl):
+        """
+        Store a result.
+
+        A copy of the result is stored. Results which can't be copied are not
+        cached, and those which can't be pickled are only kept in memory.
+
+        :param str cmd_key: Key of the command.
+        :param str key: Key from :func:`get_result_key`.
+        :param value: Result of the command.
+        :param float ttl: Number of seconds the result is valid for.
+        """
+        try:
+            value = copy.deepcopy(value)
+        except Exception:
+            # e.g. holds a lock or an open file
+            return
+        entry = (cmd_key, time.time() + ttl, value)
+        self._results.pop(key, None)
+        self._results[key] = entry
+        while len(self._results) > self._size:
+            self._results.popitem(last=False)
+        if self._folder:
+            self._write(cmd_key, key, entry)
+
+    def invalidate(self, cmd_key=None):
+        """
+        Discard the results of a command, or of every command.
+
+        :param str cmd_key: Key of the command, all of them if None.
+        """
+        for key, entry in list(self._results.items()):
+            if cmd_key is None or entry[0] == cmd_key:
+                del self._results[key]
+        if not self._folder:
+            return
+        if cmd_key is None:
+            folders = [
+                os.path.join(self._folder, name) for name in self._list(self._folder)
+            ]
+        else:
+            folders = [self._get_command_folder(cmd_key)]
+        for folder in folders:
+            shutil.rmtree(folder, ignore_errors=True)
+
+    def _get_command_folder(self, cmd_key):
+        """
+        Get the folder storing the results of a command.
+        """
+        digest = hashlib.sha1(cmd_key.encode("utf-8")).hexdigest()[:8]
+        return os.path.join(
+            self._folder, "%s-%s" % (re.sub(r"[^\w.-]+", "_", cmd_key), digest)
+        )
+
+    def _get_path(self, cmd_key, key):
+        """
+        Get the path of the file storing a result.
+        """
+        digest = hashlib.sha1(key.encode("utf-8")).hexdigest()
+        return os.path.join(self._get_command_folder(cmd_key), digest + ".pickle")
+
+    @staticmethod
+    def _list(folder):
+        """
+        List a folder, empty if it doesn't exist.
+        """
+        try:
+            return os.listdir(folder)
+        except OSError as e:
+            if e.errno != errno.ENOENT:
+                raise
+            return []
+
+    def _read(self, cmd_key, key):
+        """
+        Read a result from disk.
+
+        :returns: The entry, or None if missing, expired or unreadable.
+        """
+        path = self._get_path(cmd_key, key)
+        try:
+            with open(path, "rb") as result_file:
+                stored_key, entry = pickle.load(result_file)
+        except (IOError, OSError, EOFError, ValueError, pickle.UnpicklingError):
+            return None
+        except Exception:
+            # e.g. the class of the result can't be imported anymore
+            return None
+        if stored_key != key:
+            # hash collision
+            return None
+        if entry[1] <= time.time():
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            return None
+        return entry
+
+    def _write(self, cmd_key, key, entry):
+        """
+        Write a result to disk atomically and trim the command folder.
+        """
+        folder = self._get_command_folder(cmd_key)
+        try:
+            data = pickle.dumps((key, entry), PICKLE_PROTOCOL)
+        except Exception:
+            # not picklable, memory only
+            return
+        try:
+            if not os.path.isdir(folder):
+                os.makedirs(folder)
+            handle, temp_path = tempfile.mkstemp(dir=folder, suffix=".tmp")
+            try:
+                with os.fdopen(handle, "wb") as result_file:
+                    result_file.write(data)
+                # os.rename can't replace an existing file on Windows with Python 2.
+                getattr(os, "replace", os.rename)(
+                    temp_path, self._get_path(cmd_key, key)
+                )
+            except BaseException:
+                os.remove(temp_path)
+                raise
+
+            names = [name for name in self._list(folder) if name.endswith(".pickle")]
+            if len(names) > self._size:
+                paths = sorted(
+                    (os.path.join(folder, name) for name in names),
+                    key=os.path.getmtime,
+                )
+                for path in paths[: len(paths) - self._size]:
+                    os.remove(path)
+        except (IOError, OSError):
+            # the disk cache is best effort, concurrent processes may trim the
+            # same files
+            pass
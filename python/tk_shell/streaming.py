@@ -0,0 +1,108 @@
+# Copyright (c) 2013 Shotgun Software Inc.
+#
+# CONFIDENTIAL AND PROPRIETARY
+#
+# This work is provided "AS IS" and subject to the Shotgun Pipeline Toolkit
+# Source Code License included in this distribution package. See LICENSE.
+# By accessing, using, copying or modifying this work you indicate your
+# agreement to the Shotgun Pipeline Toolkit Source Code License. All rights
+# not expressly granted therein are reserved by Shotgun Software Inc.
+
+"""
+JSON lines output of the commands whose callback is a generator.
+
+Each item yielded is written as soon as it is produced, as a single JSON line,
+to a file descriptor. Writes block while the reader is behind, e.g. with a full
+pipe, so the generator is only resumed once its previous item was consumed.
+
+A last line reports how the command ended, e.g.::
+
+    {"command": "list_publishes", "count": 2, "seconds": 0.4, "tk_shell_status": "ok"}
+
+with a ``tk_shell_status`` of ``"ok"``, ``"error"``, along with an ``"error"``
+message, or ``"cancelled"``.
+"""
+
+import errno
+import json
+import os
+import sys
+import time
+
+# File descriptor of the standard output.
+STDOUT_FD = 1
+
+# Key of the status line, which items are not expected to have.
+STATUS_KEY = "tk_shell_status"
+
+
+class BrokenPipe(Exception):
+    """
+    Raised when the reader closed its end of the output, e.g. ``| head``.
+    """
+
+
+def write_line(fd, record):
+    """
+    Write a record as a JSON line.
+
+    Values which aren't JSON types, e.g. dates, are written as strings.
+
+    :param int fd: File descriptor to write to.
+    :param record: The record.
+    :raises BrokenPipe: If the reader is gone.
+    :raises OSError: If the line can't be written.
+    """
+    data = (json.dumps(record, default=str) + "\n").encode("utf-8")
+    if fd == STDOUT_FD:
+        # keep the lines in order with what the command printed
+        sys.stdout.flush()
+    try:
+        while data:
+            data = data[os.write(fd, data) :]
+    except OSError as e:
+        if e.errno == errno.EPIPE:
+            raise BrokenPipe()
+        raise
+
+
+def stream_results(cmd_key, items, fd=STDOUT_FD):
+    """
+    Write the items yielded by a command, followed by its status line.
+
+    :param str cmd_key: Key of the command.
+    :param items: Generator returned by the command callback.
+    :param int fd: File descriptor to write to.
+    :returns: Number of items written.
+    :raises Exception: The error raised by the generator, once the status line
+        is written.
+    """
+    start = time.time()
+    count = 0
+    status = {"command": cmd_key}
+    try:
+        for item in items:
+            write_line(fd, item)
+            count += 1
+    except BrokenPipe:
+        # nobody reads the rest, stop producing it
+        items.close()
+        return count
+    except KeyboardInterrupt:
+        status[STATUS_KEY] = "cancelled"
+        raise
+    except Exception as e:
+        status[STATUS_KEY] = "error"
+        status["error"] = str(e)
+        raise
+    else:
+        status[STATUS_KEY] = "ok"
+    finally:
+        if STATUS_KEY in status:
+            status["count"] = count
+            status["seconds"] = time.time() - start
+            try:
+                write_line(fd, status)
+            except (BrokenPipe, OSError):
+                pass
+    return count
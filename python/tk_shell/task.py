@@ -8,28 +8,112 @@
 # agreement to the Shotgun Pipeline Toolkit Source Code License. All rights
 # not expressly granted therein are reserved by Shotgun Software Inc.
 
+import ctypes
+import signal
+import sys
+import threading
+
 import tank
 
 from tank.platform.qt import QtCore
 
+# Interval at which the event loop lets Python handle Ctrl+C, in milliseconds.
+SIGNAL_POLL_INTERVAL = 200
+
+
+def _set_async_exception(thread_id, exception):
+    """
+    Raise an exception in another thread, as soon as it runs Python code.
+
+    :param int thread_id: Identifier of the thread.
+    :param exception: Exception class, None to clear a pending one.
+    """
+    id_type = ctypes.c_ulong if sys.version_info >= (3, 7) else ctypes.c_long
+    ctypes.pythonapi.PyThreadState_SetAsyncExc(
+        id_type(thread_id),
+        ctypes.py_object(exception) if exception is not None else None,
+    )
+
 
 class Task(QtCore.QObject):
     """
     This is a wrapper class which allows us to run tank commands
     inside the QT universe. This approach is handy when an engine needs
     to start up a qt event loop as part of its initailization.
+
+    In threaded mode, the callback runs in a worker thread so long console
+    commands don't freeze the event loop, and the dialogs they show are
+    created in the main thread by the engine. Ctrl+C then cancels the command
+    by raising ``KeyboardInterrupt`` in the worker thread, a second Ctrl+C
+    quits the event loop without waiting for the command.
     """
 
     finished = QtCore.Signal()
 
-    def __init__(self, engine, callback, args):
+    # emitted from the worker thread, delivered in the main thread
+    _callback_done = QtCore.Signal()
+
+    def __init__(self, engine, callback, args, threaded=False):
         QtCore.QObject.__init__(self)
         self._callback = callback
         self._args = args
         self._engine = engine
+        self._threaded = threaded
+        self._thread = None
+        # guards _running, so cancel never interrupts the worker thread once
+        # the callback returned
+        self._lock = threading.Lock()
+        self._running = False
+        self._cancel_requested = threading.Event()
+        self._previous_sigint_handler = None
+        self._signal_timer = None
 
     def run_command(self):
+        if not self._threaded:
+            try:
+                self._run_callback()
+            finally:
+                self._finish()
+            return
+
+        self._callback_done.connect(self._on_callback_done)
+        self._previous_sigint_handler = signal.signal(signal.SIGINT, self._on_sigint)
+        # Python signal handlers only run when the interpreter gets control back
+        # from the event loop.
+        self._signal_timer = QtCore.QTimer(self)
+        self._signal_timer.timeout.connect(lambda: None)
+        self._signal_timer.start(SIGNAL_POLL_INTERVAL)
+
+        self._thread = threading.Thread(
+            target=self._run_in_thread, name="tk-shell command"
+        )
+        self._thread.daemon = True
+        self._running = True
+        self._thread.start()
 
+    def cancel_requested(self):
+        """
+        Check if the user asked to cancel the command, for callbacks catching
+        ``KeyboardInterrupt`` to clean up before returning.
+
+        :returns: True if the command was cancelled.
+        """
+        return self._cancel_requested.is_set()
+
+    def cancel(self):
+        """
+        Cancel the command running in the worker thread.
+
+        ``KeyboardInterrupt`` is raised in the worker thread as soon as it runs
+        Python code again, so commands blocked in a long system call only stop
+        once it returns.
+        """
+        self._cancel_requested.set()
+        with self._lock:
+            if self._running:
+                _set_async_exception(self._thread.ident, KeyboardInterrupt)
+
+    def _run_callback(self):
         try:
             # execute the callback
             self._callback(*self._args)
@@ -43,11 +127,46 @@ class Task(QtCore.QObject):
         except Exception:
             self._engine.log_exception("A general error was reported.")
 
+    def _run_in_thread(self):
+        try:
+            self._run_callback()
+        except KeyboardInterrupt:
+            # cancelled right after the callback returned
+            pass
         finally:
-            # broadcast that we have finished this command
-            if not self._engine.has_received_ui_creation_requests():
-                # while the app has been doing its thing, no UIs were
-                # created (at least not any tank UIs) - assume it is a
-                # console style app and that the end of its callback
-                # execution means that it is complete and that we should return
-                self.finished.emit()
+            self._stop_running()
+            self._callback_done.emit()
+
+    def _stop_running(self):
+        while True:
+            try:
+                with self._lock:
+                    self._running = False
+                    # discard a cancellation which wasn't raised yet
+                    _set_async_exception(self._thread.ident, None)
+                return
+            except KeyboardInterrupt:
+                # raised before the lock was acquired
+                continue
+
+    def _on_callback_done(self):
+        self._signal_timer.stop()
+        signal.signal(signal.SIGINT, self._previous_sigint_handler)
+        self._finish()
+
+    def _on_sigint(self, signum, frame):
+        if self._cancel_requested.is_set():
+            self._engine.log_warning("Not waiting for the cancelled operation.")
+            QtCore.QCoreApplication.exit(1)
+            return
+        self._engine.log_info("Cancelling the operation, press Ctrl+C again to quit.")
+        self.cancel()
+
+    def _finish(self):
+        # broadcast that we have finished this command
+        if not self._engine.has_received_ui_creation_requests():
+            # while the app has been doing its thing, no UIs were
+            # created (at least not any tank UIs) - assume it is a
+            # console style app and that the end of its callback
+            # execution means that it is complete and that we should return
+            self.finished.emit()
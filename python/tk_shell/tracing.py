@@ -0,0 +1,125 @@
+# Copyright (c) 2013 Shotgun Software Inc.
+#
+# CONFIDENTIAL AND PROPRIETARY
+#
+# This work is provided "AS IS" and subject to the Shotgun Pipeline Toolkit
+# Source Code License included in this distribution package. See LICENSE.
+# By accessing, using, copying or modifying this work you indicate your
+# agreement to the Shotgun Pipeline Toolkit Source Code License. All rights
+# not expressly granted therein are reserved by Shotgun Software Inc.
+
+"""
+Phase level tracing of the engine startup and command dispatch.
+
+Spans are written in the Chrome ``trace_event`` JSON format, which can be
+loaded in ``chrome://tracing`` or https://ui.perfetto.dev.
+"""
+
+import contextlib
+import json
+import os
+import threading
+import time
+
+
+def get_process_start_time():
+    """
+    Get the time the current process started at, on Linux only.
+
+    :returns: Time in seconds since the epoch or None if unknown.
+    """
+    try:
+        with open("/proc/self/stat") as stat_file:
+            # The process name can contain spaces, the fields are after it.
+            fields = stat_file.read().rsplit(")", 1)[1].split()
+        with open("/proc/stat") as stat_file:
+            boot_time = next(
+                int(line.split()[1]) for line in stat_file if line.startswith("btime")
+            )
+    except (IOError, OSError, IndexError, StopIteration, ValueError):
+        return None
+
+    # starttime is the 22nd field, the 20th after the process name and state.
+    ticks = int(fields[19])
+    return boot_time + float(ticks) / os.sysconf("SC_CLK_TCK")
+
+
+class Tracer(object):
+    """
+    Records timed spans.
+    """
+
+    def __init__(self):
+        self._spans = []
+        self._pid = os.getpid()
+
+    def add_span(self, name, category, start, end, args=None):
+        """
+        Records a span.
+
+        :param str name: Name of the span.
+        :param str category: Category, e.g. ``startup`` or ``command``.
+        :param float start: Start time, in seconds since the epoch.
+        :param float end: End time, in seconds since the epoch.
+        :param dict args: Optional extra information shown with the span.
+        """
+        self._spans.append(
+            (name, category, start, end, threading.current_thread().ident, args)
+        )
+
+    @contextlib.contextmanager
+    def span(self, name, category, args=None):
+        """
+        Context manager recording a span for the duration of its block.
+        """
+        start = time.time()
+        try:
+            yield
+        finally:
+            self.add_span(name, category, start, time.time(), args)
+
+    def write_chrome_trace(self, path):
+        """
+        Writes the spans as a Chrome trace_event JSON file.
+
+        :param str path: Path of the file to write.
+        """
+        events = []
+        for name, category, start, end, thread_id, args in self._spans:
+            event = {
+                "name": name,
+                "cat": category,
+                "ph": "X",
+                "ts": int(start * 1e6),
+                "dur": int((end - start) * 1e6),
+                "pid": self._pid,
+                "tid": thread_id,
+            }
+            if args:
+                event["args"] = args
+            events.append(event)
+
+        with open(path, "w") as trace_file:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, trace_file)
+
+    def summary(self):
+        """
+        Builds a compact text summary, one line per span in start order.
+
+        Spans are indented according to their nesting.
+
+        :returns: The summary text.
+        """
+        lines = []
+        open_ends = []
+        for name, category, start, end, _, _ in sorted(
+            self._spans, key=lambda span: (span[2], -span[3])
+        ):
+            while open_ends and start >= open_ends[-1]:
+                open_ends.pop()
+            lines.append(
+                "%9.1f ms  %s%s [%s]"
+                % ((end - start) * 1000, "  " * len(open_ends), name, category)
+            )
+            open_ends.append(end)
+        return "\n".join(lines)
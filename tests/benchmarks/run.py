@@ -0,0 +1,329 @@
+# -*- coding: utf-8 -*-
+"""Engine startup, command rename and dispatch benchmarks.
+
+The benchmarks run offline, against the stub Toolkit core in ``stubs``.
+
+Usage, from the repository's root folder:
+
+.. code-block:: bash
+
+    python -m tests.benchmarks.run             # print the results
+    python -m tests.benchmarks.run --save      # update baselines.json
+    python -m tests.benchmarks.run --compare   # fail on regressions
+
+Timings are normalized by a pure Python calibration loop before being compared,
+so baselines can be compared across machines of different speeds. Small timings
+are noisy on shared machines, hence the generous default threshold. The PySide2
+benchmarks are skipped if it is not installed.
+
+Test in Python 3.7.
+"""
+
+from __future__ import absolute_import, division, print_function
+
+import argparse
+import atexit
+import json
+import logging
+import os
+from pathlib import Path
+import platform
+import shutil
+import sys
+import tempfile
+import timeit
+
+BENCHMARKS_DIR = Path(__file__).parent
+BASELINES_PATH = BENCHMARKS_DIR / "baselines.json"
+
+# The stubs must shadow any installed Toolkit core before the engine is imported.
+sys.path.insert(0, str(BENCHMARKS_DIR / "stubs"))
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+CACHE_DIR = tempfile.mkdtemp(prefix="tk-shell-")
+atexit.register(shutil.rmtree, CACHE_DIR, True)
+os.environ["TK_SHELL_COMPLETION_CACHE"] = CACHE_DIR
+
+import tank  # noqa: E402
+
+from ..imports import engine as engine_module  # noqa: E402
+
+# The engine warnings about clashing renames would flood the output.
+logging.getLogger("sgtk").addHandler(logging.NullHandler())
+
+BENCHMARKS = []
+
+
+def benchmark(name):
+    """Register a function returning the seconds per operation, or None to skip."""
+
+    def decorator(func):
+        BENCHMARKS.append((name, func))
+        return func
+
+    return decorator
+
+
+def best_of(func, number, repeat=7):
+    """Get the best time per call of ``func`` over ``repeat`` runs."""
+    return min(timeit.repeat(func, number=number, repeat=repeat)) / number
+
+
+def start_engine(apps=(), settings=None, use_qt=False):
+    """Start a ShellEngine on the stub core, logging to the null device."""
+    tank.platform.use_qt = use_qt
+    # Environments with and without Qt have their own Qt detection cache.
+    os.environ["TK_SHELL_QT_DETECTION_CACHE"] = os.path.join(
+        CACHE_DIR, "qt" if use_qt else "no-qt"
+    )
+    engine = engine_module.ShellEngine(
+        tank.Tank(), tank.Context(), settings=settings, apps=apps
+    )
+    engine._stream_handler.stream = open(os.devnull, "w")
+    return engine
+
+
+def make_apps(app_count, commands_per_app):
+    """Build stub apps registering commands doing nothing."""
+
+    def noop(*args):
+        pass
+
+    return [
+        (
+            "tk-multi-app%d" % app,
+            [("app%d_cmd%d" % (app, cmd), noop) for cmd in range(commands_per_app)],
+        )
+        for app in range(app_count)
+    ]
+
+
+def make_commands(count):
+    """Build a commands dictionary, as registered by apps."""
+    return dict(
+        ("Command %d" % index, {"properties": {"short_name": "cmd_%d" % index}})
+        for index in range(count)
+    )
+
+
+def make_renames(count):
+    """Rename every other command, with a clashing pair every 10 commands."""
+    renames = dict(
+        ("cmd_%d" % index, "renamed_%d" % index) for index in range(0, count, 2)
+    )
+    for index in range(0, count - 1, 10):
+        renames["cmd_%d" % (index + 1)] = "renamed_%d" % index
+    return renames
+
+
+@benchmark("calibration")
+def bench_calibration():
+    def work():
+        data = {}
+        for index in range(10000):
+            data[str(index)] = index * 2
+        return sorted(data.items())
+
+    return best_of(work, number=20)
+
+
+def bench_renames(count):
+    engine = start_engine()
+    engine._commands = make_commands(count)
+    requested = make_renames(count)
+    try:
+        return best_of(
+            lambda: engine.validated_name_replacements(requested),
+            number=max(1, 1000 // count),
+        )
+    finally:
+        engine.destroy()
+
+
+for _count in (10, 1000, 50000):
+    benchmark("validated_name_replacements[%d]" % _count)(
+        lambda count=_count: bench_renames(count)
+    )
+
+
+@benchmark("validated_name_replacements[50000, pattern rules]")
+def bench_renames_patterns():
+    engine = start_engine()
+    engine._commands = make_commands(50000)
+    requested = {
+        r"re:cmd_(\d+)0": r"tens_\1",
+        "glob:cmd_*5": r"fives_\1",
+        "cmd_1": "one",
+    }
+    try:
+        return best_of(lambda: engine.validated_name_replacements(requested), number=1)
+    finally:
+        engine.destroy()
+
+
+@benchmark("name_replacements_update[50000, 10 changed]")
+def bench_renames_update():
+    engine = start_engine()
+    commands = make_commands(50000)
+    requested = make_renames(50000)
+    name_replacements = engine_module.NameReplacements(engine.logger)
+    name_replacements.update(requested, commands)
+    changed = dict(commands)
+    for index in range(5):
+        del changed["Command %d" % index]
+        changed["New command %d" % index] = {
+            "properties": {"short_name": "new_%d" % index}
+        }
+
+    def update():
+        # Switch back and forth, as context changes would.
+        name_replacements.update(requested, changed)
+        name_replacements.update(requested, commands)
+
+    try:
+        return best_of(update, number=5) / 2
+    finally:
+        engine.destroy()
+
+
+@benchmark("engine_init_to_ready[20 apps x 10 commands]")
+def bench_engine_init():
+    apps = make_apps(20, 10)
+
+    def start():
+        start_engine(apps).destroy()
+
+    return best_of(start, number=20)
+
+
+@benchmark("change_context[20 apps x 10 commands]")
+def bench_change_context():
+    engine = start_engine(make_apps(20, 10))
+    contexts = [tank.Context({"type": "Shot", "id": index}) for index in range(2)]
+
+    def switch():
+        for context in contexts:
+            engine.change_context(context)
+
+    try:
+        return best_of(switch, number=20) / len(contexts)
+    finally:
+        engine.destroy()
+
+
+@benchmark("execute_command[no qt]")
+def bench_dispatch():
+    engine = start_engine(make_apps(1, 1))
+    try:
+        return best_of(lambda: engine.execute_command("app0_cmd0", []), number=50000)
+    finally:
+        engine.destroy()
+
+
+@benchmark("execute_command[qt]")
+def bench_dispatch_qt():
+    engine = start_engine(make_apps(1, 1), use_qt=True)
+    try:
+        if not engine._has_qt:
+            return None
+        # With a running QApplication, commands are run synchronously.
+        engine._ensure_qt_application()
+        return best_of(lambda: engine.execute_command("app0_cmd0", []), number=2000)
+    finally:
+        engine.destroy()
+
+
+def bench_logging(queue_size, repeat_limit=0):
+    if queue_size:
+        os.environ[engine_module.LOG_QUEUE_SIZE_ENV_VAR] = str(queue_size)
+    try:
+        engine = start_engine(settings={"log_repeat_limit": repeat_limit})
+    finally:
+        os.environ.pop(engine_module.LOG_QUEUE_SIZE_ENV_VAR, None)
+    try:
+        return best_of(lambda: engine.log_info("Logging benchmark"), number=10000)
+    finally:
+        engine.destroy()
+
+
+benchmark("log_info[sync]")(lambda: bench_logging(0))
+benchmark("log_info[queue]")(lambda: bench_logging(100000))
+# The same message is logged over and over, so nearly all of them are collapsed.
+benchmark("log_info[repeated]")(lambda: bench_logging(0, repeat_limit=5))
+
+
+def run_benchmarks():
+    """Run every benchmark, returning the results as a JSON serializable dict."""
+    metrics = {}
+    calibration = None
+    for name, func in BENCHMARKS:
+        seconds = func()
+        if seconds is None:
+            print("%-50s skipped" % name)
+            continue
+        calibration = calibration or seconds
+        metrics[name] = {"seconds": seconds, "normalized": seconds / calibration}
+        print("%-50s %12.3f us %10.4f" % (name, seconds * 1e6, seconds / calibration))
+    return {
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "metrics": metrics,
+    }
+
+
+def compare(results, baselines, threshold):
+    """Print the normalized change of each metric.
+
+    :returns: The names of the metrics which regressed past the threshold.
+    """
+    regressions = []
+    for name, baseline in sorted(baselines["metrics"].items()):
+        if name == "calibration" or name not in results["metrics"]:
+            continue
+        ratio = results["metrics"][name]["normalized"] / baseline["normalized"]
+        regressed = ratio > 1 + threshold
+        print(
+            "%-50s %+8.1f%%%s"
+            % (name, (ratio - 1) * 100, "  REGRESSION" if regressed else "")
+        )
+        if regressed:
+            regressions.append(name)
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--save", action="store_true", help="Update the baselines.")
+    parser.add_argument(
+        "--compare", action="store_true", help="Fail if a metric regressed."
+    )
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.5,
+        help="Allowed relative slowdown before failing, default: %(default)s.",
+    )
+    parser.add_argument(
+        "--baselines", type=Path, default=BASELINES_PATH, help="Baselines file."
+    )
+    options = parser.parse_args(argv)
+
+    results = run_benchmarks()
+
+    if options.save:
+        options.baselines.write_text(json.dumps(results, indent=2, sort_keys=True))
+        print("Baselines saved to %s" % options.baselines)
+
+    if options.compare:
+        baselines = json.loads(options.baselines.read_text())
+        regressions = compare(results, baselines, options.threshold)
+        if regressions:
+            print(
+                "%d metrics regressed more than %d%%."
+                % (len(regressions), options.threshold * 100)
+            )
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,13 @@
+# -*- coding: utf-8 -*-
+"""Stand-in for :mod:`sgtk`, an alias of :mod:`tank`."""
+
+import sys
+
+import tank
+import tank.platform.qt
+import tank.platform.qt5
+import tank.util
+
+for _name in ("platform", "platform.qt", "platform.qt5", "util"):
+    sys.modules["sgtk." + _name] = sys.modules["tank." + _name]
+sys.modules[__name__] = tank
@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+"""Minimal stand-in for the Toolkit core, so the engine can be benchmarked offline.
+
+Only what ``engine.py`` and ``python/tk_shell`` use is implemented.
+"""
+
+import os
+import tempfile
+
+
+class TankError(Exception):
+    """Stand-in for :class:`tank.TankError`."""
+
+
+class Context(object):
+    """Stand-in for :class:`tank.Context`, for an entity dictionary."""
+
+    def __init__(self, entity=None):
+        self.entity = entity
+
+    def __str__(self):
+        return "%(type)s %(id)s" % self.entity if self.entity else "Site"
+
+    def __eq__(self, other):
+        return isinstance(other, Context) and self.entity == other.entity
+
+    def __ne__(self, other):
+        return not self == other
+
+    def to_dict(self):
+        return {"entity": self.entity}
+
+
+class PipelineConfiguration(object):
+    """Stand-in for a pipeline configuration without any configuration file."""
+
+    def __init__(self):
+        self._path = os.path.join(tempfile.gettempdir(), "tk-shell-benchmarks")
+
+    def get_path(self):
+        return self._path
+
+    def get_config_location(self):
+        return os.path.join(self._path, "config")
+
+
+class Tank(object):
+    """Stand-in for :class:`tank.Tank`."""
+
+    def __init__(self):
+        self.pipeline_configuration = PipelineConfiguration()
+
+
+from . import platform, util  # noqa: E402
@@ -0,0 +1,196 @@
+# -*- coding: utf-8 -*-
+"""Stand-in for :mod:`tank.platform` with a minimal :class:`Engine`.
+
+The engine startup follows the same order as the real core: ``init_engine``,
+the Qt base definitions, the apps ``init_app`` and then ``post_app_init``.
+"""
+
+import importlib
+import logging
+import types
+
+from . import qt, qt5
+
+_current_engine = None
+
+#: Set to False to start engines as if Qt was not installed.
+use_qt = True
+
+
+def current_engine():
+    return _current_engine
+
+
+def change_context(context):
+    _current_engine.change_context(context)
+
+
+def restart():
+    pass
+
+
+def _import_qt():
+    """Import PySide2 and merge QtWidgets into QtGui, like the core does."""
+    if not use_qt:
+        return None, None
+    try:
+        from PySide2 import QtCore, QtGui, QtWidgets
+    except ImportError:
+        return None, None
+
+    merged_gui = types.ModuleType("QtGui")
+    merged_gui.__dict__.update(QtGui.__dict__)
+    merged_gui.__dict__.update(QtWidgets.__dict__)
+    # QTextCodec.setCodecForCStrings doesn't exist in Qt5, the core patches it.
+    QtCore.QTextCodec.setCodecForCStrings = staticmethod(lambda codec: None)
+    return QtCore, merged_gui
+
+
+class Application(object):
+    """Stand-in for an app registering a number of commands."""
+
+    def __init__(self, engine, instance_name, commands):
+        self.engine = engine
+        self.instance_name = instance_name
+        self._commands = commands
+
+    def init_app(self):
+        for name, callback in self._commands:
+            # Apps usually register new closures each time they are initialized.
+            self.engine.register_command(
+                name, lambda *args, callback=callback: callback(*args)
+            )
+
+
+class Engine(object):
+    """Stand-in for :class:`tank.platform.Engine`.
+
+    Like the core, changing context initializes the apps again.
+
+    :param tk: :class:`tank.Tank` instance.
+    :param context: :class:`tank.Context` instance.
+    :param dict settings: Engine settings.
+    :param list apps: ``(instance_name, [(command name, callback), ...])``.
+    """
+
+    def __init__(self, tk, context, settings=None, apps=(), disk_location=None):
+        global _current_engine
+
+        self.sgtk = tk
+        self.context = context
+        self.disk_location = disk_location
+        self.icon_256 = ""
+        self.instance_name = "tk-shell"
+        self.logger = logging.getLogger("sgtk.env.stub.tk-shell")
+        self.apps = {}
+        self.frameworks = {}
+        self._settings = dict(settings or {})
+        self._commands = {}
+        self._invoker = None
+        self._async_invoker = None
+        self.__currently_initializing_app = None
+        self.__created_qt_dialogs = []
+        _current_engine = self
+
+        self.init_engine()
+
+        base = self._define_qt_base()
+        qt.QtCore = base["qt_core"]
+        qt.QtGui = base["qt_gui"]
+        qt.TankDialogBase = base["dialog_base"]
+        for name, value in self._define_qt5_base().items():
+            setattr(qt5, name, value)
+
+        self._app_commands = apps
+        self._load_apps()
+        self.post_app_init()
+
+    def _load_apps(self):
+        self.apps = {}
+        self._commands = {}
+        for instance_name, commands in self._app_commands:
+            app = Application(self, instance_name, commands)
+            self.apps[instance_name] = app
+            self.__currently_initializing_app = app
+            try:
+                app.init_app()
+            finally:
+                self.__currently_initializing_app = None
+
+    @property
+    def commands(self):
+        return self._commands
+
+    def init_engine(self):
+        pass
+
+    def post_app_init(self):
+        pass
+
+    def destroy(self):
+        global _current_engine
+        self.destroy_engine()
+        _current_engine = None
+
+    def destroy_engine(self):
+        pass
+
+    def get_setting(self, name, default=None):
+        return self._settings.get(name, default)
+
+    def import_module(self, name):
+        return importlib.import_module(name)
+
+    def register_command(self, name, callback, properties=None):
+        properties = dict(properties or {})
+        properties.setdefault("short_name", name)
+        properties.setdefault("app", self.__currently_initializing_app)
+        self._commands[name] = {"callback": callback, "properties": properties}
+
+    def change_context(self, context):
+        old_context, self.context = self.context, context
+        self._load_apps()
+        self.post_context_change(old_context, context)
+
+    def post_context_change(self, old_context, new_context):
+        pass
+
+    def execute_in_main_thread(self, func, *args, **kwargs):
+        return func(*args, **kwargs)
+
+    def log_exception(self, msg):
+        self.logger.exception(msg)
+
+    def _define_qt_base(self):
+        QtCore, QtGui = _import_qt()
+        return {"qt_core": QtCore, "qt_gui": QtGui, "dialog_base": None}
+
+    def _define_qt5_base(self):
+        return {}
+
+    def _initialize_dark_look_and_feel(self):
+        pass
+
+    def _create_dialog_with_widget(self, title, bundle, widget_class, *args, **kwargs):
+        """Wrap the widget in a plain dialog, without the core title bar."""
+        widget = widget_class(*args, **kwargs)
+        dialog = qt.TankDialogBase()
+        dialog.setWindowTitle(title)
+        layout = qt.QtGui.QVBoxLayout(dialog)
+        layout.addWidget(widget)
+        # Like the core, keep the dialogs alive as long as the engine.
+        self.__created_qt_dialogs.append(dialog)
+        return dialog, widget
+
+    def show_dialog(self, title, bundle, widget_class, *args, **kwargs):
+        dialog, widget = self._create_dialog_with_widget(
+            title, bundle, widget_class, *args, **kwargs
+        )
+        dialog.show()
+        return widget
+
+    def show_modal(self, title, bundle, widget_class, *args, **kwargs):
+        dialog, widget = self._create_dialog_with_widget(
+            title, bundle, widget_class, *args, **kwargs
+        )
+        return dialog.exec_(), widget
@@ -0,0 +1,6 @@
+# -*- coding: utf-8 -*-
+"""Stand-in for :mod:`tank.platform.qt`, populated by the engine at startup."""
+
+QtCore = None
+QtGui = None
+TankDialogBase = None
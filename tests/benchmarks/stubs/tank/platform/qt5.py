@@ -0,0 +1,2 @@
+# -*- coding: utf-8 -*-
+"""Stand-in for :mod:`tank.platform.qt5`, populated by the engine at startup."""
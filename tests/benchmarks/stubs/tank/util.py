@@ -0,0 +1,8 @@
+# -*- coding: utf-8 -*-
+"""Stand-in for :mod:`tank.util`."""
+
+import sys
+
+
+def is_linux():
+    return sys.platform.startswith("linux")
@@ -0,0 +1,2 @@
+# -*- coding: utf-8 -*-
+"""Stand-in for the libraries vendored by the Toolkit core."""
@@ -0,0 +1,9 @@
+# -*- coding: utf-8 -*-
+"""Python 3 only stand-in for :mod:`tank_vendor.six`."""
+
+from io import StringIO  # noqa: F401
+
+PY2 = False
+PY3 = True
+string_types = (str,)
+text_type = str
@@ -0,0 +1,6 @@
+# -*- coding: utf-8 -*-
+"""Stand-in for :mod:`tank_vendor.six.moves`."""
+
+import builtins  # noqa: F401
+import pickle as cPickle  # noqa: F401
+import queue  # noqa: F401
@@ -15,15 +15,26 @@ __all__ = (
     "REPO_ROOT",
     "import_file",
     "engine",
+    "tk_shell",
 )
 
 REPO_ROOT = Path(__file__).parent.parent
 
 
 def import_file(module_name: str, path: Union[str, Path]):
-    """Used to import a file directly as a module."""
+    """Used to import a file directly as a module.
+
+    If ``path`` is a folder, it is imported as a package.
+    """
     full_path = REPO_ROOT / path
-    spec = importlib.util.spec_from_file_location(module_name, full_path)
+    if full_path.is_dir():
+        spec = importlib.util.spec_from_file_location(
+            module_name,
+            full_path / "__init__.py",
+            submodule_search_locations=[str(full_path)],
+        )
+    else:
+        spec = importlib.util.spec_from_file_location(module_name, full_path)
     module = importlib.util.module_from_spec(spec)
     sys.modules[module_name] = module
     spec.loader.exec_module(module)
@@ -31,3 +42,4 @@ def import_file(module_name: str, path: Union[str, Path]):
 
 
 engine = import_file("engine", "engine.py")
+tk_shell = import_file("tk_shell", Path("python", "tk_shell"))
@@ -0,0 +1,206 @@
+# -*- coding: utf-8 -*-
+"""Minimal stand-in for the QtCore module, to test the Qt dependent modules.
+
+Signals emitted from another thread and single shot timers are posted as
+events, which only run when :func:`process_events` is called, like a queued
+connection to a main thread running the event loop would. Timers started
+with an interval don't fire on their own, tests emit their ``timeout`` signal.
+
+Test in Python 3.7.
+"""
+
+from __future__ import absolute_import, division, print_function
+
+import threading
+import types
+
+from .imports import tk_shell
+
+__all__ = ("QtCore", "install", "import_module", "process_events", "Widget")
+
+_posted = []
+_posted_lock = threading.Lock()
+_main_thread = threading.current_thread()
+
+
+def _post(callback, *args):
+    with _posted_lock:
+        _posted.append((callback, args))
+
+
+def process_events():
+    """Run the posted events, including those they post in turn."""
+    while True:
+        with _posted_lock:
+            if not _posted:
+                return
+            callback, args = _posted.pop(0)
+        callback(*args)
+
+
+class _BoundSignal(object):
+    def __init__(self):
+        self._slots = []
+
+    def connect(self, slot):
+        self._slots.append(slot)
+
+    def disconnect(self, slot=None):
+        self._slots = [] if slot is None else [s for s in self._slots if s != slot]
+
+    def emit(self, *args):
+        for slot in list(self._slots):
+            if threading.current_thread() is _main_thread:
+                slot(*args)
+            else:
+                _post(slot, *args)
+
+
+class Signal(object):
+    """Descriptor giving each object its own signal."""
+
+    def __init__(self, *types):
+        self._name = "_signal_%d" % id(self)
+
+    def __get__(self, instance, owner):
+        if instance is None:
+            return self
+        signal = instance.__dict__.get(self._name)
+        if signal is None:
+            signal = instance.__dict__[self._name] = _BoundSignal()
+        return signal
+
+
+class QObject(object):
+    def __init__(self, parent=None):
+        self._event_filters = []
+
+    def installEventFilter(self, event_filter):
+        self._event_filters.append(event_filter)
+
+    def removeEventFilter(self, event_filter):
+        self._event_filters.remove(event_filter)
+
+
+class QTimer(QObject):
+    timeout = Signal()
+
+    def __init__(self, parent=None):
+        QObject.__init__(self, parent)
+        self.interval = None
+
+    def start(self, interval=0):
+        self.interval = interval
+
+    def stop(self):
+        self.interval = None
+
+    def isActive(self):
+        return self.interval is not None
+
+    @staticmethod
+    def singleShot(interval, callback):
+        _post(callback)
+
+
+class QEvent(object):
+    Close = 19
+
+    def __init__(self, event_type):
+        self._type = event_type
+        self.accepted = True
+
+    def type(self):
+        return self._type
+
+    def ignore(self):
+        self.accepted = False
+
+
+class QCoreApplication(QObject):
+    _instance = None
+
+    def __init__(self, args=None):
+        QObject.__init__(self)
+        QCoreApplication._instance = self
+        self.quit_on_last_window_closed = True
+        self.widgets = []
+        self.exit_code = None
+
+    @classmethod
+    def instance(cls):
+        return cls._instance
+
+    def quitOnLastWindowClosed(self):
+        return self.quit_on_last_window_closed
+
+    def setQuitOnLastWindowClosed(self, quit):
+        self.quit_on_last_window_closed = quit
+
+    def topLevelWidgets(self):
+        return list(self.widgets)
+
+    @classmethod
+    def exit(cls, code=0):
+        cls._instance.exit_code = code
+
+
+class Widget(QObject):
+    """Top level widget, closed through the event filters like Qt does."""
+
+    def __init__(self):
+        QObject.__init__(self)
+        self.visible = False
+        self.deleted = False
+        QCoreApplication.instance().widgets.append(self)
+
+    def _check_deleted(self):
+        if self.deleted:
+            raise RuntimeError("Internal C++ object already deleted.")
+
+    def isVisible(self):
+        self._check_deleted()
+        return self.visible
+
+    def show(self):
+        self._check_deleted()
+        self.visible = True
+
+    def hide(self):
+        self._check_deleted()
+        self.visible = False
+
+    def close(self):
+        self._check_deleted()
+        event = QEvent(QEvent.Close)
+        for event_filter in list(self._event_filters):
+            if event_filter.eventFilter(self, event):
+                return False
+        if not event.accepted:
+            return False
+        self.visible = False
+        return True
+
+
+QtCore = types.ModuleType("QtCore")
+for _cls in (Signal, QObject, QTimer, QEvent, QCoreApplication):
+    setattr(QtCore, _cls.__name__, _cls)
+
+
+def install():
+    """Use the stub as the Toolkit QtCore, with a running application."""
+    import tank.platform.qt
+
+    tank.platform.qt.QtCore = QtCore
+    if QCoreApplication.instance() is None:
+        QCoreApplication()
+    return QCoreApplication.instance()
+
+
+def import_module(name):
+    """Import a Qt dependent module of the tk_shell package with the stub.
+
+    :param str name: Name of the module in the package, e.g. ``"task"``.
+    """
+    install()
+    return tk_shell.import_submodule(name)
@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+"""Unit test to check the batch file parsing and running logic.
+
+Test in Python 3.7
+"""
+
+from __future__ import absolute_import, division, print_function
+
+import json
+from unittest.mock import MagicMock
+
+import pytest
+
+from ..imports import tk_shell
+
+batch = tk_shell.import_submodule("batch")
+
+
+def test_read_script(tmp_path):
+    """Blank lines and comments are ignored, arguments are shell split."""
+    path = tmp_path / "commands.txt"
+    path.write_text(
+        "# create the folders first\n"
+        "setup_folders\n"
+        "\n"
+        'publish_in_place "/a path/file.exr" --quiet\n'
+    )
+
+    assert batch.read_batch_file(str(path)) == [
+        batch.BatchEntry(2, "setup_folders", [], None),
+        batch.BatchEntry(4, "publish_in_place", ["/a path/file.exr", "--quiet"], None),
+    ]
+
+
+def test_read_json_lines(tmp_path):
+    """Context entities are kept and arguments converted to strings."""
+    path = tmp_path / "commands.jsonl"
+    path.write_text(
+        json.dumps({"command": "setup_folders", "context": {"type": "Shot", "id": 1}})
+        + "\n"
+        + json.dumps({"command": "publish", "args": ["file.exr", 2]})
+        + "\n"
+    )
+
+    assert batch.read_batch_file(str(path)) == [
+        batch.BatchEntry(1, "setup_folders", [], {"type": "Shot", "id": 1}),
+        batch.BatchEntry(2, "publish", ["file.exr", "2"], None),
+    ]
+
+
+@pytest.mark.parametrize(
+    "line", ["not json", "[1]", '"x"', '{"args": []}', '{"command": "a", "args": "b"}']
+)
+def test_read_invalid_json_lines(tmp_path, line):
+    """Invalid lines are reported with their line number."""
+    path = tmp_path / "commands.jsonl"
+    path.write_text(line + "\n")
+
+    with pytest.raises(Exception, match="line 1"):
+        batch.read_batch_file(str(path))
+
+
+@pytest.mark.parametrize("stop_on_error,expected_runs", [(True, 2), (False, 3)])
+def test_runner_stop_on_error(stop_on_error, expected_runs):
+    """Failures are recorded and optionally stop the batch."""
+    engine = MagicMock()
+    engine.resolve_command_key.side_effect = lambda name: name
+    engine.run_command.side_effect = [None, RuntimeError("boom"), None]
+    entries = [batch.BatchEntry(i, "cmd%d" % i, [], None) for i in range(3)]
+
+    results = batch.BatchRunner(engine, stop_on_error).run(entries)
+
+    assert engine.run_command.call_count == expected_runs
+    assert [result.success for result in results] == [True, False, True][:expected_runs]
+    assert results[1].error == "RuntimeError: boom"
+
+
+@pytest.mark.parametrize(
+    "code,error", [(None, None), (0, None), (2, "Exited with status 2")]
+)
+def test_runner_exit(code, error):
+    """Commands exiting with a non-zero status fail, the batch goes on."""
+    engine = MagicMock()
+    engine.run_command.side_effect = [SystemExit(code), None]
+    entries = [batch.BatchEntry(i, "cmd%d" % i, [], None) for i in range(2)]
+
+    results = batch.BatchRunner(engine, stop_on_error=False).run(entries)
+
+    assert results[0].success == (error is None)
+    assert results[0].error == error
+    assert results[1].success
+
+
+def test_runner_restores_context(monkeypatch):
+    """The engine is switched back to its original context at the end."""
+    engine = MagicMock()
+    engine.context = "Project"
+
+    def change_entity_context(entity):
+        engine.context = "Shot %d" % entity["id"]
+
+    engine.change_entity_context.side_effect = change_entity_context
+    change_context = MagicMock()
+    monkeypatch.setattr(batch.tank.platform, "change_context", change_context)
+
+    batch.BatchRunner(engine).run(
+        [batch.BatchEntry(1, "cmd", [], {"type": "Shot", "id": 1})]
+    )
+
+    change_context.assert_called_once_with("Project")
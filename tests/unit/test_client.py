@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+"""Unit test to check the daemon client refuses sockets other users can reach.
+
+Test in Python 3.7
+"""
+
+from __future__ import absolute_import, division, print_function
+
+import os
+import socket
+
+import pytest
+
+from ..imports import tk_shell
+
+client = tk_shell.import_submodule("client")
+
+
+def test_private_socket_folder(tmp_path):
+    folder = tmp_path / "tk-shell"
+    folder.mkdir(0o700)
+    client.check_socket_folder(str(folder / "daemon.sock"))
+
+
+def test_shared_socket_folder(tmp_path):
+    """Folders other users can write to, or list, are refused."""
+    folder = tmp_path / "tk-shell"
+    folder.mkdir()
+    os.chmod(str(folder), 0o755)
+    with pytest.raises(socket.error, match="0700"):
+        client.check_socket_folder(str(folder / "daemon.sock"))
+    with pytest.raises(socket.error):
+        client.run_remote_command(str(folder / "daemon.sock"), "cmd", [])
+
+
+def test_linked_socket_folder(tmp_path):
+    """Symbolic links, which anybody could have created, are refused."""
+    folder = tmp_path / "tk-shell"
+    folder.mkdir(0o700)
+    link = tmp_path / "link"
+    link.symlink_to(folder)
+    with pytest.raises(socket.error):
+        client.check_socket_folder(str(link / "daemon.sock"))
+
+
+def test_missing_socket_folder(tmp_path):
+    with pytest.raises(socket.error, match="Can't check"):
+        client.check_socket_folder(str(tmp_path / "missing" / "daemon.sock"))
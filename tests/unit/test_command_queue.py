@@ -0,0 +1,141 @@
+# -*- coding: utf-8 -*-
+"""Unit test to check the queued command dispatch with the stub QtCore.
+
+Test in Python 3.7
+"""
+
+from __future__ import absolute_import, division, print_function
+
+from unittest.mock import MagicMock
+
+import pytest
+
+from .. import qt_stub
+
+command_queue = qt_stub.import_module("command_queue")
+
+
+@pytest.fixture
+def queue():
+    application = qt_stub.install()
+    application.widgets = []
+    yield command_queue.CommandQueue(MagicMock(), max_ui_commands=1)
+    qt_stub.process_events()
+
+
+def test_priority_order(queue):
+    """Higher priorities run first, then in the order they were queued."""
+    ran = []
+    handles = [
+        queue.submit(name, ran.append, [name], priority)
+        for name, priority in [("first", 0), ("second", 0), ("urgent", 5)]
+    ]
+    assert ran == []
+
+    qt_stub.process_events()
+
+    assert ran == ["urgent", "first", "second"]
+    assert [handle.state for handle in handles] == ["done"] * 3
+
+
+def test_not_reentrant(queue):
+    """Commands queued by a running command only start once it returned."""
+    ran = []
+
+    def outer():
+        ran.append("outer start")
+        handle = queue.submit("inner", ran.append, ["inner"])
+        # the events processed by the command don't start the queued one
+        qt_stub.process_events()
+        ran.append("outer end")
+        return handle
+
+    outer_handle = queue.submit("outer", outer, [])
+    qt_stub.process_events()
+
+    assert ran == ["outer start", "outer end", "inner"]
+    assert outer_handle.result().result() is None
+
+
+def test_result_and_errors(queue):
+    """Results and errors are kept by the handles."""
+    handle = queue.submit("answer", lambda: 42, [])
+    failing = queue.submit("fail", lambda: 1 / 0, [])
+    with pytest.raises(command_queue.tank.TankError, match="pending"):
+        handle.result()
+
+    qt_stub.process_events()
+
+    assert handle.result() == 42
+    assert isinstance(failing.exception(), ZeroDivisionError)
+    with pytest.raises(ZeroDivisionError):
+        failing.result()
+
+
+def test_cancel_pending(queue):
+    """Pending commands are never run once cancelled."""
+    callback = MagicMock()
+    handle = queue.submit("cancelled", callback, [])
+    done = []
+    handle.add_done_callback(done.append)
+
+    assert handle.cancel()
+    qt_stub.process_events()
+
+    callback.assert_not_called()
+    assert handle.cancelled() and handle.done()
+    assert done == [handle]
+    with pytest.raises(command_queue.tank.TankError, match="cancelled"):
+        handle.result()
+
+
+def test_cancel_running(queue):
+    """Running and finished commands can't be cancelled."""
+    cancelled = []
+
+    def command():
+        cancelled.append(handle.cancel())
+
+    handle = queue.submit("running", command, [])
+    qt_stub.process_events()
+
+    assert cancelled == [False]
+    assert not handle.cancel()
+    assert handle.state == handle.DONE
+
+
+def test_ui_limit(queue):
+    """UI commands wait for the windows of the others to be closed."""
+    windows = []
+
+    def show():
+        windows.append(qt_stub.Widget())
+        windows[-1].show()
+
+    first = queue.submit("show", show, [], requires_ui=True)
+    second = queue.submit("show", show, [], requires_ui=True)
+    after = queue.submit("after", lambda: None, [])
+    qt_stub.process_events()
+
+    assert first.done()
+    assert not second.done() and not after.done(), "The queue order is kept"
+
+    windows[0].close()
+    queue._windows_timer.timeout.emit()
+    qt_stub.process_events()
+
+    assert second.done() and after.done()
+
+
+def test_ui_commands_learnt(queue):
+    """Commands which opened windows count as UI commands from then on."""
+    window = qt_stub.Widget()
+    queue.submit("show", window.show, [])
+    qt_stub.process_events()
+
+    handle = queue.submit("show", window.show, [])
+    qt_stub.process_events()
+    assert not handle.done()
+
+    queue.clear()
+    assert handle.cancelled()
@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+"""Unit test to check the command names prefix tree and completion cache.
+
+Test in Python 3.7
+"""
+
+from __future__ import absolute_import, division, print_function
+
+import json
+import os
+from unittest.mock import MagicMock
+
+import pytest
+
+from ..imports import engine, tk_shell
+
+completion = tk_shell.import_submodule("completion")
+
+NAMES = ["katana", "katana3", "kill", "mari", "setup_folders"]
+
+
+@pytest.mark.parametrize(
+    "prefix,expected",
+    [
+        pytest.param("", NAMES, id="everything"),
+        pytest.param("k", ["katana", "katana3", "kill"], id="shared_prefix"),
+        pytest.param("katana", ["katana", "katana3"], id="full_name"),
+        pytest.param("nuke", [], id="no_match"),
+    ],
+)
+def test_complete(prefix, expected):
+    """Names are found from any prefix, sorted."""
+    assert expected == completion.complete(completion.build_trie(NAMES), prefix)
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    """Write the cache files in a temporary folder, return a configuration."""
+    monkeypatch.setenv(completion.CACHE_ENV_VAR, str(tmp_path / "cache"))
+    config_path = tmp_path / "pipeline" / "config"
+    (config_path / "env").mkdir(parents=True)
+    (config_path / "env" / "project.yml").write_text("engines: {}\n")
+    return str(tmp_path / "pipeline"), str(config_path)
+
+
+def test_update_cache(cache):
+    """The cache is only written when the names or working folder changed."""
+    pipeline_config_path, config_path = cache
+    args = (pipeline_config_path, config_path, "Project demo", "/projects/demo")
+
+    assert completion.update_cache(*args, names=NAMES)
+    assert not completion.update_cache(*args, names=NAMES)
+    assert completion.update_cache(*args, names=NAMES + ["nuke"])
+    assert completion.update_cache(
+        pipeline_config_path, config_path, "Project demo", "/projects/demo/seq", NAMES
+    )
+
+
+def test_find_names(cache):
+    """The context recorded from the closest parent folder is used."""
+    pipeline_config_path, config_path = cache
+    completion.update_cache(
+        pipeline_config_path, config_path, "Project demo", "/projects/demo", NAMES
+    )
+    completion.update_cache(
+        pipeline_config_path, config_path, "Shot 010", "/projects/demo/010", ["nuke"]
+    )
+
+    assert ["katana", "katana3"] == completion.find_names("kat", "/projects/demo/a/b")
+    assert ["nuke"] == completion.find_names("", "/projects/demo/010/comp")
+    assert NAMES == completion.find_names("", "/projects/demo", pipeline_config_path)
+    assert [] == completion.find_names("", "/projects/other")
+
+
+def test_stale_names_ignored(cache):
+    """Names recorded before a configuration change are not used."""
+    pipeline_config_path, config_path = cache
+    completion.update_cache(
+        pipeline_config_path, config_path, "Project demo", "/projects/demo", NAMES
+    )
+    with open(os.path.join(config_path, "env", "project.yml"), "a") as env_file:
+        env_file.write("frameworks: {}\n")
+
+    assert [] == completion.find_names("", "/projects/demo")
+
+
+def test_contexts_evicted(cache, monkeypatch):
+    """Only the most recently updated contexts are kept."""
+    pipeline_config_path, config_path = cache
+    monkeypatch.setattr(completion, "MAX_CONTEXTS", 3)
+    for index in range(5):
+        completion.update_cache(
+            pipeline_config_path,
+            config_path,
+            "Shot %d" % index,
+            "/projects/demo/%d" % index,
+            ["shot_%d" % index],
+        )
+
+    with open(completion.get_cache_path(pipeline_config_path)) as cache_file:
+        contexts = json.load(cache_file)["contexts"]
+    assert sorted(contexts) == ["Shot 2", "Shot 3", "Shot 4"]
+    assert [] == completion.find_names("", "/projects/demo/0")
+
+
+def test_forked_engine():
+    """Forked processes don't update the cache of their parent."""
+    stub = MagicMock()
+    stub._forked = True
+
+    engine.ShellEngine._update_completion_cache(stub)
+
+    stub.import_module.assert_not_called()
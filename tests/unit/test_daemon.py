@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+"""Unit test to check the daemon and client round trip with a stub engine.
+
+Test in Python 3.7
+"""
+
+from __future__ import absolute_import, division, print_function
+
+import io
+import logging
+import os
+import subprocess
+import sys
+import threading
+import time
+from unittest.mock import MagicMock
+
+import pytest
+
+from ..imports import REPO_ROOT, tk_shell
+
+daemon = tk_shell.import_submodule("daemon")
+
+CLIENT_PATH = str(REPO_ROOT / "python" / "tk_shell" / "client.py")
+
+# Seconds without requests after which the daemon of the tests exits.
+IDLE_TIMEOUT = 2
+
+
+class StubEngine(object):
+    """Stands in for a started engine, with a command per outcome."""
+
+    logger = logging.getLogger("test_daemon")
+
+    def __init__(self, config_path):
+        self.sgtk = MagicMock()
+        self.sgtk.pipeline_configuration.get_config_location.return_value = config_path
+
+    def resolve_command_key(self, name):
+        return name
+
+    def run_command(self, cmd_key, args):
+        if cmd_key == "echo":
+            # written to the file descriptors, like subprocesses would
+            os.write(1, (" ".join(args) + "\n").encode("utf-8"))
+            os.write(2, b"to stderr\n")
+        elif cmd_key == "environment":
+            print(os.environ.get("TK_SHELL_TEST"), os.getcwd())
+        elif cmd_key == "fail":
+            raise daemon.TankError("Invalid shot")
+        elif cmd_key == "crash":
+            raise RuntimeError("Unexpected")
+        elif cmd_key == "exit":
+            sys.exit(3)
+
+
+@pytest.fixture
+def socket_path(tmp_path):
+    """Serve the stub engine commands from a thread until the daemon is idle."""
+    folder = tmp_path / "sockets"
+    path = str(folder / "daemon.sock")
+    engine_daemon = daemon.EngineDaemon(StubEngine(str(tmp_path)), path, IDLE_TIMEOUT)
+    thread = threading.Thread(target=engine_daemon.serve_forever)
+    thread.start()
+    for _ in range(100):
+        if os.path.exists(path):
+            break
+        time.sleep(0.05)
+    yield path
+    thread.join()
+    assert not os.path.exists(path), "The socket must be removed on exit"
+
+
+def run_client(socket_path, *args, **kwargs):
+    env = dict(os.environ, TK_SHELL_TEST="from the client")
+    return subprocess.run(
+        [sys.executable, CLIENT_PATH, "--socket", socket_path] + list(args),
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        universal_newlines=True,
+        env=env,
+        **kwargs
+    )
+
+
+def test_round_trip(socket_path, tmp_path, monkeypatch):
+    """Output and exit status are forwarded, the daemon state is restored."""
+    # The daemon forwards what is written to the file descriptors, rather than
+    # to the pytest capture streams.
+    monkeypatch.setattr(sys, "stdout", io.open(1, "w", closefd=False))
+    monkeypatch.setattr(sys, "stderr", io.open(2, "w", closefd=False))
+    environ = dict(os.environ)
+    cwd = os.getcwd()
+
+    result = run_client(socket_path, "echo", "a", "b")
+    assert result.returncode == 0
+    assert result.stdout == "a b\n"
+    assert result.stderr == "to stderr\n"
+
+    result = run_client(socket_path, "environment", cwd=str(tmp_path))
+    assert result.returncode == 0
+    assert result.stdout == "from the client %s\n" % tmp_path
+
+    result = run_client(socket_path, "fail")
+    assert result.returncode == 1
+    assert result.stderr == "Invalid shot\n"
+
+    result = run_client(socket_path, "crash")
+    assert result.returncode == 1
+    assert "RuntimeError: Unexpected" in result.stderr
+
+    assert run_client(socket_path, "exit").returncode == 3
+
+    assert dict(os.environ) == environ
+    assert os.getcwd() == cwd
@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+"""Unit test to check the cache of the dialogs with the stub QtCore.
+
+Test in Python 3.7
+"""
+
+from __future__ import absolute_import, division, print_function
+
+from unittest.mock import MagicMock
+
+import pytest
+
+from .. import qt_stub
+from ..imports import engine
+
+dialog_cache = qt_stub.import_module("dialog_cache")
+
+
+class Dialog(qt_stub.Widget):
+    """Top level widget counting how many times it was really closed."""
+
+    def __init__(self):
+        qt_stub.Widget.__init__(self)
+        self.closed = 0
+
+    def close(self):
+        closed = qt_stub.Widget.close(self)
+        self.closed += closed
+        return closed
+
+
+@pytest.fixture
+def application():
+    application = qt_stub.install()
+    application.widgets = []
+    application.setQuitOnLastWindowClosed(False)
+    yield application
+    application.setQuitOnLastWindowClosed(True)
+
+
+def cache_dialog(cache, name):
+    dialog = Dialog()
+    cache.put(name, dialog, qt_stub.Widget())
+    return dialog
+
+
+def test_hide_on_close(application):
+    """Closing a cached dialog hides it, unless it would quit the application."""
+    cache = dialog_cache.DialogCache(2)
+    dialog = cache_dialog(cache, "app")
+    dialog.show()
+
+    dialog.close()
+    assert not dialog.isVisible()
+    assert dialog.closed == 0
+    assert cache.get("app")[0] is dialog
+
+    application.setQuitOnLastWindowClosed(True)
+    dialog.show()
+    dialog.close()
+    assert dialog.closed == 1
+
+
+def test_eviction(application):
+    """The least recently used dialogs are evicted, closing the hidden ones."""
+    cache = dialog_cache.DialogCache(2)
+    first = cache_dialog(cache, "first")
+    second = cache_dialog(cache, "second")
+    second.show()
+    cache.get("first")
+
+    third = cache_dialog(cache, "third")
+    assert cache.get("second") is None
+    assert second.closed == 0, "Visible dialogs are closed by the user"
+    assert not second._event_filters
+
+    cache_dialog(cache, "fourth")
+    assert cache.get("first") is None
+    assert first.closed == 1
+    assert cache.get("third")[0] is third
+
+
+def test_deleted(application):
+    """Dialogs deleted by Qt are not returned."""
+    cache = dialog_cache.DialogCache(2)
+    cache_dialog(cache, "app").deleted = True
+
+    assert cache.get("app") is None
+    cache.clear()
+
+
+def test_reuse(application):
+    """A second show_dialog shows the same dialog, refreshing its widget."""
+    stub = MagicMock()
+    stub._dialog_cache = dialog_cache.DialogCache(2)
+    stub._create_dialog_with_widget.side_effect = lambda *args, **kwargs: (
+        Dialog(),
+        MagicMock(),
+    )
+    bundle = MagicMock()
+
+    dialog, widget = engine.ShellEngine._get_cached_dialog(
+        stub, "App", bundle, "Widget", ("shot",), {}
+    )
+    dialog.show()
+    dialog.close()
+    assert (dialog, widget) == engine.ShellEngine._get_cached_dialog(
+        stub, "App", bundle, "Widget", ("asset",), {"mode": 1}
+    )
+
+    stub._create_dialog_with_widget.assert_called_once_with(
+        "App", bundle, "Widget", "shot"
+    )
+    widget.show.assert_called_once_with()
+    widget.on_dialog_reshown.assert_called_once_with("asset", mode=1)
+    other, _ = engine.ShellEngine._get_cached_dialog(
+        stub, "Other", bundle, "Widget", (), {}
+    )
+    assert other is not dialog
@@ -0,0 +1,147 @@
+# -*- coding: utf-8 -*-
+"""Unit test to check the pre-validated command callback specs.
+
+Test in Python 3.7
+"""
+
+from __future__ import absolute_import, division, print_function
+
+import asyncio
+from unittest.mock import MagicMock
+
+import pytest
+
+from ..imports import engine, tk_shell
+
+
+class App(object):
+    def method(self, first, second):
+        pass
+
+
+def function(first):
+    pass
+
+
+def var_args(first, *others):
+    pass
+
+
+SPEC_CASES = [
+    pytest.param(function, 1, False, "Expected command arguments (first)", id="func"),
+    pytest.param(
+        App().method, 2, False, "Expected command arguments (first, second)", id="bound"
+    ),
+    pytest.param(
+        var_args, 1, True, "Expected command arguments (first, *others)", id="varargs"
+    ),
+]
+
+
+@pytest.mark.parametrize("callback,arg_count,var_args,message", SPEC_CASES)
+def test_command_spec(callback, arg_count, var_args, message):
+    """Check the arguments and error message computed for a callback."""
+    spec = engine.CommandSpec(callback)
+
+    assert spec.callback is callback
+    assert spec.arg_count == arg_count
+    assert spec.var_args == var_args
+    assert spec.error_message.endswith(message)
+
+
+@pytest.mark.parametrize(
+    "callback,count,expected",
+    [
+        (function, 1, True),
+        (function, 0, False),
+        (function, 2, False),
+        (var_args, 0, False),
+        (var_args, 1, True),
+        (var_args, 5, True),
+    ],
+)
+def test_command_spec_accepts(callback, count, expected):
+    """Check the exact and minimum number of arguments are enforced."""
+    assert engine.CommandSpec(callback).accepts(count) is expected
+
+
+def test_command_spec_rebind():
+    """Specs are reused for new callbacks running the same code."""
+    spec = engine.CommandSpec(App().method)
+
+    assert spec.rebind(spec.callback) is spec
+
+    other_app_method = App().method
+    rebound = spec.rebind(other_app_method)
+    assert rebound is not spec
+    assert rebound.callback is other_app_method
+    assert rebound.arg_count == 2
+
+    rebuilt = spec.rebind(var_args)
+    assert rebuilt.callback is var_args
+    assert rebuilt.var_args
+
+
+async def coroutine(first):
+    await asyncio.sleep(0)
+    return first
+
+
+def test_command_spec_coroutine():
+    """Coroutine callbacks are detected."""
+    assert engine.CommandSpec(coroutine).is_coroutine
+    assert not engine.CommandSpec(function).is_coroutine
+
+
+def generator(first):
+    yield first
+
+
+def test_command_spec_generator():
+    """Generator callbacks are detected."""
+    assert engine.CommandSpec(generator).is_generator
+    assert not engine.CommandSpec(function).is_generator
+    assert not engine.CommandSpec(coroutine).is_generator
+
+
+def test_run_coroutine():
+    """Coroutine commands are run to completion on the engine loop."""
+    instance = MagicMock()
+    instance._has_qt = False
+    loop = asyncio.new_event_loop()
+    instance.get_event_loop.return_value = loop
+
+    async def command(value):
+        return await loop.run_in_executor(None, str, value)
+
+    try:
+        assert engine.ShellEngine._run_coroutine(instance, coroutine, 1) == 1
+        assert engine.ShellEngine._run_coroutine(instance, command, 2) == "2"
+    finally:
+        loop.close()
+
+
+def test_command_table_cache():
+    """Least recently used tables are evicted."""
+    cache = engine.CommandTableCache(2)
+    assert cache.get("shot") is None
+    cache.put("shot", "shot table")
+    cache.put("asset", "asset table")
+
+    assert cache.get("shot") == "shot table"
+    cache.put("project", "project table")
+    assert cache.get("asset") is None
+    assert cache.get("shot") == "shot table"
+    assert cache.get("project") == "project table"
+
+
+def test_context_key():
+    """Contexts are keyed without importing the daemon module."""
+    context = MagicMock()
+    context.to_dict.return_value = {"Step": None, "Project": {"id": 1}}
+    other = MagicMock()
+    other.to_dict.return_value = {"Project": {"id": 1}, "Step": None}
+
+    assert tk_shell.get_context_key(context) == tk_shell.get_context_key(other)
+    daemon = tk_shell.import_submodule("daemon")
+    assert daemon.get_context_key is tk_shell.get_context_key
@@ -0,0 +1,154 @@
+# -*- coding: utf-8 -*-
+"""Unit test to check the parallel fan-out with a stub engine.
+
+Test in Python 3.7
+"""
+
+from __future__ import absolute_import, division, print_function
+
+import json
+import logging
+import os
+import queue
+import threading
+from unittest.mock import MagicMock
+
+import pytest
+
+from ..imports import engine, tk_shell
+
+fanout = tk_shell.import_submodule("fanout")
+metrics = tk_shell.import_submodule("metrics")
+
+
+class StubEngine(object):
+    """Stands in for a started engine, failing for odd entity ids."""
+
+    logger = logging.getLogger("test_fanout")
+
+    def __init__(self):
+        self.entity = None
+        self.started_in = os.getpid()
+
+    def change_entity_context(self, entity):
+        self.entity = entity
+
+    def run_command(self, cmd_key, args):
+        assert os.getpid() != self.started_in, "Must run in a worker process"
+        if self.entity["id"] % 2:
+            raise RuntimeError("%s failed for %s" % (cmd_key, self.entity["id"]))
+
+
+class QueueLoggingEngine(StubEngine):
+    """Logs through a bounded queue, collapsing repeated records, and counts the
+    runs in a spool folder, as the engine does with TK_SHELL_LOG_QUEUE_SIZE and
+    metrics_folder set."""
+
+    _reset_after_fork = engine.ShellEngine._reset_after_fork
+
+    def __init__(self, log_path, metrics_folder):
+        StubEngine.__init__(self)
+        self._log = logging.getLogger("test_fanout.queue")
+        self._log.propagate = False
+        self._stream_handler = logging.StreamHandler(open(log_path, "a"))
+        log_queue = queue.Queue(1)
+        self._queue_handler = engine.BoundedQueueHandler(log_queue, "block")
+        self._queue_listener = engine.BoundedQueueListener(
+            log_queue, self._stream_handler
+        )
+        self._queue_listener.start()
+        self._log.addHandler(self._queue_handler)
+        self._repeat_filter = engine.RepeatedLogFilter(self._log, 10.0, 5)
+        self._log.addFilter(self._repeat_filter)
+        self._metrics_spooler = metrics.MetricsSpooler(metrics_folder, 3600)
+        self._metrics_spooler.start()
+
+    def run_command(self, cmd_key, args):
+        # more records than the queue can hold
+        for index in range(5):
+            self._log.warning("Shot %d record %d", self.entity["id"], index)
+        self._metrics_spooler.metrics.record(cmd_key, 0.0, True)
+
+    def stop(self):
+        self._log.removeHandler(self._queue_handler)
+        self._log.removeFilter(self._repeat_filter)
+        self._queue_listener.stop()
+        self._metrics_spooler.stop()
+        self._stream_handler.close()
+
+
+def test_read_entities(tmp_path):
+    """Both plain and JSON entities are read, comments are ignored."""
+    path = tmp_path / "entities.txt"
+    path.write_text('# shots\nShot 1\n\n{"type": "Asset", "id": "2"}\n')
+
+    assert fanout.read_entities(str(path)) == [
+        {"type": "Shot", "id": 1},
+        {"type": "Asset", "id": 2},
+    ]
+
+
+@pytest.mark.parametrize("processes", [1, 3, None])
+def test_fan_out(processes):
+    """Results are aggregated in order, whatever the number of workers."""
+    entities = [{"type": "Shot", "id": index} for index in range(10)]
+
+    results = fanout.fan_out(StubEngine(), "render", [], entities, processes)
+
+    assert [result.entity for result in results] == entities
+    assert [result.success for result in results] == [True, False] * 5
+    assert "render failed for 1" in results[1].error
+    assert fanout.exit_status(results) == 1
+    if processes:
+        assert len(set(result.pid for result in results)) <= processes
+
+
+def test_fan_out_success():
+    """The exit status is 0 when the command succeeded everywhere."""
+    entities = [{"type": "Shot", "id": index} for index in range(0, 10, 2)]
+
+    results = fanout.fan_out(StubEngine(), "render", [], entities, 2)
+
+    assert fanout.exit_status(results) == 0
+
+
+@pytest.mark.parametrize("option", ["--processes=abc", "--processes", "--processes=0"])
+def test_invalid_processes(option):
+    """An invalid number of processes is reported with the usage."""
+    with pytest.raises(engine.TankError, match="Usage: shell_fanout"):
+        engine.ShellEngine._run_fanout(MagicMock(), "render", "shots.txt", option)
+
+
+def test_fan_out_log_queue(tmp_path):
+    """Workers log and count their runs without the threads of the parent."""
+    log_path = str(tmp_path / "log.txt")
+    metrics_folder = str(tmp_path / "metrics")
+    queue_engine = QueueLoggingEngine(log_path, metrics_folder)
+    # counted by the parent, which writes it itself
+    queue_engine._metrics_spooler.metrics.record("render", 0.0, True)
+    entities = [{"type": "Shot", "id": index} for index in range(4)]
+    results = []
+
+    def run():
+        results.extend(fanout.fan_out(queue_engine, "render", [], entities, 2))
+
+    # held by another thread of the parent when forking
+    queue_engine._repeat_filter._lock.acquire()
+    try:
+        thread = threading.Thread(target=run)
+        thread.daemon = True
+        thread.start()
+        thread.join(60)
+        assert not thread.is_alive(), "The workers are blocked logging"
+        queue_engine._repeat_filter._lock.release()
+
+        assert fanout.exit_status(results) == 0
+        with open(os.path.join(metrics_folder, metrics.SPOOL_NAME)) as spool:
+            assert sum(json.loads(line)["calls"] for line in spool) == 4
+    finally:
+        queue_engine.stop()
+
+    with open(log_path) as log_file:
+        assert len(log_file.readlines()) == 20
+    with open(os.path.join(metrics_folder, metrics.SPOOL_NAME)) as spool:
+        assert sum(json.loads(line)["calls"] for line in spool) == 5
@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+"""Unit test to check the timing of the imports by bundle.
+
+Test in Python 3.7
+"""
+
+from __future__ import absolute_import, division, print_function
+
+import os
+import sys
+from unittest.mock import MagicMock
+
+from ..imports import engine
+
+
+def test_outermost_imports(tmpdir):
+    """Only the imports done by the importer itself are attributed to it."""
+    tmpdir.join("tk_import_outer.py").write("import tk_import_inner\n")
+    tmpdir.join("tk_import_inner.py").write("import json\n")
+    sys.path.insert(0, str(tmpdir))
+    timer = engine.ImportTimer()
+    timer.start()
+    try:
+        import tk_import_outer  # noqa: F401
+    finally:
+        timer.stop()
+        sys.path.remove(str(tmpdir))
+        sys.modules.pop("tk_import_outer", None)
+        sys.modules.pop("tk_import_inner", None)
+
+    assert "tk_import_outer" in timer.imports[__file__]
+    assert not any(
+        path.endswith("tk_import_outer.py") for path in timer.imports
+    ), "nested imports are included in the outermost one"
+
+
+def test_stop_restores_import():
+    original_import = engine.builtins.__import__
+    timer = engine.ImportTimer()
+    timer.start()
+    assert engine.builtins.__import__ != original_import
+    timer.stop()
+    assert engine.builtins.__import__ == original_import
+
+
+def test_bundle_times(tmpdir):
+    """Files are attributed to the innermost bundle folder."""
+    app = str(tmpdir.join("app"))
+    framework = str(tmpdir.join("app", "frameworks", "framework"))
+    timer = engine.ImportTimer()
+    timer.imports[os.path.join(app, "app.py")]["json"] = 1.0
+    timer.imports[os.path.join(framework, "python", "a.py")]["json"] = 2.0
+    timer.imports[os.path.join(framework, "python", "b.py")]["json"] = 0.5
+    timer.imports["/elsewhere.py"]["re"] = 3.0
+
+    times = timer.get_bundle_times(
+        {"tk-app": app, "tk-framework": framework, "missing": None}
+    )
+
+    assert times["tk-app"] == {"json": 1.0}
+    assert times["tk-framework"] == {"json": 2.5}
+    assert times["other"] == {"re": 3.0}
+
+
+class AppInitEngine(object):
+    """Stands in for the engine, with the base Engine private app attribute."""
+
+    _Engine__currently_initializing_app = (
+        engine.ShellEngine._Engine__currently_initializing_app
+    )
+
+    def __init__(self):
+        self._tracer = None
+        self._import_timer = MagicMock()
+        self._initializing_app = None
+        self._app_init_start = None
+        self._app_init_reported = False
+        self._app_init_times = {}
+
+
+def test_app_init_times():
+    """The apps initialization is timed when the base Engine reports it."""
+    stub = AppInitEngine()
+    app = MagicMock(instance_name="tk-app")
+
+    stub._Engine__currently_initializing_app = app
+    assert stub._Engine__currently_initializing_app is app
+    stub._Engine__currently_initializing_app = None
+
+    assert list(stub._app_init_times) == ["tk-app"]
+    assert stub._app_init_reported
+
+
+def test_app_init_not_reported(tmpdir):
+    """Only the import times are reported if the base Engine doesn't report
+    the apps initialization."""
+    stub = MagicMock()
+    stub.apps = {"tk-app": MagicMock()}
+    stub.frameworks = {}
+    stub._app_init_reported = False
+    stub._app_init_times = {}
+    stub._import_timer.get_bundle_times.return_value = {"tk-app": {"json": 1.0}}
+    stub._import_report_path = str(tmpdir.join("report.json"))
+
+    engine.ShellEngine._write_import_report(stub)
+
+    stub.logger.debug.assert_called_once_with(
+        "The apps initialization isn't reported by this Toolkit core."
+    )
+    assert tmpdir.join("report.json").check()
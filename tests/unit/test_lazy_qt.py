@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+"""Unit test to check the deferred import of the Qt bindings.
+
+Test in Python 3.7
+"""
+
+from __future__ import absolute_import, division, print_function
+
+import sys
+import types
+from unittest.mock import MagicMock
+
+import pytest
+
+from ..imports import engine
+
+
+class QtEngine(object):
+    """Stands in for the engine, counting the Qt bindings imports."""
+
+    def __init__(self, qt_base):
+        self._qt_base = None
+        self._real_qt_base = qt_base
+        self.resolved = 0
+
+    def _resolve_qt(self):
+        if self._qt_base is None:
+            self.resolved += 1
+            self._qt_base = self._real_qt_base
+        return self._qt_base
+
+
+def test_proxy_resolution():
+    """Proxies are falsy until the bindings are imported on first use."""
+    qt_core = MagicMock()
+    qt_engine = QtEngine({"qt_core": qt_core, "qt_gui": None})
+    proxy = engine.LazyQtProxy(qt_engine, "qt_core")
+
+    assert not proxy
+    assert qt_engine.resolved == 0, "Toolkit checks don't import Qt"
+
+    assert proxy.QObject is qt_core.QObject
+    assert proxy("arg") is qt_core.return_value
+    qt_core.assert_called_once_with("arg")
+    assert proxy
+    assert not engine.LazyQtProxy(qt_engine, "qt_gui"), "Missing bindings"
+    assert qt_engine.resolved == 1
+
+
+def test_proxy_missing():
+    """Objects missing from the Qt installation are reported."""
+    proxy = engine.LazyQtProxy(QtEngine({}), "QtWebEngineWidgets")
+
+    with pytest.raises(engine.TankError, match="QtWebEngineWidgets is not available"):
+        proxy.QWebEngineView
+
+
+@pytest.fixture
+def qt_engine():
+    qt_engine = MagicMock()
+    qt_engine.get_setting.side_effect = lambda name, default=None: name == "lazy_qt"
+    qt_engine._use_lazy_qt = lambda: engine.ShellEngine._use_lazy_qt(qt_engine)
+    return qt_engine
+
+
+def test_deferred_qt_base(qt_engine):
+    """With lazy_qt, proxies are defined without importing the bindings."""
+    qt_base = engine.ShellEngine._define_qt_base(qt_engine)
+
+    assert sorted(qt_base) == ["dialog_base", "qt_core", "qt_gui"]
+    assert all(isinstance(value, engine.LazyQtProxy) for value in qt_base.values())
+    assert qt_engine._lazy_qt is True
+    qt_engine._define_qt_bindings.assert_not_called()
+
+
+def test_eager_qt_base(qt_engine):
+    """Qt is defined right away if the invokers can't be created later."""
+    del qt_engine._Engine__create_invokers
+
+    qt_base = engine.ShellEngine._define_qt_base(qt_engine)
+
+    assert qt_base is qt_engine._define_qt_bindings.return_value
+    qt5_base = engine.ShellEngine._define_qt5_base(qt_engine)
+    assert qt5_base is qt_engine._detect_qt5_base.return_value
+
+
+def test_resolve_qt(qt_engine, monkeypatch):
+    """The Toolkit qt modules get the bindings once they are imported."""
+    from tank.platform import qt, qt5
+
+    for module, name in [(qt, "QtCore"), (qt, "QtGui"), (qt, "TankDialogBase")]:
+        monkeypatch.setattr(module, name, None)
+    monkeypatch.setattr(qt5, "QtWidgets", None, raising=False)
+    # the Qt modules of the authentication dialogs
+    qt_abstraction = types.ModuleType("tank.authentication.ui.qt_abstraction")
+    for name in ["authentication", "authentication.ui"]:
+        monkeypatch.setitem(sys.modules, "tank." + name, types.ModuleType(name))
+    sys.modules["tank.authentication.ui"].qt_abstraction = qt_abstraction
+    monkeypatch.setitem(sys.modules, qt_abstraction.__name__, qt_abstraction)
+    qt_engine._lazy_qt = True
+    qt_engine._qt_base = None
+    qt_engine._has_qt = True
+    qt_engine._define_qt_bindings.return_value = {
+        "qt_core": "QtCore",
+        "qt_gui": "QtGui",
+        "dialog_base": "TankDialogBase",
+    }
+    qt_engine._detect_qt5_base.return_value = {"QtWidgets": "QtWidgets"}
+    qt_engine._Engine__create_invokers.return_value = ("invoker", "async invoker")
+
+    qt_base = engine.ShellEngine._resolve_qt(qt_engine)
+
+    assert qt_base["QtWidgets"] == "QtWidgets"
+    assert (qt.QtCore, qt.QtGui, qt.TankDialogBase) == (
+        "QtCore",
+        "QtGui",
+        "TankDialogBase",
+    )
+    assert qt5.QtWidgets == "QtWidgets"
+    assert (qt_abstraction.QtCore, qt_abstraction.QtGui) == ("QtCore", "QtGui")
+    assert qt_engine._invoker == "invoker"
+    assert engine.ShellEngine._resolve_qt(qt_engine) is qt_base
+    qt_engine._define_qt_bindings.assert_called_once_with()
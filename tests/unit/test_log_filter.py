@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+"""Unit test to check the collapsing of identical log messages.
+
+Test in Python 3.7
+"""
+
+from __future__ import absolute_import, division, print_function
+
+import logging
+import time
+
+import pytest
+
+from ..imports import engine
+
+
+class ListHandler(logging.Handler):
+    def __init__(self):
+        logging.Handler.__init__(self)
+        self.messages = []
+
+    def emit(self, record):
+        self.messages.append(record.getMessage())
+
+
+@pytest.fixture
+def logger():
+    logger = logging.getLogger("test_log_filter")
+    logger.propagate = False
+    logger.setLevel(logging.INFO)
+    handler = ListHandler()
+    logger.addHandler(handler)
+    yield logger
+    logger.removeHandler(handler)
+    for log_filter in list(logger.filters):
+        logger.removeFilter(log_filter)
+
+
+def test_repeated_messages(logger):
+    """Identical messages over the limit are summarized once the window is over."""
+    log_filter = engine.RepeatedLogFilter(logger, 0.2, 2)
+    logger.addFilter(log_filter)
+    handler = logger.handlers[0]
+
+    for _ in range(5):
+        logger.warning("Could not read %s", "a.exr")
+    logger.warning("Could not read %s", "b.exr")
+    logger.warning("Settings: %s", {"unhashable": []})
+    assert handler.messages == [
+        "Could not read a.exr",
+        "Could not read a.exr",
+        "Could not read b.exr",
+        "Settings: {'unhashable': []}",
+    ]
+
+    del handler.messages[:]
+    time.sleep(0.2)
+    logger.warning("Could not read %s", "a.exr")
+    assert handler.messages == [
+        "Could not read a.exr (repeated 3 more times)",
+        "Could not read a.exr",
+    ]
+
+
+def test_flush(logger):
+    """Summaries are logged when flushing, only for messages filtered out."""
+    log_filter = engine.RepeatedLogFilter(logger, 10.0, 1)
+    logger.addFilter(log_filter)
+    handler = logger.handlers[0]
+
+    logger.info("Loading")
+    logger.info("Loading")
+    logger.info("Done")
+    logger.debug("Disabled")
+    log_filter.flush()
+    assert handler.messages == ["Loading", "Done", "Loading (repeated 1 more times)"]
+
+
+def test_reset_after_fork(logger):
+    """Forked processes don't wait for the lock or summarize the parent records."""
+    log_filter = engine.RepeatedLogFilter(logger, 10.0, 1)
+    logger.addFilter(log_filter)
+    handler = logger.handlers[0]
+    logger.info("Loading")
+    logger.info("Loading")
+    # held by another thread of the parent process when forking
+    log_filter._lock.acquire()
+
+    log_filter.reset_after_fork()
+    logger.info("Loading")
+    log_filter.flush()
+    assert handler.messages == ["Loading", "Loading"]
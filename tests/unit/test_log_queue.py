@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+"""Unit test to check the bounded log queue overflow policies and draining.
+
+Test in Python 3.7
+"""
+
+from __future__ import absolute_import, division, print_function
+
+import atexit
+import logging
+import queue
+import threading
+from unittest.mock import MagicMock
+
+import pytest
+
+from ..imports import engine
+
+
+class ListHandler(logging.Handler):
+    def __init__(self):
+        logging.Handler.__init__(self)
+        self.messages = []
+
+    def emit(self, record):
+        self.messages.append(record.getMessage())
+
+
+def make_record(message):
+    return logging.LogRecord(
+        "test_log_queue", logging.INFO, __file__, 0, message, (), None
+    )
+
+
+def fill(handler, count):
+    for index in range(count):
+        handler.handle(make_record("record %d" % index))
+
+
+@pytest.mark.parametrize(
+    "overflow,kept", [("drop_new", [0, 1]), ("drop_oldest", [2, 3])]
+)
+def test_drop(overflow, kept):
+    """Records over the queue size are dropped and counted."""
+    handler = engine.BoundedQueueHandler(queue.Queue(2), overflow)
+
+    fill(handler, 4)
+
+    assert handler.dropped == 2
+    assert [handler.queue.get_nowait().getMessage() for _ in range(2)] == [
+        "record %d" % index for index in kept
+    ]
+    assert handler.queue.empty()
+
+
+def test_block():
+    """Records wait for room in the queue, none are dropped."""
+    handler = engine.BoundedQueueHandler(queue.Queue(1), "block")
+    fill(handler, 1)
+    thread = threading.Thread(target=fill, args=(handler, 2))
+    thread.start()
+    thread.join(0.2)
+    assert thread.is_alive(), "Must wait while the queue is full"
+
+    messages = [handler.queue.get(timeout=10).getMessage() for _ in range(3)]
+    thread.join()
+
+    assert messages == ["record 0", "record 0", "record 1"]
+    assert handler.dropped == 0
+
+
+def test_cleanup_drains_queue(monkeypatch):
+    """Queued records are written when the logger is cleaned up."""
+    stub = MagicMock()
+    stub._repeat_filter = None
+    stub._log = logging.getLogger("test_log_queue")
+    stub._log.propagate = False
+    stub._stream_handler = ListHandler()
+    log_queue = queue.Queue(100)
+    stub._queue_handler = engine.BoundedQueueHandler(log_queue, "drop_new")
+    stub._queue_listener = engine.BoundedQueueListener(log_queue, stub._stream_handler)
+    stub._log.addHandler(stub._queue_handler)
+    handler = stub._stream_handler
+    listener = stub._queue_listener
+    # queued before the listener runs, more than the queue can hold
+    fill(stub._queue_handler, 101)
+    stub._queue_listener.start()
+    atexit.register(stub._queue_listener.stop)
+    unregister = MagicMock(wraps=atexit.unregister)
+    monkeypatch.setattr(engine.atexit, "unregister", unregister)
+
+    engine.ShellEngine._cleanup_logger(stub)
+
+    assert handler.messages[:100] == ["record %d" % index for index in range(100)]
+    assert handler.messages[100:] == [
+        "1 log records were dropped as the log queue was full."
+    ]
+    assert stub._log.handlers == []
+    assert stub._queue_handler is None and stub._stream_handler is None
+    # the engine is no longer referenced by the exit handlers
+    unregister.assert_called_once_with(listener.stop)
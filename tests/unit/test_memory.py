@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+"""Unit test to check the command memory accounting helpers.
+
+Test in Python 3.7
+"""
+
+from __future__ import absolute_import, division, print_function
+
+import json
+import sys
+
+import pytest
+
+from ..imports import tk_shell
+
+memory = tk_shell.import_submodule("memory")
+
+
+def allocate():
+    return bytearray(10 * 1024 * 1024)
+
+
+def test_run_measured():
+    """The allocations of the callback are recorded with its result."""
+    records = []
+
+    result = memory.run_measured(allocate, 5, records.append)
+
+    assert len(result) == 10 * 1024 * 1024
+    (record,) = records
+    assert record["allocations"][0]["location"].endswith(
+        "test_memory.py:%d" % (allocate.__code__.co_firstlineno + 1)
+    )
+    assert record["allocations"][0]["size_diff"] >= 10 * 1024 * 1024
+    if sys.platform.startswith("linux"):
+        assert record["rss_after"] - record["rss_before"] >= 5 * 1024 * 1024
+        assert record["peak_rss"] >= record["rss_after"]
+    assert "test_memory.py" in memory.format_record(record)
+
+
+def test_run_measured_error(tmp_path):
+    """The usage is reported when the callback fails and saved as JSON lines."""
+    records = []
+
+    def fail():
+        raise ValueError("Failed")
+
+    with pytest.raises(ValueError):
+        memory.run_measured(fail, 0, records.append)
+    assert records[0]["allocations"] == []
+
+    path = tmp_path / "memory" / "records.jsonl"
+    memory.append_record(str(path), records[0])
+    memory.append_record(str(path), records[0])
+    lines = path.read_text().splitlines()
+    assert len(lines) == 2
+    assert json.loads(lines[0])["rss_before"] == records[0]["rss_before"]
@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+"""Unit test to check the command metrics spool.
+
+Test in Python 3.7
+"""
+
+from __future__ import absolute_import, division, print_function
+
+import json
+
+from ..imports import tk_shell
+
+metrics = tk_shell.import_submodule("metrics")
+
+
+def test_record():
+    """Runs are counted in a histogram bucket, until the next batch."""
+    command_metrics = metrics.CommandMetrics()
+    command_metrics.record("publish", 0.001, True)
+    command_metrics.record("publish", 2, False)
+    command_metrics.record("publish", 10000, True)
+
+    (stats,) = command_metrics.pop().values()
+    assert stats["calls"] == 3
+    assert stats["failures"] == 1
+    assert stats["seconds"] == 10002.001
+    assert stats["buckets"][0] == 1
+    assert stats["buckets"][metrics.LATENCY_BUCKETS.index(2.5)] == 1
+    assert stats["buckets"][-1] == 1
+    assert command_metrics.pop() == {}
+
+
+def test_write_batch(tmp_path):
+    """Batches are appended to the spool and added to the Prometheus totals."""
+    prometheus_path = tmp_path / "tk_shell.prom"
+    for _ in range(2):
+        command_metrics = metrics.CommandMetrics()
+        command_metrics.record('say "hi"', 0.2, True)
+        command_metrics.record("publish", 0.2, False)
+        metrics.write_batch(
+            str(tmp_path / "spool"), command_metrics.pop(), str(prometheus_path)
+        )
+
+    lines = (tmp_path / "spool" / metrics.SPOOL_NAME).read_text().splitlines()
+    assert [json.loads(line)["command"] for line in lines] == [
+        "publish",
+        'say "hi"',
+    ] * 2
+
+    export = prometheus_path.read_text()
+    assert 'tk_shell_command_runs_total{command="say \\"hi\\""} 2' in export
+    assert 'tk_shell_command_failures_total{command="publish"} 2' in export
+    bucket = 'tk_shell_command_duration_seconds_bucket{command="publish",le="%s"} %d'
+    assert bucket % (0.1, 0) in export
+    assert bucket % (0.25, 2) in export
+    assert bucket % ("+Inf", 2) in export
+    assert 'tk_shell_command_duration_seconds_sum{command="publish"} 0.4' in export
+
+
+def test_spooler(tmp_path):
+    """The last batch is written when stopped."""
+    spooler = metrics.MetricsSpooler(str(tmp_path), 3600)
+    spooler.start()
+    spooler.metrics.record("publish", 0.2, True)
+    spooler.stop()
+
+    (line,) = (tmp_path / metrics.SPOOL_NAME).read_text().splitlines()
+    assert json.loads(line)["calls"] == 1
@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+"""Unit test to check the command profiling helpers.
+
+Test in Python 3.7
+"""
+
+from __future__ import absolute_import, division, print_function
+
+import os
+import pstats
+from unittest.mock import MagicMock
+
+import pytest
+
+from ..imports import tk_shell
+
+profiling = tk_shell.import_submodule("profiling")
+
+
+def test_profile_path(tmp_path):
+    """File names are made of the command key and context, made file safe."""
+    path = profiling.get_profile_path(str(tmp_path), "Publish...", "Shot ABC/010")
+
+    assert path.startswith(str(tmp_path / "Publish...-Shot_ABC_010-"))
+    assert path.endswith(".pstats")
+    assert path != profiling.get_profile_path(str(tmp_path), "Publish...", "Shot")
+
+
+def test_run_profiled(tmp_path):
+    """The statistics are saved and reported with the callback result."""
+    path = tmp_path / "profiles" / "command.pstats"
+    summaries = []
+
+    assert 55 == profiling.run_profiled(
+        lambda: sum(range(11)), str(path), 5, summaries.append, MagicMock()
+    )
+    assert "cumulative" in summaries[0]
+    assert pstats.Stats(str(path)).total_calls
+
+
+def test_run_profiled_error(tmp_path):
+    """The statistics are saved and reported when the callback fails."""
+    path = tmp_path / "command.pstats"
+    summaries = []
+
+    def fail():
+        raise ValueError("Failed")
+
+    with pytest.raises(ValueError):
+        profiling.run_profiled(fail, str(path), 5, summaries.append, MagicMock())
+    assert path.exists()
+    assert len(summaries) == 1
+
+
+@pytest.mark.skipif(os.geteuid() == 0, reason="Folders are always writable by root")
+def test_run_profiled_read_only(tmp_path):
+    """Failing to save the statistics is logged, the result is kept."""
+    tmp_path.chmod(0o500)
+    logger = MagicMock()
+    summaries = []
+    try:
+        assert 55 == profiling.run_profiled(
+            lambda: sum(range(11)),
+            str(tmp_path / "profiles" / "command.pstats"),
+            5,
+            summaries.append,
+            logger,
+        )
+    finally:
+        tmp_path.chmod(0o700)
+
+    assert summaries == []
+    logger.warning.assert_called_once()
+
+
+def test_run_profiled_invalid_folder(tmp_path):
+    """The statistics can't be saved under a file, the result is kept."""
+    (tmp_path / "profiles").write_text("")
+    logger = MagicMock()
+
+    assert 55 == profiling.run_profiled(
+        lambda: sum(range(11)),
+        str(tmp_path / "profiles" / "command.pstats"),
+        5,
+        MagicMock(),
+        logger,
+    )
+    logger.warning.assert_called_once()
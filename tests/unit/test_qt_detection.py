@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+"""Unit test to check the cache of the Qt bindings detection.
+
+Test in Python 3.7
+"""
+
+from __future__ import absolute_import, division, print_function
+
+import sys
+import types
+
+import pytest
+
+from ..imports import tk_shell
+
+qt_detection = tk_shell.import_submodule("qt_detection")
+
+
+@pytest.fixture(autouse=True)
+def cache_folder(tmpdir, monkeypatch):
+    monkeypatch.setenv(qt_detection.CACHE_ENV_VAR, str(tmpdir))
+    return tmpdir
+
+
+def test_entries():
+    """Entries are recorded per environment, the oldest are forgotten."""
+    assert qt_detection.read_entry("unknown") is None
+
+    qt_detection.write_entry("qt4", "PyQt4")
+    qt_detection.write_entry("none", None)
+    assert qt_detection.read_entry("qt4")["binding"] == "PyQt4"
+    assert qt_detection.read_entry("qt4")["set_codec"]
+    assert qt_detection.read_entry("none")["binding"] is None
+    assert not qt_detection.read_entry("none")["set_codec"]
+
+    for index in range(qt_detection.MAX_ENVIRONMENTS):
+        qt_detection.write_entry(str(index), "PySide2")
+    assert qt_detection.read_entry("qt4") is None
+    assert qt_detection.read_entry("0")["binding"] == "PySide2"
+
+
+def test_environment_key(tmpdir, monkeypatch):
+    """Keys change with sys.path."""
+    key = qt_detection.get_environment_key()
+    assert qt_detection.get_environment_key() == key
+    monkeypatch.syspath_prepend(str(tmpdir))
+    assert qt_detection.get_environment_key() != key
+
+
+def test_get_binding():
+    assert qt_detection.get_binding(types.ModuleType("PySide2.QtCore")) == "PySide2"
+    assert qt_detection.get_binding(sys) is None
+
+
+def test_only_binding():
+    """Other bindings can't be imported until the context is exited."""
+    assert "PyQt4" not in sys.modules
+    with qt_detection.only_binding("PySide2"):
+        with pytest.raises(ImportError):
+            import PyQt4  # noqa: F401
+        assert "PySide2" not in sys.modules or sys.modules["PySide2"] is not None
+    assert "PyQt4" not in sys.modules
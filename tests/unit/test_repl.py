@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+"""Unit test to check the interactive prompt.
+
+Test in Python 3.7
+"""
+
+from __future__ import absolute_import, division, print_function
+
+import io
+from unittest.mock import MagicMock
+
+from ..imports import tk_shell
+
+repl = tk_shell.import_submodule("repl")
+
+
+def make_engine():
+    engine = MagicMock()
+    engine.context = "Project Demo"
+    engine.commands = {
+        "publish": {"properties": {"short_name": "publish", "description": "Pub."}},
+        "tk-multi-a:launch_maya": {"properties": {"short_name": "maya"}},
+        "launch_nuke": {"properties": {"short_name": "nuke"}},
+    }
+    engine.resolve_command_key.side_effect = lambda name: name
+    return engine
+
+
+def run_lines(engine, lines):
+    stdout = io.StringIO()
+    shell = repl.EngineShell(engine, stdin=io.StringIO(lines), stdout=stdout)
+    shell.run()
+    return shell, stdout.getvalue()
+
+
+def test_run_commands():
+    """Lines are shell split and run in the engine, errors don't stop the prompt."""
+    engine = make_engine()
+    engine.run_command.side_effect = [RuntimeError("boom"), None]
+
+    _, output = run_lines(engine, 'publish "/a path/file.exr"\n\nmaya\nexit\n')
+
+    assert [call[0] for call in engine.run_command.call_args_list] == [
+        ("publish", ["/a path/file.exr"]),
+        ("maya", []),
+    ]
+    engine.logger.exception.assert_called_once()
+    assert "tank [Project Demo]> " in output
+
+
+def test_context():
+    """Entity contexts are switched to, the current one shown."""
+    engine = make_engine()
+
+    _, output = run_lines(engine, "context Shot 1234\ncontext Shot\ncontext\n")
+
+    engine.change_entity_context.assert_called_once_with({"type": "Shot", "id": 1234})
+    engine.logger.error.assert_called_once_with("Usage: context TYPE ID")
+    assert "Project Demo\n" in output
+
+
+def test_complete():
+    """Short names and prompt commands are completed."""
+    engine = make_engine()
+    shell, _ = run_lines(engine, "")
+
+    assert shell.completenames("") == sorted(
+        ["commands", "context", "EOF", "exit", "help", "maya", "nuke", "publish"]
+    )
+    assert shell.completenames("co") == ["commands", "context"]
+    assert shell.completenames("m") == ["maya"]
+
+    engine.context = "Shot 1234"
+    engine.commands = {"render": {"properties": {"short_name": "render"}}}
+    assert shell.completenames("r") == ["render"]
+
+
+def test_shadowed_commands():
+    """Engine commands named like prompt commands are run with a ! prefix."""
+    engine = make_engine()
+    engine.commands["tk-multi-context"] = {"properties": {"short_name": "context"}}
+
+    run_lines(engine, "!\n! \n!context Shot 1234\ncontext Shot 1234\n")
+
+    engine.run_command.assert_called_once_with("context", ["Shot", "1234"])
+    engine.change_entity_context.assert_called_once_with({"type": "Shot", "id": 1234})
+    warning = engine.logger.warning.call_args[0]
+    assert warning[1:] == ("context", "context")
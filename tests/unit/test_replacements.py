@@ -7,6 +7,7 @@ Test in Python 3.7
 from __future__ import absolute_import, division, print_function
 
 import logging
+import random
 from unittest.mock import Mock, MagicMock
 
 import pytest
@@ -27,12 +28,7 @@ PASSING_CASES = [
         {},
         id="no_matching_commands",
     ),
-    pytest.param(
-        {},
-        {"katana_4.0.2": "katana"},
-        {},
-        id="no_commands",
-    ),
+    pytest.param({}, {"katana_4.0.2": "katana"}, {}, id="no_commands"),
     pytest.param(
         {"setup_folders": {"properties": {"short_name": "setup_folders"}}},
         {},
@@ -44,10 +40,7 @@ PASSING_CASES = [
             "katana_3.6": {"properties": {"short_name": "katana_3.6"}},
             "Katana 4.0.2": {"properties": {"short_name": "katana_4.0.2"}},
         },
-        {
-            "katana_4.0.2": "katana",
-            "katana_3.6": "katana",
-        },
+        {"katana_4.0.2": "katana", "katana_3.6": "katana"},
         {},
         id="empty_upon_clash",
     ),
@@ -81,6 +74,56 @@ PASSING_CASES = [
         },
         id="production",
     ),
+    pytest.param(
+        {
+            "katana_3.6": {"properties": {"short_name": "katana_3.6"}},
+            "Katana 4.0.2": {"properties": {"short_name": "katana_4.0.2"}},
+            "mari": {"properties": {"short_name": "mari"}},
+        },
+        {r"re:katana_(\d+)\..*": r"katana\1"},
+        {"katana_3.6": "katana3", "Katana 4.0.2": "katana4"},
+        id="regex",
+    ),
+    pytest.param(
+        {
+            "Nuke 13.0v1": {"properties": {"short_name": "nuke_13.0v1"}},
+            "NukeX 13.0v1": {"properties": {"short_name": "nukex_13.0v1"}},
+            "Nuke 12.2v4": {"properties": {"short_name": "nuke_12.2v4"}},
+        },
+        {"glob:nuke_*.*": r"nuke\1", "glob:nuke[xX]_??.*": r"nukex\1\2"},
+        {"Nuke 13.0v1": "nuke13", "NukeX 13.0v1": "nukex13", "Nuke 12.2v4": "nuke12"},
+        id="glob",
+    ),
+    pytest.param(
+        {
+            "katana_3.6": {"properties": {"short_name": "katana_3.6"}},
+            "Katana 4.0.2": {"properties": {"short_name": "katana_4.0.2"}},
+        },
+        {"katana_4.0.2": "katana", "re:katana_.*": "old_katana"},
+        {"Katana 4.0.2": "katana", "katana_3.6": "old_katana"},
+        id="exact_before_patterns",
+    ),
+    pytest.param(
+        {"Katana 4.0.2": {"properties": {"short_name": "katana_4.0.2"}}},
+        {"re:katana_4.*": "katana4", "re:katana_.*": "katana"},
+        {"Katana 4.0.2": "katana4"},
+        id="first_pattern_wins",
+    ),
+    pytest.param(
+        {
+            "katana_3.6": {"properties": {"short_name": "katana_3.6"}},
+            "Katana 4.0.2": {"properties": {"short_name": "katana_4.0.2"}},
+        },
+        {"re:katana_.*": "katana"},
+        {},
+        id="empty_upon_pattern_clash",
+    ),
+    pytest.param(
+        {"Katana 4.0.2": {"properties": {"short_name": "katana_4.0.2"}}},
+        {"re:katana_(": "katana", "re:(?P<v>.*)": r"\g<v>_", "re:(?P<v>k.*)": "k"},
+        {"Katana 4.0.2": "katana_4.0.2_"},
+        id="invalid_and_conflicting_patterns",
+    ),
 ]
 
 
@@ -94,3 +137,119 @@ def test_valid_validated_name_replacements(commands, replaced_commands_names, ex
     assert expected == engine.ShellEngine.validated_name_replacements(
         instance, replaced_commands_names
     )
+
+
+@pytest.mark.parametrize("commands,replaced_commands_names,expected", PASSING_CASES)
+def test_memoized_name_replacements(commands, replaced_commands_names, expected):
+    """Check the result is cached and the debug dumps only logged on changes."""
+    logger = Mock(spec_set=logging.getLoggerClass())
+    name_replacements = engine.NameReplacements(logger)
+
+    assert expected == name_replacements.update(replaced_commands_names, commands)
+    debug_count = logger.debug.call_count
+    assert expected == name_replacements.update(replaced_commands_names, commands)
+    assert debug_count == logger.debug.call_count
+
+
+def test_incremental_name_replacements():
+    """Compare incremental updates with full recalculations as commands change."""
+    random.seed(0)
+    requested = dict(("cmd_%d" % index, "new_%d" % (index // 3)) for index in range(60))
+    requested["cmd_61"] = "cmd_62"
+    requested[r"re:cmd_9(\d)"] = r"nine_\1"
+    requested["glob:cmd_8?"] = "eighty"
+    all_commands = dict(
+        ("Command %d" % index, {"properties": {"short_name": "cmd_%d" % index}})
+        for index in range(100)
+    )
+    # Duplicated short names must fall back to a full rebuild.
+    all_commands["Duplicate"] = {"properties": {"short_name": "cmd_5"}}
+
+    logger = Mock(spec_set=logging.getLoggerClass())
+    name_replacements = engine.NameReplacements(logger)
+    keys = sorted(all_commands)
+    for _ in range(50):
+        commands = dict(
+            (key, all_commands[key]) for key in random.sample(keys, len(keys) - 3)
+        )
+        instance = MagicMock()
+        instance.logger = logger
+        instance.commands = commands
+
+        assert engine.ShellEngine.validated_name_replacements(
+            instance, requested
+        ) == name_replacements.update(requested, commands)
+
+
+def test_patched_names_are_memoized():
+    """Short names already patched by a previous update are not renamed again."""
+    commands = {"Katana 4.0.2": {"properties": {"short_name": "katana_4.0.2"}}}
+    requested = {"katana_4.0.2": "katana"}
+    logger = Mock(spec_set=logging.getLoggerClass())
+    name_replacements = engine.NameReplacements(logger)
+
+    replacements = name_replacements.update(requested, commands)
+    assert {"Katana 4.0.2": "katana"} == replacements
+    instance = MagicMock()
+    instance.commands = commands
+    engine.ShellEngine._patch_short_names(instance, replacements)
+    assert commands["Katana 4.0.2"]["properties"]["short_name"] == "katana"
+    assert {"Katana 4.0.2": "katana"} == name_replacements.update(requested, commands)
+    logger.warning.assert_not_called()
+
+
+def test_renamed_name_registered():
+    """A command registered with the new name of a previously renamed one is
+    not mistaken for it."""
+    requested = {"c": "e"}
+    logger = Mock(spec_set=logging.getLoggerClass())
+    name_replacements = engine.NameReplacements(logger)
+
+    assert {"K4": "e"} == name_replacements.update(
+        requested, {"K4": {"properties": {"short_name": "c"}}}
+    )
+    assert {} == name_replacements.update(
+        requested,
+        {
+            "K4": {"properties": {"short_name": "e"}},
+            "K6": {"properties": {"short_name": "c"}},
+        },
+    )
+
+
+def test_random_registrations():
+    """Compare memoized updates with fresh calculations as commands are
+    registered again with random names."""
+    random.seed(0)
+    names = ["a", "b", "c", "d", "e"]
+    requested = {"a": "b", "c": "e", "re:d": "a"}
+    logger = Mock(spec_set=logging.getLoggerClass())
+    name_replacements = engine.NameReplacements(logger)
+    for _ in range(500):
+        commands = dict(
+            ("K%d" % index, {"properties": {"short_name": random.choice(names)}})
+            for index in random.sample(range(8), random.randint(1, 5))
+        )
+        assert engine.NameReplacements(logger).update(
+            requested, commands
+        ) == name_replacements.update(requested, commands)
+
+
+def test_backreference_patterns():
+    """Patterns referring to their own groups match after other patterns."""
+    logger = Mock(spec_set=logging.getLoggerClass())
+    rules = engine.RenameRules(
+        {
+            r"re:foo_(\d+)": r"foo\1",
+            r"re:(\w)\1_x": r"double_\1",
+            r"re:(?P<c>\w)(?P=c)_y": r"named_\1",
+            r"re:\w+_x": "other",
+        },
+        logger,
+    )
+
+    assert rules.match("foo_12") == "foo12"
+    assert rules.match("aa_x") == "double_a"
+    assert rules.match("bb_y") == "named_b"
+    assert rules.match("ab_x") == "other"
+    assert rules.match("ab_y") is None
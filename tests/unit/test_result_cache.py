@@ -0,0 +1,154 @@
+# -*- coding: utf-8 -*-
+"""Unit test to check the cache of the cacheable commands results.
+
+Test in Python 3.7
+"""
+
+from __future__ import absolute_import, division, print_function
+
+import os
+import stat
+import threading
+import time
+from unittest.mock import MagicMock
+
+import pytest
+
+from ..imports import engine as shell_engine
+from ..imports import tk_shell
+
+result_cache = tk_shell.import_submodule("result_cache")
+
+
+def test_get_result_key():
+    """Keys are different for each context, command and arguments."""
+    keys = {
+        result_cache.get_result_key("project", "versions", ["maya"]),
+        result_cache.get_result_key("shot", "versions", ["maya"]),
+        result_cache.get_result_key("project", "paths", ["maya"]),
+        result_cache.get_result_key("project", "versions", ["nuke"]),
+    }
+    assert len(keys) == 4
+    assert result_cache.get_result_key(
+        "project", "versions", ("maya",)
+    ) == result_cache.get_result_key("project", "versions", ["maya"])
+
+
+def test_memory_cache():
+    """Results expire, the least recently used are evicted first."""
+    cache = result_cache.ResultCache(2)
+    cache.put("versions", "expired", 3, -1)
+    assert cache.get("versions", "expired") == (False, None)
+
+    cache.put("versions", "a", [1, 2], 60)
+    cache.put("versions", "b", None, 60)
+    assert cache.get("versions", "a") == (True, [1, 2])
+    assert cache.get("versions", "b") == (True, None)
+
+    cache.put("paths", "c", 4, 60)
+    # "a" is the least recently used
+    assert cache.get("versions", "a") == (False, None)
+    assert cache.get("paths", "c") == (True, 4)
+
+
+def test_results_copied():
+    """Changing a result doesn't change the cached one."""
+    cache = result_cache.ResultCache(2)
+    result = {"versions": [1]}
+    cache.put("versions", "a", result, 60)
+    result["versions"].append(2)
+
+    found, cached = cache.get("versions", "a")
+    assert cached == {"versions": [1]}
+    cached["versions"].append(3)
+    assert cache.get("versions", "a") == (True, {"versions": [1]})
+
+    cache.put("versions", "lock", threading.Lock(), 60)
+    assert cache.get("versions", "lock") == (False, None), "Can't be copied"
+
+
+def test_invalidate(tmpdir):
+    """Results are discarded for a command, or for all of them."""
+    cache = result_cache.ResultCache(10, str(tmpdir))
+    cache.put("versions", "a", 1, 60)
+    cache.put("paths", "b", 2, 60)
+
+    cache.invalidate("versions")
+    assert cache.get("versions", "a") == (False, None)
+    assert cache.get("paths", "b") == (True, 2)
+    # shared with other processes
+    assert result_cache.ResultCache(10, str(tmpdir)).get("paths", "b") == (True, 2)
+
+    cache.invalidate()
+    assert cache.get("paths", "b") == (False, None)
+    assert result_cache.ResultCache(10, str(tmpdir)).get("paths", "b") == (False, None)
+
+
+def test_disk_cache(tmpdir):
+    """Results are reused from disk and trimmed for each command."""
+    cache = result_cache.ResultCache(2, str(tmpdir))
+    cache.put("versions", "a", {"maya": ["2019"]}, 60)
+    cache.put("versions", "expired", 1, -1)
+    cache.put("versions", "lambda", lambda: None, 60)
+
+    other = result_cache.ResultCache(2, str(tmpdir))
+    assert other.get("versions", "a") == (True, {"maya": ["2019"]})
+    assert other.get("versions", "expired") == (False, None)
+    # not picklable, only in memory
+    assert other.get("versions", "lambda") == (False, None)
+    assert cache.get("versions", "lambda")[0]
+
+    for key in "bcd":
+        time.sleep(0.01)
+        cache.put("versions", key, key, 60)
+    (folder,) = tmpdir.listdir()
+    assert len([path for path in folder.listdir() if path.ext == ".pickle"]) == 2
+    assert not [path for path in folder.listdir() if path.ext == ".tmp"]
+    assert os.path.basename(str(folder)).startswith("versions-")
+
+
+def test_check_folder(tmp_path):
+    """Only private folders of the current user are used."""
+    folder = tmp_path / "results"
+    result_cache.check_folder(str(folder))
+    assert stat.S_IMODE(folder.stat().st_mode) == 0o700
+    result_cache.check_folder(str(folder))
+
+    link = tmp_path / "link"
+    link.symlink_to(folder)
+    shared = tmp_path / "shared"
+    shared.mkdir()
+    shared.chmod(0o777)
+    for path in (link, shared):
+        with pytest.raises(OSError, match="must be a directory owned"):
+            result_cache.check_folder(str(path))
+
+
+def test_shared_folder_not_used(tmp_path):
+    """Results are only cached in memory if the folder isn't private."""
+    tmp_path.chmod(0o777)
+    engine = MagicMock()
+    engine._result_cache = None
+    engine.import_module.return_value = tk_shell
+    engine.get_setting.side_effect = lambda name, default=None: (
+        str(tmp_path) if name == "command_cache_folder" else default
+    )
+
+    cache = shell_engine.ShellEngine._get_result_cache(engine)
+
+    assert cache._folder is None
+    engine.logger.warning.assert_called_once()
+
+
+def test_write_failure(tmp_path, monkeypatch):
+    """Temporary files are removed when a result can't be stored."""
+    cache = result_cache.ResultCache(2, str(tmp_path))
+
+    def replace(source, destination):
+        raise OSError("Disk full")
+
+    monkeypatch.setattr(os, "replace", replace)
+    cache.put("paths", "a", 1, 60)
+
+    assert cache.get("paths", "a") == (True, 1)
+    assert [path.name for path in tmp_path.glob("*/*")] == []
@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+"""Unit test to check the JSON lines output of generator commands.
+
+Test in Python 3.7
+"""
+
+from __future__ import absolute_import, division, print_function
+
+import datetime
+import json
+import os
+
+import pytest
+
+from ..imports import tk_shell
+
+streaming = tk_shell.import_submodule("streaming")
+
+
+def read_lines(path):
+    with open(path) as output:
+        return [json.loads(line) for line in output]
+
+
+@pytest.fixture
+def output(tmpdir):
+    path = str(tmpdir.join("output.jsonl"))
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT)
+    yield path, fd
+    os.close(fd)
+
+
+def test_stream_results(output):
+    """Items are written as they are yielded, followed by the status."""
+    path, fd = output
+
+    def items():
+        yield {"id": 1, "created_at": datetime.date(2020, 1, 2)}
+        # the previous item was already written
+        assert read_lines(path) == [{"id": 1, "created_at": "2020-01-02"}]
+        yield {"id": 2}
+
+    assert streaming.stream_results("list", items(), fd) == 2
+
+    lines = read_lines(path)
+    assert lines[:2] == [{"id": 1, "created_at": "2020-01-02"}, {"id": 2}]
+    assert lines[2]["command"] == "list"
+    assert lines[2]["count"] == 2
+    assert lines[2][streaming.STATUS_KEY] == "ok"
+
+
+def test_stream_results_error(output):
+    """The status of a failed command is written before the error is raised."""
+    path, fd = output
+
+    def items():
+        yield 1
+        raise ValueError("Shotgun is down")
+
+    with pytest.raises(ValueError):
+        streaming.stream_results("list", items(), fd)
+
+    lines = read_lines(path)
+    assert lines[0] == 1
+    assert lines[1][streaming.STATUS_KEY] == "error"
+    assert lines[1]["error"] == "Shotgun is down"
+    assert lines[1]["count"] == 1
+
+
+def test_stream_results_broken_pipe():
+    """The generator is stopped once the reader is gone."""
+    read_fd, write_fd = os.pipe()
+    os.close(read_fd)
+    closed = []
+
+    def items():
+        try:
+            yield 1
+            yield 2
+        finally:
+            closed.append(True)
+
+    try:
+        assert streaming.stream_results("list", items(), write_fd) == 0
+    finally:
+        os.close(write_fd)
+    assert closed
@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+"""Unit test to check the threaded mode of the Task with the stub QtCore.
+
+Test in Python 3.7
+"""
+
+from __future__ import absolute_import, division, print_function
+
+import signal
+import threading
+import time
+from unittest.mock import MagicMock
+
+import pytest
+
+from .. import qt_stub
+from ..imports import tk_shell
+
+task = qt_stub.import_module("task")
+
+
+@pytest.fixture
+def engine():
+    engine = MagicMock()
+    engine.has_received_ui_creation_requests.return_value = False
+    return engine
+
+
+@pytest.fixture
+def sigint_handler():
+    """Install a SIGINT handler for the Task to replace, then restore it."""
+
+    def handler(signum, frame):
+        pass
+
+    previous = signal.signal(signal.SIGINT, handler)
+    yield handler
+    signal.signal(signal.SIGINT, previous)
+
+
+def test_package_export():
+    """The Task class is still exported by the package."""
+    assert tk_shell.Task is task.Task
+    with pytest.raises(AttributeError):
+        tk_shell.Missing
+
+
+def run_threaded(engine, callback):
+    t = task.Task(engine, callback, [], threaded=True)
+    finished = []
+    t.finished.connect(lambda: finished.append(True))
+    t.run_command()
+    return t, finished
+
+
+def test_cancel(engine, sigint_handler):
+    """Cancelling raises KeyboardInterrupt in the worker thread."""
+    started = threading.Event()
+    interrupted = []
+
+    def command():
+        started.set()
+        try:
+            while True:
+                time.sleep(0.01)
+        except KeyboardInterrupt:
+            interrupted.append(threading.current_thread().name)
+            raise
+
+    t, finished = run_threaded(engine, command)
+    assert started.wait(10)
+    t.cancel()
+    t._thread.join(10)
+
+    assert not t._thread.is_alive()
+    assert interrupted == ["tk-shell command"]
+    assert t.cancel_requested()
+    engine.log_info.assert_called_once_with("The operation was cancelled by the user.")
+
+    qt_stub.process_events()
+    assert finished == [True]
+
+
+def test_cancel_after_callback(engine, sigint_handler, monkeypatch):
+    """A cancellation once the callback returned is discarded."""
+    raised = []
+    set_async_exception = task._set_async_exception
+
+    def record(thread_id, exception):
+        raised.append(exception)
+        set_async_exception(thread_id, exception)
+
+    monkeypatch.setattr(task, "_set_async_exception", record)
+    t, finished = run_threaded(engine, lambda: None)
+    t._thread.join(10)
+    # the callback returned, the main thread didn't handle it yet
+    t.cancel()
+
+    assert raised == [None], "Only the pending cancellation is cleared"
+    engine.log_info.assert_not_called()
+    qt_stub.process_events()
+    assert finished == [True]
+
+
+def test_sigint_handler_restored(engine, sigint_handler):
+    """The SIGINT handler is only replaced while the command runs."""
+    release = threading.Event()
+    t, finished = run_threaded(engine, lambda: release.wait(10))
+    assert signal.getsignal(signal.SIGINT) == t._on_sigint
+    assert t._signal_timer.isActive()
+
+    release.set()
+    t._thread.join(10)
+    qt_stub.process_events()
+
+    assert signal.getsignal(signal.SIGINT) is sigint_handler
+    assert not t._signal_timer.isActive()
+    assert finished == [True]
@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+"""Unit test to check the trace file and summary.
+
+Test in Python 3.7
+"""
+
+from __future__ import absolute_import, division, print_function
+
+import json
+from unittest.mock import MagicMock
+
+from ..imports import engine, tk_shell
+
+tracing = tk_shell.import_submodule("tracing")
+
+
+def make_tracer():
+    tracer = tracing.Tracer()
+    tracer.add_span("engine init", "startup", 10.0, 10.5)
+    tracer.add_span("init_app tk-multi-foo", "app", 10.1, 10.2)
+    tracer.add_span("post_app_init", "startup", 10.3, 10.4)
+    tracer.add_span("setup_folders", "command", 11.0, 11.25, {"args": 1})
+    return tracer
+
+
+def test_chrome_trace(tmp_path):
+    """Spans are written as complete events in microseconds."""
+    path = tmp_path / "trace.json"
+    make_tracer().write_chrome_trace(str(path))
+
+    events = json.loads(path.read_text())["traceEvents"]
+    assert [event["name"] for event in events] == [
+        "engine init",
+        "init_app tk-multi-foo",
+        "post_app_init",
+        "setup_folders",
+    ]
+    assert events[3]["ph"] == "X"
+    assert events[3]["ts"] == 11000000
+    assert events[3]["dur"] == 250000
+    assert events[3]["args"] == {"args": 1}
+
+
+def test_summary_nesting():
+    """Spans within another span are indented below it."""
+    lines = make_tracer().summary().splitlines()
+
+    assert lines[0].endswith("ms  engine init [startup]")
+    assert lines[1].endswith("ms    init_app tk-multi-foo [app]")
+    assert lines[2].endswith("ms    post_app_init [startup]")
+    assert lines[3].endswith("ms  setup_folders [command]")
+
+
+def test_trace_not_written(tmp_path):
+    """The engine teardown goes on when the trace can't be written."""
+    stub = MagicMock()
+    stub._tracer = make_tracer()
+    stub._trace_path = str(tmp_path / "missing" / "trace.json")
+
+    engine.ShellEngine._write_trace(stub)
+
+    stub.logger.warning.assert_called_once()
+    assert "engine init" in stub.logger.info.call_args[0][2]
+    assert stub._tracer is None